@@ -0,0 +1,146 @@
+"""
+Cache of /messages/query answers keyed by client_id and normalized prompt.
+
+Onboarding questions repeat a lot, and every repeat would otherwise be a full
+Backboard round trip. Each client has a "memory generation" counter that is
+bumped whenever Drive, GitHub or Telegram ingestion succeeds (see
+events.emit_event); an answer is only served while the generation it was
+computed under is still current, so new knowledge invalidates stale answers
+without tracking which answer depends on which document. Entries also expire
+after ANSWER_CACHE_TTL seconds and the least recently used are evicted past
+ANSWER_CACHE_SIZE.
+
+The cache lives in the server process and is used from the event loop.
+"""
+
+import os
+import re
+from typing import Hashable, Optional
+from cachetools import TTLCache
+
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "1024"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Lower-case, collapse whitespace and drop trailing punctuation."""
+    return _WHITESPACE.sub(" ", prompt).strip().rstrip("?!. ").lower()
+
+
+class AnswerCache:
+    """TTL + LRU cache of answers, invalidated by per-client generations."""
+
+    def __init__(self, maxsize: int = ANSWER_CACHE_SIZE, ttl: float = ANSWER_CACHE_TTL):
+        """
+        Args:
+            maxsize: Maximum answers before least recently used ones are evicted
+            ttl: Seconds an answer stays valid
+        """
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        # Bumping _epoch invalidates every client at once
+        self._epoch = 0
+        self._generations = {}
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+    def generation(self, client_id: str) -> tuple:
+        """Return the current memory generation for client_id."""
+        return (self._epoch, self._generations.get(client_id, 0))
+
+    def bump_generation(self, client_id: Optional[str] = None):
+        """
+        Invalidate the cached answers of client_id, or of every client if None.
+        """
+        if client_id is None:
+            self._epoch += 1
+        else:
+            self._generations[client_id] = self._generations.get(client_id, 0) + 1
+
+    def get(self, client_id: str, prompt: str):
+        """
+        Return the cached answer for prompt, or None.
+
+        Args:
+            client_id: The client ID
+            prompt: The question as asked; it is normalized here
+        """
+        key = (client_id, normalize_prompt(prompt))
+        entry = self._cache.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        generation, answer = entry
+        if generation != self.generation(client_id):
+            self.stale += 1
+            self.misses += 1
+            self._cache.pop(key, None)
+            return None
+        self.hits += 1
+        return answer
+
+    def put(self, client_id: str, prompt: str, answer, generation: Hashable):
+        """
+        Cache answer for prompt.
+
+        Args:
+            client_id: The client ID
+            prompt: The question as asked
+            answer: The value to return on later hits
+            generation: generation(client_id) read before asking Backboard, so
+                an answer that raced with an ingestion is never served
+        """
+        if generation != self.generation(client_id):
+            return
+        self._cache[(client_id, normalize_prompt(prompt))] = (generation, answer)
+
+    def clear(self):
+        """Forget every answer and reset the counters."""
+        self._cache.clear()
+        self._generations.clear()
+        self._epoch = 0
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and current size."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": len(self._cache),
+            "maxsize": self._cache.maxsize,
+            "ttl": self._cache.ttl,
+        }
+
+
+_cache = AnswerCache()
+
+
+def get(client_id: str, prompt: str):
+    return _cache.get(client_id, prompt)
+
+
+def put(client_id: str, prompt: str, answer, generation: Hashable):
+    _cache.put(client_id, prompt, answer, generation)
+
+
+def generation(client_id: str) -> tuple:
+    return _cache.generation(client_id)
+
+
+def bump_generation(client_id: Optional[str] = None):
+    _cache.bump_generation(client_id)
+
+
+def clear():
+    _cache.clear()
+
+
+def stats() -> dict:
+    return _cache.stats()
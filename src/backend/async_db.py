@@ -0,0 +1,322 @@
+"""
+Awaitable wrappers around the db.py helpers.
+
+SQLite calls block, so the FastAPI handlers, the Drive processor and the Telegram
+bot run them on a small dedicated thread pool instead of the event loop. Every
+worker thread keeps its own pooled connection (see db.get_connection), and each
+wrapper resolves the db function at call time so tests can patch db directly.
+"""
+
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from src.backend import db
+
+# Number of threads dedicated to database work
+DB_WORKERS = int(os.getenv("DB_WORKERS", "4"))
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=DB_WORKERS, thread_name_prefix="db"
+        )
+    return _executor
+
+
+async def run(func, *args, **kwargs):
+    """
+    Run a blocking database callable on the DB thread pool.
+
+    Args:
+        func: Any callable that talks to SQLite (usually a db.py function)
+
+    Returns:
+        Whatever func returns
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _get_executor(), functools.partial(func, *args, **kwargs)
+    )
+
+
+def shutdown():
+    """Wait for queued database work to finish and stop the worker threads."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+
+
+async def init_db():
+    return await run(db.init_db)
+
+
+# client functions
+async def lookup_client(client_id: str):
+    return await run(db.lookup_client, client_id)
+
+
+async def create_client(client_id: str, api_key: str):
+    return await run(db.create_client, client_id, api_key)
+
+
+# Assistant functions
+async def lookup_assistant(client_id: str):
+    return await run(db.lookup_assistant, client_id)
+
+
+async def create_assistant(assistant_id: str, client_id: str):
+    return await run(db.create_assistant, assistant_id, client_id)
+
+
+# Message functions
+async def log_message(
+    chat_id: str, channel_name: str, message: str, client_id: str = None
+):
+    return await run(db.log_message, chat_id, channel_name, message, client_id)
+
+
+async def flush_messages():
+    return await run(db.flush_messages)
+
+
+async def get_messages(
+    chat_id: str,
+    since: str = None,
+    until: str = None,
+    limit: int = db.MESSAGE_PAGE_SIZE,
+    client_id: str = None,
+):
+    return await run(
+        db.get_messages,
+        chat_id,
+        since=since,
+        until=until,
+        limit=limit,
+        client_id=client_id,
+    )
+
+
+async def get_recent_messages(
+    chat_id: str, limit: int = db.MESSAGE_PAGE_SIZE, client_id: str = None
+):
+    return await run(db.get_recent_messages, chat_id, limit, client_id)
+
+
+# Session functions
+async def create_session(client_id: str, thread_id: str):
+    return await run(db.create_session, client_id, thread_id)
+
+
+async def use_session(client_id: str, session_id: str):
+    return await run(db.use_session, client_id, session_id)
+
+
+async def end_session(client_id: str, session_id: str):
+    return await run(db.end_session, client_id, session_id)
+
+
+# Thread functions
+async def lookup_thread(chat_id: str, client_id: str = None):
+    return await run(db.lookup_thread, chat_id, client_id)
+
+
+async def create_thread(
+    chat_id: str, channel_name: str, chat: str, client_id: str = None
+):
+    return await run(db.create_thread, chat_id, channel_name, chat, client_id)
+
+
+# Source status functions
+async def get_source_status(client_id: str):
+    return await run(db.get_source_status, client_id)
+
+
+# Search functions
+async def index_repository_files(client_id: str, repo_url: str, files, removed=()):
+    return await run(db.index_repository_files, client_id, repo_url, files, removed)
+
+
+async def search(client_id: str, query: str, limit: int = 20, source: str = None):
+    return await run(db.search, client_id, query, limit, source)
+
+
+# Drive document functions
+async def lookup_drive_document(
+    file_id: str, include_content: bool = True, client_id: str = None
+):
+    return await run(db.lookup_drive_document, file_id, include_content, client_id)
+
+
+async def get_drive_document_content(file_id: str, client_id: str = None):
+    return await run(db.get_drive_document_content, file_id, client_id)
+
+
+async def create_drive_document(
+    file_id: str,
+    client_id: str,
+    file_name: str,
+    content_hash: str,
+    last_modified: str,
+    content: str,
+):
+    return await run(
+        db.create_drive_document,
+        file_id=file_id,
+        client_id=client_id,
+        file_name=file_name,
+        content_hash=content_hash,
+        last_modified=last_modified,
+        content=content,
+    )
+
+
+async def update_drive_document(
+    file_id: str, content_hash: str, content: str, client_id: str = None
+):
+    return await run(
+        db.update_drive_document, file_id, content_hash, content, client_id
+    )
+
+
+async def get_all_drive_documents_for_client(client_id: str):
+    return await run(db.get_all_drive_documents_for_client, client_id)
+
+
+async def list_drive_documents(
+    client_id: str,
+    after: str = None,
+    limit: int = 100,
+    fields=None,
+    include_content: bool = False,
+):
+    return await run(
+        db.list_drive_documents,
+        client_id,
+        after=after,
+        limit=limit,
+        fields=fields,
+        include_content=include_content,
+    )
+
+
+# Repo Functions
+async def add_repository(repo_url: str, client_id: str):
+    return await run(db.add_repository, repo_url, client_id)
+
+
+async def lookup_repository(repo_url: str):
+    return await run(db.lookup_repository, repo_url)
+
+
+# Webhook delivery functions
+async def create_webhook_delivery(
+    delivery_id: str, client_id: str, repo_url: str, payload: dict
+):
+    return await run(
+        db.create_webhook_delivery, delivery_id, client_id, repo_url, payload
+    )
+
+
+async def lookup_webhook_delivery(delivery_id: str):
+    return await run(db.lookup_webhook_delivery, delivery_id)
+
+
+async def update_webhook_delivery(
+    delivery_id: str, status: str, result: dict = None, error: str = None
+):
+    return await run(db.update_webhook_delivery, delivery_id, status, result, error)
+
+
+async def record_webhook_delivery_progress(
+    delivery_id: str, thread_id: str, messages_sent: int
+):
+    return await run(
+        db.record_webhook_delivery_progress, delivery_id, thread_id, messages_sent
+    )
+
+
+# Job queue functions
+async def enqueue_job(
+    kind: str,
+    payload: dict,
+    dedup_key: str = None,
+    delay: float = 0,
+    max_attempts: int = None,
+):
+    return await run(
+        db.enqueue_job,
+        kind,
+        payload,
+        dedup_key=dedup_key,
+        delay=delay,
+        max_attempts=max_attempts,
+    )
+
+
+async def lease_job(owner: str, kinds, lease_seconds: float):
+    return await run(db.lease_job, owner, kinds, lease_seconds)
+
+
+async def extend_job_lease(job_id: int, owner: str, lease_seconds: float):
+    return await run(db.extend_job_lease, job_id, owner, lease_seconds)
+
+
+async def complete_job(job_id: int, owner: str):
+    return await run(db.complete_job, job_id, owner)
+
+
+async def fail_job(job_id: int, owner: str, error: str, retry_delay: float = None):
+    return await run(db.fail_job, job_id, owner, error, retry_delay)
+
+
+async def get_job(job_id: int):
+    return await run(db.get_job, job_id)
+
+
+async def list_jobs(status: str = None, kind: str = None, limit: int = 50):
+    return await run(db.list_jobs, status, kind, limit)
+
+
+async def retry_job(job_id: int):
+    return await run(db.retry_job, job_id)
+
+
+async def job_counts():
+    return await run(db.job_counts)
+
+
+# Activity Log functions
+async def log_activity(
+    client_id: str, source: str, title: str, summary: str, color: str
+):
+    return await run(
+        db.log_activity,
+        client_id=client_id,
+        source=source,
+        title=title,
+        summary=summary,
+        color=color,
+    )
+
+
+async def get_recent_activity(client_id: str, limit: int = 10):
+    return await run(db.get_recent_activity, client_id, limit)
+
+
+async def flush_activity():
+    return await run(db.flush_activity)
+
+
+async def get_activity_since(client_id: str, since_id: int, limit: int = 10):
+    return await run(db.get_activity_since, client_id, since_id, limit)
+
+
+async def get_activity_summary(client_id: str, days: int = 30):
+    return await run(db.get_activity_summary, client_id, days)
@@ -0,0 +1,386 @@
+"""
+Process-wide pool of BackboardClient instances, one per client_id.
+
+Each BackboardClient owns an httpx connection pool, so building one per request
+throws away keep-alive connections and repeats the TLS handshake and the Fernet
+decryption of the stored key. The pool keeps the most recently used clients
+alive (LRU, BACKBOARD_CLIENT_POOL_SIZE entries) and rebuilds a client when its
+stored encrypted key changes.
+
+The pool is meant to be used from the event loop:
+
+    async with backboard_clients.client(client_id, client["api_key"]) as backboard_client:
+        ...
+
+A client that is evicted or invalidated while requests are still using it is
+closed when the last of them finishes.
+
+Pooled clients are handed out behind LimitedBackboardClient, which runs every
+call through the pool's BackboardLimiter: at most BACKBOARD_CLIENT_CONCURRENCY
+calls per client and BACKBOARD_MAX_CONCURRENCY in total, with rate-limited
+(429) and transient failures retried after a jittered exponential backoff or
+the server's Retry-After.
+"""
+
+import asyncio
+import os
+import random
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional
+from backboard import BackboardClient
+from backboard.exceptions import (
+    BackboardAPIError,
+    BackboardRateLimitError,
+    BackboardServerError,
+)
+from src.backend import encryption
+
+# Maximum number of live BackboardClient instances
+BACKBOARD_CLIENT_POOL_SIZE = int(os.getenv("BACKBOARD_CLIENT_POOL_SIZE", "128"))
+# Concurrent Backboard calls allowed in total and per client
+BACKBOARD_MAX_CONCURRENCY = int(os.getenv("BACKBOARD_MAX_CONCURRENCY", "16"))
+BACKBOARD_CLIENT_CONCURRENCY = int(os.getenv("BACKBOARD_CLIENT_CONCURRENCY", "4"))
+# Retries of rate-limited and transient failures, and their backoff (seconds)
+BACKBOARD_MAX_RETRIES = int(os.getenv("BACKBOARD_MAX_RETRIES", "4"))
+BACKBOARD_RETRY_BASE_DELAY = float(os.getenv("BACKBOARD_RETRY_BASE_DELAY", "0.5"))
+BACKBOARD_RETRY_MAX_DELAY = float(os.getenv("BACKBOARD_RETRY_MAX_DELAY", "30"))
+
+# The SDK raises plain BackboardAPIErrors with these messages for httpx
+# timeouts and connection failures
+_TRANSIENT_MESSAGES = ("Request timed out", "Connection error")
+
+
+def is_retryable(e: Exception) -> bool:
+    """Return True for rate limits, 5xx responses, timeouts and connection errors."""
+    if isinstance(e, (BackboardRateLimitError, BackboardServerError)):
+        return True
+    return type(e) is BackboardAPIError and str(e) in _TRANSIENT_MESSAGES
+
+
+def retry_after(e: Exception) -> Optional[float]:
+    """Return the Retry-After of a failed response in seconds, if it sent one."""
+    response = getattr(e, "response", None)
+    value = response.headers.get("Retry-After") if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class _ClientSlots:
+    def __init__(self, limit: int):
+        self.semaphore = asyncio.Semaphore(limit)
+        self.users = 0
+        self.waiting = 0
+
+
+class BackboardLimiter:
+    """
+    Bounds concurrent Backboard calls per client and globally, with retries.
+
+    A call first takes one of its client's slots, then a global one, so a
+    client with a deep queue can't hold global slots while waiting on its own.
+    Slots are released during backoff sleeps.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = BACKBOARD_MAX_CONCURRENCY,
+        client_concurrency: int = BACKBOARD_CLIENT_CONCURRENCY,
+        max_retries: int = BACKBOARD_MAX_RETRIES,
+        base_delay: float = BACKBOARD_RETRY_BASE_DELAY,
+        max_delay: float = BACKBOARD_RETRY_MAX_DELAY,
+    ):
+        """
+        Args:
+            max_concurrency: Calls allowed in flight across all clients
+            client_concurrency: Calls allowed in flight per client
+            max_retries: Retries of a retryable failure before giving up
+            base_delay: First backoff in seconds, doubled on every retry
+            max_delay: Backoff cap; a Retry-After longer than this is not waited for
+        """
+        self.max_concurrency = max_concurrency
+        self.client_concurrency = client_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._global = asyncio.Semaphore(max_concurrency)
+        self._clients = {}
+        self.waiting = 0
+        self.active = 0
+        self.calls = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.failures = 0
+
+    @asynccontextmanager
+    async def slot(self, client_id: str):
+        """Wait for a per-client and a global slot and hold them for the block."""
+        slots = self._clients.get(client_id)
+        if slots is None:
+            slots = self._clients[client_id] = _ClientSlots(self.client_concurrency)
+        slots.users += 1
+        slots.waiting += 1
+        self.waiting += 1
+        queued = True
+        try:
+            async with slots.semaphore:
+                async with self._global:
+                    slots.waiting -= 1
+                    self.waiting -= 1
+                    queued = False
+                    self.active += 1
+                    self.calls += 1
+                    try:
+                        yield
+                    finally:
+                        self.active -= 1
+        finally:
+            if queued:
+                slots.waiting -= 1
+                self.waiting -= 1
+            slots.users -= 1
+            if slots.users == 0 and self._clients.get(client_id) is slots:
+                del self._clients[client_id]
+
+    def _retry_delay(self, e: Exception, attempt: int) -> Optional[float]:
+        # None means give up and re-raise
+        if isinstance(e, BackboardRateLimitError):
+            self.rate_limited += 1
+        if not is_retryable(e) or attempt >= self.max_retries:
+            return None
+        delay = retry_after(e)
+        if delay is None:
+            # Full jitter keeps retrying clients from hitting Backboard in lockstep
+            return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        return delay if delay <= self.max_delay else None
+
+    async def call(self, client_id: str, start):
+        """
+        Await start() inside a slot, retrying retryable failures.
+
+        Args:
+            client_id: The client ID the call is made for
+            start: Zero-argument callable returning a fresh awaitable per attempt
+        """
+        attempt = 0
+        while True:
+            try:
+                async with self.slot(client_id):
+                    return await start()
+            except BackboardAPIError as e:
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    self.failures += 1
+                    raise
+            attempt += 1
+            self.retries += 1
+            await asyncio.sleep(delay)
+
+    async def stream(self, client_id: str, start):
+        """
+        Iterate the stream returned by await start(), holding a slot throughout.
+
+        A failure is only retried before the first chunk arrives; once output
+        was forwarded, a retry would repeat it.
+        """
+        attempt = 0
+        while True:
+            started = False
+            try:
+                async with self.slot(client_id):
+                    async for chunk in await start():
+                        started = True
+                        yield chunk
+                    return
+            except BackboardAPIError as e:
+                delay = None if started else self._retry_delay(e, attempt)
+                if delay is None:
+                    self.failures += 1
+                    raise
+            attempt += 1
+            self.retries += 1
+            await asyncio.sleep(delay)
+
+    def stats(self) -> dict:
+        """Return queue depth, in-flight calls and retry counters."""
+        return {
+            "waiting": self.waiting,
+            "active": self.active,
+            "waiting_by_client": {
+                client_id: slots.waiting
+                for client_id, slots in self._clients.items()
+                if slots.waiting
+            },
+            "calls": self.calls,
+            "retries": self.retries,
+            "rate_limited": self.rate_limited,
+            "failures": self.failures,
+            "max_concurrency": self.max_concurrency,
+            "client_concurrency": self.client_concurrency,
+        }
+
+
+class LimitedBackboardClient:
+    """
+    BackboardClient proxy that runs every public method through a BackboardLimiter.
+
+    add_message(stream=True) returns the stream directly (no await on the
+    caller's side changes); the slot is held while it is iterated.
+    """
+
+    def __init__(self, backboard_client, limiter: BackboardLimiter, client_id: str):
+        self._backboard_client = backboard_client
+        self._limiter = limiter
+        self._client_id = client_id
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._backboard_client, name)
+        if name.startswith("_") or name == "aclose" or not callable(attr):
+            return attr
+
+        async def limited(*args, **kwargs):
+            start = lambda: attr(*args, **kwargs)
+            if kwargs.get("stream"):
+                return self._limiter.stream(self._client_id, start)
+            return await self._limiter.call(self._client_id, start)
+
+        return limited
+
+
+class _Entry:
+    def __init__(self, encrypted_key: str, backboard_client, limited):
+        self.encrypted_key = encrypted_key
+        self.backboard_client = backboard_client
+        self.limited = limited
+        self.users = 0
+        self.retired = False
+
+
+class BackboardClientPool:
+    """LRU pool of long-lived BackboardClient instances keyed by client_id."""
+
+    def __init__(self, maxsize: int = BACKBOARD_CLIENT_POOL_SIZE, limiter: BackboardLimiter = None):
+        """
+        Args:
+            maxsize: Live clients kept before the least recently used is closed
+            limiter: Limiter shared by every pooled client
+        """
+        self.maxsize = maxsize
+        self.limiter = limiter or BackboardLimiter()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @asynccontextmanager
+    async def client(self, client_id: str, encrypted_key: str):
+        """
+        Yield the pooled (limited) BackboardClient for client_id, creating it on first use.
+
+        Args:
+            client_id: The client ID
+            encrypted_key: The client's stored (encrypted) Backboard API key; a
+                different value than the pooled one rebuilds the client
+        """
+        entry = await self._acquire(client_id, encrypted_key)
+        try:
+            yield entry.limited
+        finally:
+            entry.users -= 1
+            if entry.retired and entry.users == 0:
+                await entry.backboard_client.aclose()
+
+    async def _acquire(self, client_id: str, encrypted_key: str) -> _Entry:
+        # Everything up to users += 1 runs without awaiting, so no other request
+        # can evict the entry before it is marked as in use
+        retired = []
+        entry = self._entries.get(client_id)
+        if entry is not None and entry.encrypted_key == encrypted_key:
+            self.hits += 1
+            self._entries.move_to_end(client_id)
+        else:
+            self.misses += 1
+            if entry is not None:
+                retired.append(self._entries.pop(client_id))
+            api_key = encryption.decrypt_api_key(encrypted_key)
+            backboard_client = BackboardClient(api_key=api_key)
+            entry = _Entry(
+                encrypted_key,
+                backboard_client,
+                LimitedBackboardClient(backboard_client, self.limiter, client_id),
+            )
+            self._entries[client_id] = entry
+            while len(self._entries) > self.maxsize:
+                retired.append(self._entries.popitem(last=False)[1])
+        entry.users += 1
+        for old in retired:
+            await self._retire(old)
+        return entry
+
+    async def _retire(self, entry: _Entry):
+        entry.retired = True
+        if entry.users == 0:
+            await entry.backboard_client.aclose()
+
+    async def invalidate(self, client_id: str):
+        """Drop the pooled client for client_id, e.g. after its key changed."""
+        entry = self._entries.pop(client_id, None)
+        if entry is not None:
+            await self._retire(entry)
+
+    async def close(self):
+        """Close every pooled client; call on shutdown."""
+        entries = list(self._entries.values())
+        self._entries.clear()
+        for entry in entries:
+            await self._retire(entry)
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and current size."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+        }
+
+
+_pool = BackboardClientPool()
+
+
+def client(client_id: str, encrypted_key: str):
+    """Async context manager yielding the pooled BackboardClient for client_id."""
+    return _pool.client(client_id, encrypted_key)
+
+
+def limited(client_id: str, backboard_client) -> LimitedBackboardClient:
+    """Route an unpooled BackboardClient's calls through the shared limiter."""
+    return LimitedBackboardClient(backboard_client, _pool.limiter, client_id)
+
+
+async def invalidate(client_id: str):
+    await _pool.invalidate(client_id)
+
+
+async def close():
+    await _pool.close()
+
+
+def stats() -> dict:
+    return _pool.stats()
+
+
+def limiter_stats() -> dict:
+    return _pool.limiter.stats()
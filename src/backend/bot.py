@@ -14,26 +14,26 @@ from telegram.ext import (
     filters,
     ContextTypes,
 )
-from src.backend import db
+from src.backend import async_db, db, jobs
 
 load_dotenv()
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 SERVER_URL = os.getenv("SERVER_URL", "https://rob-production.up.railway.app/")
 
 
-async def emit_telegram_event(client_id: str = None):
+@jobs.handler("telegram_event")
+async def emit_telegram_event(payload: dict):
     """
     Emit a telegram event by calling the server's /events/emit endpoint.
     This notifies the frontend that telegram data has been received.
+    Runs as a job, so a failed call (server redeploying) is retried.
     """
-    try:
-        async with httpx.AsyncClient() as client:
-            params = {"source": "telegram"}
-            if client_id:
-                params["client_id"] = client_id
-            await client.post(f"{SERVER_URL}/events/emit", params=params)
-    except Exception as e:
-        print(f"Failed to emit telegram event: {e}")
+    params = {"source": "telegram"}
+    if payload.get("client_id"):
+        params["client_id"] = payload["client_id"]
+    async with httpx.AsyncClient(timeout=10) as client:
+        response = await client.post(f"{SERVER_URL}/events/emit", params=params)
+        response.raise_for_status()
 
 
 # log_thread saves telegram messages with metadate to db, message is sent to backboard as consequence
@@ -45,10 +45,12 @@ async def log_thread(update: Update, context: ContextTypes.DEFAULT_TYPE):
     sender = msg.from_user or msg.sender_chat
     thread = f"{sender.username}: {msg.text}"
     # For testing purposes print(f"Thread to be added: {thread}, with id: {chat.id}, channel name: {chat.title}")
-    db.create_thread(chat.id, msg.chat, thread)
+    await async_db.log_message(
+        chat.id, chat.title, thread, client_id="default_user"
+    )
     
     # Log activity for dashboard
-    db.log_activity(
+    await async_db.log_activity(
         client_id="default_user", # In a real app we'd lookup the client_id
         source="Telegram",
         title=f"New message in {chat.title or 'Private Chat'}",
@@ -56,14 +58,39 @@ async def log_thread(update: Update, context: ContextTypes.DEFAULT_TYPE):
         color="purple"
     )
 
-    # Notify frontend of new telegram message
-    await emit_telegram_event()
+    # Notify frontend of new telegram message; a burst of messages queues one event
+    await jobs.enqueue(
+        "telegram_event",
+        {"client_id": "default_user"},
+        dedup_key="telegram_event:default_user",
+    )
+
+
+# The bot drains its own "telegram_event" jobs; the server never leases them
+job_workers = jobs.JobWorkerPool()
+
 
+async def start_job_workers(application):
+    job_workers.start()
 
-app = ApplicationBuilder().token(BOT_TOKEN).build()
+
+async def stop_job_workers(application):
+    await job_workers.stop()
+
+
+app = (
+    ApplicationBuilder()
+    .token(BOT_TOKEN)
+    .post_init(start_job_workers)
+    .post_shutdown(stop_job_workers)
+    .build()
+)
 
 # Bot will register and call log_thread upon receiving messages from telegram groups
 app.add_handler(MessageHandler(filters.TEXT & filters.ChatType.GROUPS, log_thread))
 
+# Make sure the schema exists before the first message arrives
+db.init_db()
+
 # App polls telegrams servers for new messages
 app.run_polling()
@@ -0,0 +1,84 @@
+"""
+In-process TTL/LRU caches with hit and miss counters.
+
+Used for read-mostly lookups (clients, assistants, repositories) that every request
+repeats. Entries expire after ttl seconds, so changes made by another process are
+picked up eventually; writers in this process invalidate the affected key directly.
+"""
+
+import threading
+from typing import Any, Callable, Hashable
+from cachetools import TTLCache
+
+
+class LookupCache:
+    """
+    Thread-safe TTL + LRU cache that counts hits and misses.
+
+    None results are never cached, so a lookup for a row that does not exist yet
+    always reaches the database.
+    """
+
+    def __init__(self, name: str, maxsize: int = 1024, ttl: float = 300):
+        """
+        Args:
+            name: Name reported in stats()
+            maxsize: Maximum entries before least recently used ones are evicted
+            ttl: Seconds an entry stays valid
+        """
+        self.name = name
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_load(self, key: Hashable, load: Callable[[], Any]):
+        """
+        Return the cached value for key, calling load() on a miss.
+
+        Args:
+            key: Cache key
+            load: Zero-argument callable that fetches the value
+
+        Returns:
+            The cached or freshly loaded value
+        """
+        with self._lock:
+            try:
+                value = self._cache[key]
+            except KeyError:
+                self.misses += 1
+            else:
+                self.hits += 1
+                return value
+        # Load outside the lock so a slow query doesn't serialize other lookups
+        value = load()
+        if value is not None:
+            with self._lock:
+                self._cache[key] = value
+        return value
+
+    def invalidate(self, key: Hashable):
+        """Forget the entry for key, if any."""
+        with self._lock:
+            self._cache.pop(key, None)
+
+    def clear(self):
+        """Forget every entry and reset the counters."""
+        with self._lock:
+            self._cache.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and current size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self._cache),
+                "maxsize": self._cache.maxsize,
+                "ttl": self._cache.ttl,
+            }
@@ -1,102 +1,762 @@
 """
 This program is designed to setup demo.db as well as utility functions
-Three tables are created
+Importing it has no side effects; call init_db() once at startup to build the
+schema. The schema is built by ordered migrations (see MIGRATIONS) and includes
     -   clients
     -   assistants
-    -   chats
+    -   messages
     -   drive_documents
+    -   document_blobs
+    -   repositories
+    -   activity_log
+    -   activity_daily
+    -   source_status
+    -   search_documents / search_index (FTS5)
+    -   sessions
+    -   webhook_deliveries
+    -   jobs
 Each table has a lookup and a create function
     -   lookup functions check if the input exists
     -   create functions add the input to the db
 """
 
+import atexit
+import hashlib
+import json
 import sqlite3
 import os
+import re
+import secrets
+import threading
+import weakref
+import zlib
+from datetime import datetime, timedelta, timezone
+from src.backend.cache import LookupCache
+from src.backend.write_buffer import WriteBuffer
 
 # Allow overriding database name for testing
 DB_NAME = os.getenv("TEST_DB_NAME", "demo.db")
 
-con = sqlite3.connect(DB_NAME)
-cur = con.cursor()
+# Document blob store
+# Drive document bodies live in document_blobs, keyed by the SHA-256 of the
+# text and stored zlib-compressed. Identical bodies (unchanged revisions, the
+# same doc registered by several clients) share one row, and drive_documents
+# only keeps a blob_hash pointer so listing documents never loads bodies.
+BLOB_COMPRESSION_LEVEL = int(os.getenv("BLOB_COMPRESSION_LEVEL", "6"))
 
-# Create tables
-cur.execute(
-    """
-    CREATE TABLE IF NOT EXISTS clients (
-        client_id TEXT PRIMARY KEY,
-        api_key TEXT
+
+def _put_blob(con, content: str):
+    """Store content (if new) and return its hash, or None for empty content."""
+    if not content:
+        return None
+    raw = content.encode("utf-8")
+    blob_hash = hashlib.sha256(raw).hexdigest()
+    data = zlib.compress(raw, BLOB_COMPRESSION_LEVEL)
+    con.execute(
+        """
+        INSERT OR IGNORE INTO document_blobs (blob_hash, data, size, compressed_size)
+        VALUES (?, ?, ?, ?)
+    """,
+        (blob_hash, data, len(raw), len(data)),
     )
-"""
-)
+    return blob_hash
 
-cur.execute(
-    """
-    CREATE TABLE IF NOT EXISTS assistants (
-        assistant_id TEXT PRIMARY KEY,
-        client_id TEXT
+
+def _get_blob(con, blob_hash: str) -> str:
+    if not blob_hash:
+        return ""
+    row = con.execute(
+        "SELECT data FROM document_blobs WHERE blob_hash = ?", (blob_hash,)
+    ).fetchone()
+    return zlib.decompress(row[0]).decode("utf-8") if row else ""
+
+
+def _release_blob(con, blob_hash: str):
+    """Delete a blob once no document points at it any more."""
+    if not blob_hash:
+        return
+    con.execute(
+        """
+        DELETE FROM document_blobs WHERE blob_hash = ?
+        AND NOT EXISTS (SELECT 1 FROM drive_documents WHERE blob_hash = ?)
+    """,
+        (blob_hash, blob_hash),
     )
-"""
-)
 
-cur.execute(
-    """
-    CREATE TABLE IF NOT EXISTS chats (
-        chat_id TEXT PRIMARY KEY,
-        channel_name TEXT,
-        chat TEXT
+
+def _move_document_content_to_blobs(con):
+    file_ids = [
+        row[0]
+        for row in con.execute(
+            "SELECT file_id FROM drive_documents WHERE content IS NOT NULL"
+        )
+    ]
+    for file_id in file_ids:
+        (content,) = con.execute(
+            "SELECT content FROM drive_documents WHERE file_id = ?", (file_id,)
+        ).fetchone()
+        con.execute(
+            "UPDATE drive_documents SET blob_hash = ?, content = NULL WHERE file_id = ?",
+            (_put_blob(con, content), file_id),
+        )
+
+
+# Full-text search index
+# search_index is an FTS5 table over Drive documents, Telegram messages and
+# ingested repository files. search_documents maps each indexed item to an
+# FTS rowid, keyed by (source, ref), so re-indexing replaces the old entry with
+# a primary-key delete instead of scanning the index. Writers keep both tables
+# in sync inside their own transactions.
+def _index_document(con, client_id, source, ref, title, body):
+    row = con.execute(
+        "SELECT id FROM search_documents WHERE source = ? AND ref = ?", (source, ref)
+    ).fetchone()
+    if row:
+        doc_id = row[0]
+        con.execute(
+            """
+            UPDATE search_documents
+            SET client_id = ?, title = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        """,
+            (client_id, title, doc_id),
+        )
+        con.execute("DELETE FROM search_index WHERE rowid = ?", (doc_id,))
+    else:
+        doc_id = con.execute(
+            "INSERT INTO search_documents (client_id, source, ref, title) VALUES (?, ?, ?, ?)",
+            (client_id, source, ref, title),
+        ).lastrowid
+    con.execute(
+        "INSERT INTO search_index (rowid, title, body) VALUES (?, ?, ?)",
+        (doc_id, title or "", body or ""),
     )
-"""
-)
 
-cur.execute(
-    """
-    CREATE TABLE IF NOT EXISTS drive_documents (
-        file_id TEXT PRIMARY KEY,
-        client_id TEXT,
-        file_name TEXT,
-        content_hash TEXT,
-        last_modified TEXT,
-        content TEXT,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+
+def _unindex_document(con, source, ref):
+    row = con.execute(
+        "SELECT id FROM search_documents WHERE source = ? AND ref = ?", (source, ref)
+    ).fetchone()
+    if row:
+        con.execute("DELETE FROM search_index WHERE rowid = ?", (row[0],))
+        con.execute("DELETE FROM search_documents WHERE id = ?", (row[0],))
+
+
+def _backfill_search_index(con):
+    documents = con.execute(
+        "SELECT file_id, client_id, file_name, blob_hash FROM drive_documents"
+    ).fetchall()
+    for file_id, client_id, file_name, blob_hash in documents:
+        _index_document(
+            con, client_id, "Drive", file_id, file_name, _get_blob(con, blob_hash)
+        )
+    chats = con.execute("SELECT chat_id, channel_name, chat FROM chats").fetchall()
+    for chat_id, channel_name, chat in chats:
+        _index_document(con, None, "Telegram", str(chat_id), channel_name, chat)
+
+
+# Job queue helpers (see "Job queue" below)
+def _enqueue_job(con, kind, payload, dedup_key=None, max_attempts=5, delay=0.0):
+    """Insert a queued job inside the caller's transaction; None if deduplicated."""
+    now = _utc_timestamp()
+    cur = con.execute(
+        """
+        INSERT OR IGNORE INTO jobs
+            (kind, payload, dedup_key, max_attempts, run_after, created_at, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """,
+        (
+            kind,
+            json.dumps(payload),
+            dedup_key,
+            max_attempts,
+            _utc_timestamp(-delay / 86400),
+            now,
+            now,
+        ),
     )
-"""
-)
+    return cur.lastrowid if cur.rowcount else None
 
 
-cur.execute(
+def _queue_pending_deliveries(con):
+    # Deliveries the old in-process worker had not finished become jobs
+    con.execute("UPDATE webhook_deliveries SET status = 'queued' WHERE status = 'running'")
+    pending = con.execute(
+        "SELECT delivery_id FROM webhook_deliveries WHERE status = 'queued'"
+    ).fetchall()
+    for (delivery_id,) in pending:
+        _enqueue_job(
+            con, "git_push", {"delivery_id": delivery_id}, f"git_push:{delivery_id}"
+        )
+
+
+# Schema migrations
+# Migrations are applied in order and recorded in schema_version, so an
+# existing database is upgraded in place without dropping data. Each step is
+# either a SQL statement or a callable taking the connection. Append new
+# migrations to the end of the list; never edit one that has shipped.
+MIGRATIONS = [
+    (
+        1,
+        "initial tables",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS clients (
+                client_id TEXT PRIMARY KEY,
+                api_key TEXT
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS assistants (
+                assistant_id TEXT PRIMARY KEY,
+                client_id TEXT
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS chats (
+                chat_id TEXT PRIMARY KEY,
+                channel_name TEXT,
+                chat TEXT
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS drive_documents (
+                file_id TEXT PRIMARY KEY,
+                client_id TEXT,
+                file_name TEXT,
+                content_hash TEXT,
+                last_modified TEXT,
+                content TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS repositories (
+                repo_url TEXT PRIMARY KEY,
+                client_id TEXT
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS activity_log (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                client_id TEXT,
+                source TEXT,
+                title TEXT,
+                summary TEXT,
+                color TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+        ],
+    ),
+    (
+        2,
+        "secondary indexes for hot lookups",
+        [
+            "CREATE INDEX IF NOT EXISTS idx_assistants_client_id ON assistants (client_id)",
+            "CREATE INDEX IF NOT EXISTS idx_drive_documents_client_id ON drive_documents (client_id)",
+            "CREATE INDEX IF NOT EXISTS idx_repositories_client_id ON repositories (client_id)",
+            "CREATE INDEX IF NOT EXISTS idx_activity_log_client_created ON activity_log (client_id, created_at)",
+        ],
+    ),
+    (
+        3,
+        "content-addressed blob store for drive document bodies",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS document_blobs (
+                blob_hash TEXT PRIMARY KEY,
+                data BLOB NOT NULL,
+                size INTEGER,
+                compressed_size INTEGER,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+            "ALTER TABLE drive_documents ADD COLUMN blob_hash TEXT",
+            "CREATE INDEX IF NOT EXISTS idx_drive_documents_blob_hash ON drive_documents (blob_hash)",
+            _move_document_content_to_blobs,
+        ],
+    ),
+    (
+        4,
+        "keyset pagination index for drive documents",
+        [
+            "CREATE INDEX IF NOT EXISTS idx_drive_documents_client_file ON drive_documents (client_id, file_id)",
+            # Superseded by the composite index above
+            "DROP INDEX IF EXISTS idx_drive_documents_client_id",
+        ],
+    ),
+    (
+        5,
+        "order the activity feed by id",
+        [
+            "CREATE INDEX IF NOT EXISTS idx_activity_log_client_id ON activity_log (client_id, id)",
+            # The feed no longer sorts by created_at (second resolution, unstable on ties)
+            "DROP INDEX IF EXISTS idx_activity_log_client_created",
+        ],
+    ),
+    (
+        6,
+        "per-day activity summaries for compacted rows",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS activity_daily (
+                client_id TEXT,
+                day TEXT,
+                source TEXT,
+                event_count INTEGER,
+                first_at TIMESTAMP,
+                last_at TIMESTAMP,
+                PRIMARY KEY (client_id, day, source)
+            )
+            """,
+        ],
+    ),
+    (
+        7,
+        "shard catalog",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS client_shards (
+                client_id TEXT PRIMARY KEY,
+                shard TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+        ],
+    ),
+    (
+        8,
+        "per-source status kept up to date on every write",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS source_status (
+                client_id TEXT,
+                source TEXT,
+                last_event_at TIMESTAMP,
+                event_count INTEGER NOT NULL DEFAULT 0,
+                document_count INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (client_id, source)
+            )
+            """,
+            # Backfill from the raw and compacted activity already stored
+            """
+            INSERT OR IGNORE INTO source_status (client_id, source, last_event_at, event_count)
+            SELECT client_id, source, MAX(last_at), SUM(events) FROM (
+                SELECT client_id, source, MAX(created_at) AS last_at, COUNT(*) AS events
+                FROM activity_log GROUP BY client_id, source
+                UNION ALL
+                SELECT client_id, source, MAX(last_at), SUM(event_count)
+                FROM activity_daily GROUP BY client_id, source
+            )
+            GROUP BY client_id, source
+            """,
+            """
+            INSERT INTO source_status (client_id, source, last_event_at, document_count)
+            SELECT client_id, 'Drive', MAX(updated_at), COUNT(*)
+            FROM drive_documents WHERE true GROUP BY client_id
+            ON CONFLICT (client_id, source) DO UPDATE SET
+                document_count = excluded.document_count,
+                last_event_at = MAX(
+                    COALESCE(last_event_at, excluded.last_event_at),
+                    COALESCE(excluded.last_event_at, last_event_at)
+                )
+            """,
+        ],
+    ),
+    (
+        9,
+        "full-text search index",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS search_documents (
+                id INTEGER PRIMARY KEY,
+                client_id TEXT,
+                source TEXT NOT NULL,
+                ref TEXT NOT NULL,
+                title TEXT,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE (source, ref)
+            )
+            """,
+            # Underscores are token characters so identifiers match as a whole
+            """
+            CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+                title, body, tokenize = "unicode61 tokenchars '_'"
+            )
+            """,
+            _backfill_search_index,
+        ],
+    ),
+    (
+        10,
+        "append-only telegram messages replace chats",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS messages (
+                id INTEGER PRIMARY KEY,
+                client_id TEXT,
+                chat_id TEXT NOT NULL,
+                channel_name TEXT,
+                message TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_messages_chat_created ON messages (chat_id, created_at)",
+            """
+            INSERT INTO messages (chat_id, channel_name, message)
+            SELECT chat_id, channel_name, chat FROM chats
+            """,
+            # Search entries for chats now point at the individual message
+            """
+            UPDATE search_documents
+            SET ref = (
+                SELECT m.chat_id || ':' || m.id FROM messages m
+                WHERE m.chat_id = search_documents.ref
+            )
+            WHERE source = 'Telegram' AND ref IN (SELECT chat_id FROM messages)
+            """,
+            "DROP TABLE IF EXISTS chats",
+        ],
+    ),
+    (
+        11,
+        "conversation sessions mapped to backboard threads",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                client_id TEXT NOT NULL,
+                thread_id TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                last_used_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_sessions_last_used ON sessions (last_used_at)",
+        ],
+    ),
+    (
+        12,
+        "git webhook deliveries queued for background ingestion",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS webhook_deliveries (
+                delivery_id TEXT PRIMARY KEY,
+                client_id TEXT NOT NULL,
+                repo_url TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'queued',
+                result TEXT,
+                error TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_webhook_deliveries_status ON webhook_deliveries (status, created_at)",
+        ],
+    ),
+    (
+        13,
+        "durable background job queue",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                dedup_key TEXT,
+                status TEXT NOT NULL DEFAULT 'queued',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL DEFAULT 5,
+                run_after TIMESTAMP NOT NULL,
+                lease_owner TEXT,
+                leased_until TIMESTAMP,
+                last_error TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_jobs_ready ON jobs (status, run_after)",
+            # At most one waiting job per dedup key; a running job doesn't block
+            # queueing the next one
+            """
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_dedup ON jobs (dedup_key)
+            WHERE status = 'queued' AND dedup_key IS NOT NULL
+            """,
+            _queue_pending_deliveries,
+        ],
+    ),
+    (
+        14,
+        "webhook delivery progress, so retries resume the backboard send",
+        [
+            "ALTER TABLE webhook_deliveries ADD COLUMN thread_id TEXT",
+            "ALTER TABLE webhook_deliveries ADD COLUMN messages_sent INTEGER NOT NULL DEFAULT 0",
+        ],
+    ),
+]
+
+
+def get_schema_version(con) -> int:
+    """Return the highest migration version applied to the database."""
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
     """
-    CREATE TABLE IF NOT EXISTS repositories (
-        repo_url TEXT PRIMARY KEY,
-        client_id TEXT
     )
-"""
-)
+    row = con.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
 
-cur.execute(
+def apply_migrations(con) -> int:
     """
-    CREATE TABLE IF NOT EXISTS activity_log (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        client_id TEXT,
-        source TEXT,
-        title TEXT,
-        summary TEXT,
-        color TEXT,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )
-"""
-)
+    Apply every pending migration to the database behind con.
+
+    Each migration runs in its own IMMEDIATE transaction, so concurrent
+    processes (server, bot) starting at the same time apply it only once.
+
+    Returns:
+        The schema version after migrating
+    """
+    version = get_schema_version(con)
+    for number, description, steps in MIGRATIONS:
+        if number <= version:
+            continue
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            # Another process may have migrated while we waited for the lock
+            if get_schema_version(con) >= number:
+                con.rollback()
+                continue
+            for step in steps:
+                if callable(step):
+                    step(con)
+                else:
+                    con.execute(step)
+            con.execute(
+                "INSERT INTO schema_version (version, description) VALUES (?, ?)",
+                (number, description),
+            )
+            con.commit()
+        except Exception:
+            con.rollback()
+            raise
+        version = number
+    return version
+
+
+# Connection management
+# Each thread keeps one long-lived connection per database file instead of
+# opening and closing a connection for every statement. Connections are
+# configured once when they are opened (WAL journaling, busy timeout and
+# synchronous level). A thread's connections are closed when the thread exits,
+# so short-lived threads (asyncio.to_thread, the default executor) don't leak
+# file handles, and every remaining one is closed by close_connections().
+BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+SYNCHRONOUS = os.getenv("DB_SYNCHRONOUS", "NORMAL")
 
-def get_connection():
-    con = sqlite3.connect(DB_NAME)
+def _close_each(connections: dict):
+    for con in list(connections.values()):
+        try:
+            con.close()
+        except sqlite3.Error:
+            pass
+    connections.clear()
+
+
+class _ThreadConnections:
+    """One thread's connections by database path, closed when the thread exits."""
+
+    def __init__(self):
+        self.connections = {}
+        # Runs once the thread-local holding this object is dropped at thread exit
+        weakref.finalize(self, _close_each, self.connections)
+
+
+_local = threading.local()
+# Live threads' connections, for close_connections(); exited threads drop out
+_thread_connections = weakref.WeakSet()
+_connections_lock = threading.Lock()
+# Bumped by close_connections() so every thread drops its closed handles
+_pool_generation = 0
+# Database files whose schema init_db() has brought up to date in this process
+_initialized_paths = set()
+_init_lock = threading.Lock()
+
+
+def _configure_connection(con):
     con.row_factory = sqlite3.Row
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    con.execute(f"PRAGMA synchronous={SYNCHRONOUS}")
+
+
+def get_connection(db_path: str = None):
+    """
+    Return the calling thread's pooled connection, opening it on first use.
+
+    Args:
+        db_path: Database file to connect to (defaults to DB_NAME); shard files
+            are migrated the first time any thread opens them
+    """
+    db_path = db_path or DB_NAME
+    if getattr(_local, "generation", None) != _pool_generation:
+        _local.pool = _ThreadConnections()
+        _local.generation = _pool_generation
+        with _connections_lock:
+            _thread_connections.add(_local.pool)
+    connections = _local.pool.connections
+    con = connections.get(db_path)
+    if con is None:
+        con = sqlite3.connect(
+            db_path, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False
+        )
+        _configure_connection(con)
+        connections[db_path] = con
+        # Shard files appear at runtime, so they are migrated on first open
+        if db_path != DB_NAME:
+            init_db(db_path)
     return con
 
 
+def init_db(db_path: str = None) -> bool:
+    """
+    Create or upgrade the schema, once per database file and process.
+
+    Run from the server lifespan and the bot entry point; later calls return
+    immediately.
+
+    Args:
+        db_path: Database file to initialize (defaults to DB_NAME)
+
+    Returns:
+        True if this call applied the migrations, False if already initialized
+    """
+    db_path = db_path or DB_NAME
+    if db_path in _initialized_paths:
+        return False
+    with _init_lock:
+        if db_path in _initialized_paths:
+            return False
+        # A short-lived connection, so no handle outlives initialization
+        con = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT_MS / 1000)
+        try:
+            _configure_connection(con)
+            apply_migrations(con)
+        finally:
+            con.close()
+        _initialized_paths.add(db_path)
+    return True
+
+
+def close_connections():
+    """Close every pooled connection, e.g. on shutdown or between tests."""
+    global _pool_generation
+    with _connections_lock:
+        pools = list(_thread_connections)
+        _thread_connections.clear()
+        _pool_generation += 1
+    for pool in pools:
+        _close_each(pool.connections)
+
+
+# Sharding
+# With DB_SHARD_MODE unset every table lives in DB_NAME. In "tenant" mode each
+# client's drive documents, activity and messages get their own database file; in
+# "hashed" mode clients are spread over DB_SHARD_COUNT files by a stable hash of
+# client_id. DB_NAME then acts as the catalog: client_shards records which file
+# each client lives in, so a client never moves even if DB_SHARD_COUNT changes.
+# Pick the mode before data is written; switching later strands existing rows.
+DB_SHARD_MODE = os.getenv("DB_SHARD_MODE", "").lower()
+DB_SHARD_COUNT = int(os.getenv("DB_SHARD_COUNT", "8"))
+# Directory for shard files (defaults to "<DB_NAME without extension>_shards")
+DB_SHARD_DIR = os.getenv("DB_SHARD_DIR")
+
+_shard_cache = LookupCache("shards", maxsize=4096, ttl=3600)
+
+
+def _shard_dir() -> str:
+    return DB_SHARD_DIR or os.path.splitext(DB_NAME)[0] + "_shards"
+
+
+def _shard_name(client_id: str) -> str:
+    digest = hashlib.sha1(client_id.encode("utf-8")).hexdigest()
+    if DB_SHARD_MODE == "tenant":
+        safe_id = re.sub(r"[^A-Za-z0-9_-]", "_", client_id)[:40]
+        return f"client_{safe_id}_{digest[:8]}.db"
+    return f"shard_{int(digest, 16) % DB_SHARD_COUNT:03d}.db"
+
+
+def _assign_shard(client_id: str) -> str:
+    os.makedirs(_shard_dir(), exist_ok=True)
+    con = get_connection()
+    with con:
+        con.execute(
+            "INSERT OR IGNORE INTO client_shards (client_id, shard) VALUES (?, ?)",
+            (client_id, _shard_name(client_id)),
+        )
+    row = con.execute(
+        "SELECT shard FROM client_shards WHERE client_id = ?", (client_id,)
+    ).fetchone()
+    return row["shard"]
+
+
+def client_db_path(client_id: str) -> str:
+    """Return the database file holding a client's documents, activity and messages."""
+    if DB_SHARD_MODE not in ("tenant", "hashed") or not client_id:
+        return DB_NAME
+    shard = _shard_cache.get_or_load(client_id, lambda: _assign_shard(client_id))
+    return os.path.join(_shard_dir(), shard)
+
+
+def _client_connection(client_id: str):
+    return get_connection(client_db_path(client_id))
+
+
+def all_database_paths() -> list:
+    """Return DB_NAME followed by every shard file known to the catalog."""
+    paths = [DB_NAME]
+    if DB_SHARD_MODE in ("tenant", "hashed"):
+        rows = get_connection().execute(
+            "SELECT DISTINCT shard FROM client_shards ORDER BY shard"
+        )
+        paths += [os.path.join(_shard_dir(), row["shard"]) for row in rows]
+    return paths
+
+
+# Lookup caches
+# Clients, assistants and repositories are read on every request but almost
+# never change, so lookups go through in-process TTL/LRU caches. The create
+# functions invalidate the keys they write; the TTL bounds how long a change
+# made by another process (e.g. the bot) can go unnoticed.
+LOOKUP_CACHE_SIZE = int(os.getenv("LOOKUP_CACHE_SIZE", "1024"))
+LOOKUP_CACHE_TTL = float(os.getenv("LOOKUP_CACHE_TTL", "300"))
+
+_client_cache = LookupCache("clients", LOOKUP_CACHE_SIZE, LOOKUP_CACHE_TTL)
+_assistant_cache = LookupCache("assistants", LOOKUP_CACHE_SIZE, LOOKUP_CACHE_TTL)
+_repository_cache = LookupCache("repositories", LOOKUP_CACHE_SIZE, LOOKUP_CACHE_TTL)
+_lookup_caches = (_client_cache, _assistant_cache, _repository_cache, _shard_cache)
+
+
+def cache_stats() -> dict:
+    """Return hit/miss counters for every lookup cache, keyed by cache name."""
+    return {cache.name: cache.stats() for cache in _lookup_caches}
+
+
+def clear_caches():
+    """Drop every cached lookup and reset the counters."""
+    for cache in _lookup_caches:
+        cache.clear()
+
+
 # client functions
-def lookup_client(client_id: str):
+def _query_client(client_id: str):
     con = get_connection()
-    con.row_factory = sqlite3.Row
     cur = con.cursor()
     cur.execute(
         """
@@ -105,28 +765,31 @@ def lookup_client(client_id: str):
         (client_id,),
     )
     client = cur.fetchone()
-    con.close()
     return dict(client) if client else None
 
 
+def lookup_client(client_id: str):
+    row = _client_cache.get_or_load(client_id, lambda: _query_client(client_id))
+    # Hand out a copy so callers can't mutate the cached row
+    return dict(row) if row else None
+
+
 def create_client(client_id: str, api_key: str):
     con = get_connection()
-    con.row_factory = sqlite3.Row
-    cur = con.cursor()
-    cur.execute(
-        """
-        INSERT INTO clients (client_id, api_key) VALUES (?, ?)
-    """,
-        (client_id, str(api_key)),
-    )
-    con.commit()
-    con.close()
+    with con:
+        cur = con.cursor()
+        cur.execute(
+            """
+            INSERT INTO clients (client_id, api_key) VALUES (?, ?)
+        """,
+            (client_id, str(api_key)),
+        )
+    _client_cache.invalidate(client_id)
 
 
 # Assistant functions
-def lookup_assistant(client_id: str):
+def _query_assistant(client_id: str):
     con = get_connection()
-    con.row_factory = sqlite3.Row
     cur = con.cursor()
     cur.execute(
         """
@@ -135,68 +798,398 @@ def lookup_assistant(client_id: str):
         (client_id,),
     )
     assistant = cur.fetchone()
-    con.close()
     return dict(assistant) if assistant else None
 
 
-def create_assistant(assistant_id: str, client_id: str):
-    con = get_connection()
-    con.row_factory = sqlite3.Row
-    cur = con.cursor()
-    cur.execute(
-        """
-        INSERT INTO assistants (assistant_id, client_id) VALUES (?, ?)
-""",
-        (str(assistant_id), client_id),
-    )
-    con.commit()
-    con.close()
+def lookup_assistant(client_id: str):
+    row = _assistant_cache.get_or_load(client_id, lambda: _query_assistant(client_id))
+    return dict(row) if row else None
 
 
-# Thread functions
-def lookup_thread(chat_id: str):
+def create_assistant(assistant_id: str, client_id: str):
     con = get_connection()
-    con.row_factory = sqlite3.Row
-    cur = con.cursor()
-    cur.execute(
-        """
-        SELECT * FROM chats WHERE chat_id = ?
+    with con:
+        cur = con.cursor()
+        cur.execute(
+            """
+            INSERT INTO assistants (assistant_id, client_id) VALUES (?, ?)
     """,
-        (chat_id,),
+            (str(assistant_id), client_id),
+        )
+    _assistant_cache.invalidate(client_id)
+
+
+# Message functions
+# Telegram messages are append-only rows in messages, indexed by
+# (chat_id, created_at). Like activity, they are buffered and written in
+# batches so a busy group doesn't pay one commit per message; readers flush
+# first so every row they see has its final id.
+MESSAGE_FLUSH_ROWS = int(os.getenv("MESSAGE_FLUSH_ROWS", "100"))
+MESSAGE_FLUSH_INTERVAL = float(os.getenv("MESSAGE_FLUSH_INTERVAL", "1.0"))
+# Default number of messages returned by the range helpers
+MESSAGE_PAGE_SIZE = 100
+
+
+def _write_message_rows(rows):
+    # One transaction per database file
+    batches = {}
+    for row in rows:
+        batches.setdefault(client_db_path(row[0]), []).append(row)
+    for db_path, batch in batches.items():
+        con = get_connection(db_path)
+        with con:
+            for row in batch:
+                # Inserted one at a time for the id, but still in a single commit
+                message_id = con.execute(
+                    """
+                    INSERT INTO messages (client_id, chat_id, channel_name, message, created_at)
+                    VALUES (?, ?, ?, ?, ?)
+                """,
+                    row,
+                ).lastrowid
+                _index_document(
+                    con, row[0], "Telegram", f"{row[1]}:{message_id}", row[2], row[3]
+                )
+
+
+_message_buffer = WriteBuffer(
+    _write_message_rows,
+    max_rows=MESSAGE_FLUSH_ROWS,
+    max_delay=MESSAGE_FLUSH_INTERVAL,
+    name="message-writer",
+)
+
+
+def _flush_pending_messages():
+    if _message_buffer.pending():
+        _message_buffer.flush()
+
+
+def log_message(chat_id: str, channel_name: str, message: str, client_id: str = None):
+    """Append a chat message; it is written with the next batch."""
+    _message_buffer.add(
+        (client_id, str(chat_id), channel_name, message, _utc_timestamp())
     )
-    chat = cur.fetchone()
-    con.close()
-    return dict(chat) if chat else None
 
 
-def create_thread(chat_id: str, channel_name: str, chat: str):
-    con = get_connection()
-    con.row_factory = sqlite3.Row
-    cur = con.cursor()
-    cur.execute(
+def flush_messages() -> int:
+    """Write buffered messages now. Returns the number of rows written."""
+    return _message_buffer.flush()
+
+
+def get_messages(
+    chat_id: str,
+    since: str = None,
+    until: str = None,
+    limit: int = MESSAGE_PAGE_SIZE,
+    client_id: str = None,
+):
+    """
+    Return a chat's messages with since <= created_at < until, oldest first.
+
+    Args:
+        chat_id: Telegram chat id
+        since: Inclusive lower bound ("YYYY-MM-DD HH:MM:SS" UTC); None for the start
+        until: Exclusive upper bound; None for now
+        limit: Maximum number of messages
+        client_id: Owner of the chat, used to pick the shard
+    """
+    _flush_pending_messages()
+    sql = "SELECT * FROM messages WHERE chat_id = ?"
+    params = [str(chat_id)]
+    if since is not None:
+        sql += " AND created_at >= ?"
+        params.append(since)
+    if until is not None:
+        sql += " AND created_at < ?"
+        params.append(until)
+    sql += " ORDER BY created_at, id LIMIT ?"
+    params.append(limit)
+    con = _client_connection(client_id)
+    return [dict(row) for row in con.execute(sql, params)]
+
+
+def get_recent_messages(
+    chat_id: str, limit: int = MESSAGE_PAGE_SIZE, client_id: str = None
+):
+    """Return the last limit messages of a chat, oldest first."""
+    _flush_pending_messages()
+    con = _client_connection(client_id)
+    rows = con.execute(
         """
-        INSERT INTO chats (chat_id, channel_name, chat) VALUES (?, ?, ?)
+        SELECT * FROM messages WHERE chat_id = ?
+        ORDER BY created_at DESC, id DESC
+        LIMIT ?
     """,
-        (chat_id, channel_name, chat),
+        (str(chat_id), limit),
+    ).fetchall()
+    return [dict(row) for row in reversed(rows)]
+
+
+# Session functions
+# A session maps an opaque session_id handed to the caller onto a Backboard
+# thread, so follow-up messages reuse the thread (and its context) instead of
+# creating a new one per message. Sessions idle for longer than
+# SESSION_IDLE_TIMEOUT seconds expire and are pruned by the retention pass.
+SESSION_IDLE_TIMEOUT = float(os.getenv("SESSION_IDLE_TIMEOUT", "1800"))
+
+
+def create_session(client_id: str, thread_id: str) -> str:
+    """Store a new session for thread_id and return its id."""
+    session_id = secrets.token_urlsafe(16)
+    con = _client_connection(client_id)
+    with con:
+        con.execute(
+            """
+            INSERT INTO sessions (session_id, client_id, thread_id, created_at, last_used_at)
+            VALUES (?, ?, ?, ?, ?)
+        """,
+            (session_id, client_id, thread_id, _utc_timestamp(), _utc_timestamp()),
+        )
+    return session_id
+
+
+def use_session(client_id: str, session_id: str):
+    """
+    Return the thread_id of a live session and mark it as used.
+
+    Returns None if the session does not exist, belongs to another client or
+    has been idle for longer than SESSION_IDLE_TIMEOUT.
+    """
+    now = _utc_timestamp()
+    cutoff = _utc_timestamp(SESSION_IDLE_TIMEOUT / 86400)
+    con = _client_connection(client_id)
+    with con:
+        cur = con.execute(
+            """
+            UPDATE sessions SET last_used_at = ?
+            WHERE session_id = ? AND client_id = ? AND last_used_at >= ?
+        """,
+            (now, session_id, client_id, cutoff),
+        )
+        if cur.rowcount == 0:
+            return None
+        row = con.execute(
+            "SELECT thread_id FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+    return row["thread_id"]
+
+
+def end_session(client_id: str, session_id: str) -> bool:
+    """Delete a session. Returns False if it did not exist."""
+    con = _client_connection(client_id)
+    with con:
+        cur = con.execute(
+            "DELETE FROM sessions WHERE session_id = ? AND client_id = ?",
+            (session_id, client_id),
+        )
+    return cur.rowcount > 0
+
+
+def expire_sessions(db_path: str = None) -> int:
+    """Delete sessions idle for longer than SESSION_IDLE_TIMEOUT; returns the count."""
+    cutoff = _utc_timestamp(SESSION_IDLE_TIMEOUT / 86400)
+    con = get_connection(db_path)
+    with con:
+        cur = con.execute("DELETE FROM sessions WHERE last_used_at < ?", (cutoff,))
+    return cur.rowcount
+
+
+# Thread functions
+# Kept for existing callers; a "thread" is now the stream of a chat's messages
+def lookup_thread(chat_id: str, client_id: str = None):
+    """Return the latest message of a chat, or None if it has none."""
+    messages = get_recent_messages(chat_id, limit=1, client_id=client_id)
+    return messages[0] if messages else None
+
+
+def create_thread(chat_id: str, channel_name: str, chat: str, client_id: str = None):
+    """Append a message to a chat (see log_message)."""
+    log_message(chat_id, channel_name, chat, client_id)
+
+
+# Source status
+# source_status holds one row per (client, source) with the last event time,
+# the number of activity events and the number of stored documents. Writers
+# update it in the same transaction as the rows they insert, so readers such
+# as /system/status never have to scan activity_log or drive_documents.
+_SOURCE_STATUS_UPSERT = """
+    INSERT INTO source_status (client_id, source, last_event_at, event_count, document_count)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (client_id, source) DO UPDATE SET
+        last_event_at = MAX(
+            COALESCE(last_event_at, excluded.last_event_at),
+            COALESCE(excluded.last_event_at, last_event_at)
+        ),
+        event_count = event_count + excluded.event_count,
+        document_count = document_count + excluded.document_count
+"""
+
+
+def _bump_source_status(con, client_id, source, seen_at, events=0, documents=0):
+    # Called inside the writer's transaction
+    con.execute(
+        _SOURCE_STATUS_UPSERT, (client_id, source, seen_at, events, documents)
     )
-    con.commit()
-    con.close()
+
+
+def get_source_status(client_id: str) -> dict:
+    """
+    Return the status of every source a client has used, keyed by source name.
+
+    Each entry has last_event_at, event_count and document_count. Activity
+    still waiting in the write buffer is included.
+    """
+    with _activity_buffer.reading() as pending:
+        con = _client_connection(client_id)
+        rows = con.execute(
+            """
+            SELECT source, last_event_at, event_count, document_count
+            FROM source_status WHERE client_id = ?
+        """,
+            (client_id,),
+        ).fetchall()
+    status = {row["source"]: dict(row) for row in rows}
+    for row in pending:
+        if row[0] != client_id:
+            continue
+        entry = status.setdefault(
+            row[1],
+            {"source": row[1], "last_event_at": None, "event_count": 0, "document_count": 0},
+        )
+        entry["event_count"] += 1
+        entry["last_event_at"] = max(entry["last_event_at"] or "", row[5])
+    return status
+
+
+# Search
+SEARCH_SOURCES = ("Drive", "Telegram", "GitHub")
+
+
+def _match_expression(query: str) -> str:
+    # Quote every term so identifiers and punctuation are matched literally
+    # instead of being parsed as FTS5 operators; terms are ANDed together
+    terms = query.split()
+    return " ".join('"' + term.replace('"', '""') + '"' for term in terms)
+
+
+def index_repository_files(client_id: str, repo_url: str, files, removed=()):
+    """
+    Add or replace ingested repository files in the search index.
+
+    Args:
+        client_id: Owner of the repository
+        repo_url: Repository URL, used to build each file's ref
+        files: Iterable of (path, content) pairs
+        removed: Paths deleted from the repository
+    """
+    con = _client_connection(client_id)
+    with con:
+        for path, content in files:
+            _index_document(con, client_id, "GitHub", f"{repo_url}#{path}", path, content)
+        for path in removed:
+            _unindex_document(con, "GitHub", f"{repo_url}#{path}")
+
+
+def search(client_id: str, query: str, limit: int = 20, source: str = None):
+    """
+    Run a ranked keyword search over a client's indexed content.
+
+    Args:
+        client_id: Client whose content is searched
+        query: Whitespace-separated terms; all of them must match
+        limit: Maximum number of results
+        source: Restrict results to one of SEARCH_SOURCES
+
+    Returns:
+        List of dicts with source, ref, title, snippet and score, best first
+        (lower scores rank higher)
+
+    Raises:
+        ValueError: If the query is empty or source is unknown
+    """
+    expression = _match_expression(query)
+    if not expression:
+        raise ValueError("Empty search query")
+    if source is not None and source not in SEARCH_SOURCES:
+        raise ValueError(f"Unknown source: {source}")
+    _flush_pending_messages()
+
+    sql = """
+        SELECT d.source, d.ref, d.title, d.updated_at,
+               snippet(search_index, 1, '**', '**', '...', 16) AS snippet,
+               bm25(search_index, 5.0, 1.0) AS score
+        FROM search_index
+        JOIN search_documents d ON d.id = search_index.rowid
+        WHERE search_index MATCH ? AND d.client_id = ?
+    """
+    params = [expression, client_id]
+    if source is not None:
+        sql += " AND d.source = ?"
+        params.append(source)
+    sql += " ORDER BY score LIMIT ?"
+    params.append(limit)
+
+    con = _client_connection(client_id)
+    return [dict(row) for row in con.execute(sql, params)]
 
 
 # Drive document functions
-def lookup_drive_document(file_id: str):
-    con = get_connection()
-    con.row_factory = sqlite3.Row
+# Columns returned by the metadata-only listing queries (bodies are excluded)
+DRIVE_DOCUMENT_COLUMNS = (
+    "file_id",
+    "client_id",
+    "file_name",
+    "content_hash",
+    "last_modified",
+    "created_at",
+    "updated_at",
+)
+
+
+def _document_connection(file_id: str, client_id: str = None):
+    """Return the connection whose database holds file_id, or None if unregistered."""
+    if client_id:
+        return _client_connection(client_id)
+    # Without a client we have to ask each shard (just DB_NAME when unsharded)
+    for db_path in all_database_paths():
+        con = get_connection(db_path)
+        row = con.execute(
+            "SELECT 1 FROM drive_documents WHERE file_id = ?", (file_id,)
+        ).fetchone()
+        if row:
+            return con
+    return None
+
+
+def lookup_drive_document(
+    file_id: str, include_content: bool = True, client_id: str = None
+):
+    con = _document_connection(file_id, client_id)
+    if con is None:
+        return None
     cur = con.cursor()
     cur.execute(
-        """
-        SELECT * FROM drive_documents WHERE file_id = ?
+        f"""
+        SELECT {", ".join(DRIVE_DOCUMENT_COLUMNS)}, blob_hash
+        FROM drive_documents WHERE file_id = ?
     """,
         (file_id,),
     )
     doc = cur.fetchone()
-    con.close()
-    return dict(doc) if doc else None
+    if not doc:
+        return None
+    doc = dict(doc)
+    blob_hash = doc.pop("blob_hash")
+    if include_content:
+        doc["content"] = _get_blob(con, blob_hash)
+    return doc
+
+
+def get_drive_document_content(file_id: str, client_id: str = None):
+    """Return the decompressed body of a document, or None if it isn't registered."""
+    doc = lookup_drive_document(file_id, client_id=client_id)
+    return doc["content"] if doc else None
 
 
 def create_drive_document(
@@ -207,70 +1200,140 @@ def create_drive_document(
     last_modified: str,
     content: str,
 ):
-    con = get_connection()
-    con.row_factory = sqlite3.Row
-    cur = con.cursor()
-    cur.execute(
-        """
-        INSERT INTO drive_documents 
-        (file_id, client_id, file_name, content_hash, last_modified, content) 
-        VALUES (?, ?, ?, ?, ?, ?)
-    """,
-        (file_id, client_id, file_name, content_hash, last_modified, content),
-    )
-    con.commit()
-    con.close()
+    con = _client_connection(client_id)
+    with con:
+        cur = con.cursor()
+        cur.execute(
+            """
+            INSERT INTO drive_documents
+            (file_id, client_id, file_name, content_hash, last_modified, blob_hash)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """,
+            (
+                file_id,
+                client_id,
+                file_name,
+                content_hash,
+                last_modified,
+                _put_blob(con, content),
+            ),
+        )
+        _bump_source_status(con, client_id, "Drive", _utc_timestamp(), documents=1)
+        _index_document(con, client_id, "Drive", file_id, file_name, content)
 
 
-def update_drive_document(file_id: str, content_hash: str, content: str):
-    con = get_connection()
-    con.row_factory = sqlite3.Row
-    cur = con.cursor()
-    cur.execute(
-        """
-        UPDATE drive_documents 
-        SET content_hash = ?, content = ?, updated_at = CURRENT_TIMESTAMP
-        WHERE file_id = ?
-    """,
-        (content_hash, content, file_id),
-    )
-    con.commit()
-    con.close()
+def update_drive_document(
+    file_id: str, content_hash: str, content: str, client_id: str = None
+):
+    con = _document_connection(file_id, client_id)
+    if con is None:
+        return
+    with con:
+        cur = con.cursor()
+        row = cur.execute(
+            "SELECT client_id, file_name, blob_hash FROM drive_documents WHERE file_id = ?",
+            (file_id,),
+        ).fetchone()
+        cur.execute(
+            """
+            UPDATE drive_documents
+            SET content_hash = ?, blob_hash = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE file_id = ?
+        """,
+            (content_hash, _put_blob(con, content), file_id),
+        )
+        if row:
+            _release_blob(con, row["blob_hash"])
+            _bump_source_status(con, row["client_id"], "Drive", _utc_timestamp())
+            _index_document(
+                con, row["client_id"], "Drive", file_id, row["file_name"], content
+            )
 
 
 def get_all_drive_documents_for_client(client_id: str):
-    con = get_connection()
-    con.row_factory = sqlite3.Row
+    """Return metadata for every document of a client; bodies are not loaded."""
+    con = _client_connection(client_id)
     cur = con.cursor()
     cur.execute(
-        """
-        SELECT * FROM drive_documents WHERE client_id = ?
+        f"""
+        SELECT {", ".join(DRIVE_DOCUMENT_COLUMNS)}
+        FROM drive_documents WHERE client_id = ?
     """,
         (client_id,),
     )
     docs = cur.fetchall()
-    con.close()
     return [dict(doc) for doc in docs] if docs else []
 
 
-# Repo Functions 
+def list_drive_documents(
+    client_id: str,
+    after: str = None,
+    limit: int = 100,
+    fields=None,
+    include_content: bool = False,
+):
+    """
+    Return one page of a client's documents, ordered by file_id.
 
-def add_repository(repo_url: str, client_id: str):
-    con = get_connection()
-    con.row_factory = sqlite3.Row
+    Pages are keyset-paginated on file_id, so fetching a later page is an index
+    seek rather than an OFFSET scan.
+
+    Args:
+        client_id: The client ID
+        after: file_id cursor returned by the previous page (None for the first)
+        limit: Maximum number of documents in the page
+        fields: Metadata columns to return (defaults to DRIVE_DOCUMENT_COLUMNS);
+            file_id is always included
+        include_content: Also load and decompress each document body
+
+    Returns:
+        Tuple of (documents, next_cursor); next_cursor is None on the last page
+    """
+    fields = list(fields) if fields else list(DRIVE_DOCUMENT_COLUMNS)
+    unknown = [field for field in fields if field not in DRIVE_DOCUMENT_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown document fields: {', '.join(unknown)}")
+    if "file_id" not in fields:
+        fields.insert(0, "file_id")
+    columns = ", ".join(fields + (["blob_hash"] if include_content else []))
+
+    con = _client_connection(client_id)
     cur = con.cursor()
+    # Fetch one extra row to learn whether another page exists
     cur.execute(
-        """
-        INSERT INTO repositories (repo_url, client_id) VALUES (?, ?)
+        f"""
+        SELECT {columns} FROM drive_documents
+        WHERE client_id = ? AND file_id > ?
+        ORDER BY file_id
+        LIMIT ?
     """,
-        (repo_url, client_id),
+        (client_id, after or "", limit + 1),
     )
-    con.commit()
-    con.close()
+    docs = [dict(doc) for doc in cur.fetchall()]
+    next_cursor = docs[limit - 1]["file_id"] if len(docs) > limit else None
+    docs = docs[:limit]
+    if include_content:
+        for doc in docs:
+            doc["content"] = _get_blob(con, doc.pop("blob_hash"))
+    return docs, next_cursor
 
-def lookup_repository(repo_url: str):
+
+# Repo Functions 
+
+def add_repository(repo_url: str, client_id: str):
+    con = get_connection()
+    with con:
+        cur = con.cursor()
+        cur.execute(
+            """
+            INSERT INTO repositories (repo_url, client_id) VALUES (?, ?)
+        """,
+            (repo_url, client_id),
+        )
+    _repository_cache.invalidate(repo_url)
+
+def _query_repository(repo_url: str):
     con = get_connection()
-    con.row_factory = sqlite3.Row
     cur = con.cursor()
     cur.execute(
         """
@@ -279,35 +1342,628 @@ def lookup_repository(repo_url: str):
         (repo_url,),
     )
     repo = cur.fetchone()
-    con.close()
     return dict(repo) if repo else None
 
+
+def lookup_repository(repo_url: str):
+    row = _repository_cache.get_or_load(repo_url, lambda: _query_repository(repo_url))
+    return dict(row) if row else None
+
+# Webhook deliveries
+# /git/webhook stores each GitHub delivery here together with a "git_push" job
+# (see "Job queue") and returns immediately; the job does the fetching and
+# ingestion. Status moves queued -> running -> done | failed, and back to
+# queued while a failed attempt waits for its retry. delivery_id is GitHub's
+# X-GitHub-Delivery, so a redelivery of the same push is recognized instead of
+# being ingested twice. payload and result are JSON. thread_id and
+# messages_sent record how far the Backboard send got, so a retry continues in
+# the same thread instead of sending every message again.
+def _delivery_row(row):
+    if row is None:
+        return None
+    delivery = dict(row)
+    delivery["payload"] = json.loads(delivery["payload"])
+    delivery["result"] = json.loads(delivery["result"]) if delivery["result"] else None
+    return delivery
+
+
+def create_webhook_delivery(delivery_id: str, client_id: str, repo_url: str, payload: dict) -> bool:
+    """
+    Store a delivery and queue its ingestion job in one transaction.
+
+    Returns:
+        False if a delivery with this id was already stored
+    """
+    now = _utc_timestamp()
+    con = get_connection()
+    with con:
+        cur = con.execute(
+            """
+            INSERT OR IGNORE INTO webhook_deliveries
+                (delivery_id, client_id, repo_url, payload, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """,
+            (delivery_id, client_id, repo_url, json.dumps(payload), now, now),
+        )
+        if cur.rowcount == 0:
+            return False
+        _enqueue_job(
+            con,
+            "git_push",
+            {"delivery_id": delivery_id},
+            f"git_push:{delivery_id}",
+            JOB_MAX_ATTEMPTS,
+        )
+    return True
+
+
+def lookup_webhook_delivery(delivery_id: str):
+    con = get_connection()
+    row = con.execute(
+        "SELECT * FROM webhook_deliveries WHERE delivery_id = ?", (delivery_id,)
+    ).fetchone()
+    return _delivery_row(row)
+
+
+def update_webhook_delivery(delivery_id: str, status: str, result: dict = None, error: str = None):
+    """Record a delivery's status and, once finished, its result or error."""
+    con = get_connection()
+    with con:
+        con.execute(
+            """
+            UPDATE webhook_deliveries SET status = ?, result = ?, error = ?, updated_at = ?
+            WHERE delivery_id = ?
+        """,
+            (
+                status,
+                json.dumps(result) if result is not None else None,
+                error,
+                _utc_timestamp(),
+                delivery_id,
+            ),
+        )
+
+
+def record_webhook_delivery_progress(delivery_id: str, thread_id: str, messages_sent: int):
+    """Record the Backboard thread of a delivery and how many of its messages were sent."""
+    con = get_connection()
+    with con:
+        con.execute(
+            """
+            UPDATE webhook_deliveries SET thread_id = ?, messages_sent = ?, updated_at = ?
+            WHERE delivery_id = ?
+        """,
+            (thread_id, messages_sent, _utc_timestamp(), delivery_id),
+        )
+
+
+# Job queue
+# Durable background work (git pushes, Drive documents, Telegram forwarding)
+# is stored as rows in jobs and drained by jobs.JobWorkerPool. A worker leases
+# a ready job for JOB_LEASE_SECONDS; a lease that runs out (the worker died or
+# the process was redeployed) makes the job available again. Failed attempts
+# are retried after a delay chosen by the worker; after max_attempts the job is
+# dead-lettered (status 'dead') and kept for inspection. Jobs with the same
+# dedup_key are queued only once while one is waiting; a failed job whose retry
+# would collide with a waiting duplicate is marked 'superseded' instead.
+# Finished, dead and superseded jobs older than JOB_RETENTION_DAYS are pruned
+# by the retention pass.
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+JOB_RETENTION_DAYS = float(os.getenv("JOB_RETENTION_DAYS", "7"))
+
+
+def _job_row(row):
+    if row is None:
+        return None
+    job = dict(row)
+    job["payload"] = json.loads(job["payload"])
+    return job
+
+
+def enqueue_job(kind: str, payload: dict, dedup_key: str = None, delay: float = 0, max_attempts: int = None):
+    """
+    Queue a job.
+
+    Args:
+        kind: Name of the handler that runs the job
+        payload: JSON-serializable arguments for the handler
+        dedup_key: Skip queueing if a job with this key is already waiting
+        delay: Seconds before the job may run
+        max_attempts: Attempts before the job is dead-lettered
+
+    Returns:
+        The job id, or None if it was deduplicated
+    """
+    con = get_connection()
+    with con:
+        return _enqueue_job(
+            con, kind, payload, dedup_key, max_attempts or JOB_MAX_ATTEMPTS, delay
+        )
+
+
+def lease_job(owner: str, kinds, lease_seconds: float):
+    """
+    Lease the next ready job of one of kinds and count the attempt.
+
+    A job is ready when it is queued and due, or running with an expired lease.
+    Returns the job, or None if nothing is ready.
+    """
+    kinds = list(kinds)
+    if not kinds:
+        return None
+    now = _utc_timestamp()
+    placeholders = ", ".join("?" for _ in kinds)
+    con = get_connection()
+    with con:
+        row = con.execute(
+            f"""
+            UPDATE jobs
+            SET status = 'running', attempts = attempts + 1, lease_owner = ?,
+                leased_until = ?, updated_at = ?
+            WHERE job_id = (
+                SELECT job_id FROM jobs
+                WHERE kind IN ({placeholders})
+                  AND ((status = 'queued' AND run_after <= ?)
+                       OR (status = 'running' AND leased_until < ?))
+                ORDER BY run_after, job_id
+                LIMIT 1
+            )
+            RETURNING *
+        """,
+            (owner, _utc_timestamp(-lease_seconds / 86400), now, *kinds, now, now),
+        ).fetchone()
+    return _job_row(row)
+
+
+def extend_job_lease(job_id: int, owner: str, lease_seconds: float) -> bool:
+    """Push a running job's lease forward; False if owner no longer holds it."""
+    con = get_connection()
+    with con:
+        cur = con.execute(
+            """
+            UPDATE jobs SET leased_until = ?
+            WHERE job_id = ? AND lease_owner = ? AND status = 'running'
+        """,
+            (_utc_timestamp(-lease_seconds / 86400), job_id, owner),
+        )
+    return cur.rowcount > 0
+
+
+def complete_job(job_id: int, owner: str) -> bool:
+    """Mark a leased job done; False if owner no longer holds it."""
+    con = get_connection()
+    with con:
+        cur = con.execute(
+            """
+            UPDATE jobs SET status = 'done', leased_until = NULL, updated_at = ?
+            WHERE job_id = ? AND lease_owner = ? AND status = 'running'
+        """,
+            (_utc_timestamp(), job_id, owner),
+        )
+    return cur.rowcount > 0
+
+
+def fail_job(job_id: int, owner: str, error: str, retry_delay: float = None) -> str:
+    """
+    Record a failed attempt.
+
+    Args:
+        retry_delay: Seconds until the next attempt; None dead-letters the job
+
+    Returns:
+        The job's new status ("queued", "dead" or "superseded" if a waiting
+        duplicate will do the retry instead), or None if owner no longer holds
+        the lease
+    """
+    now = _utc_timestamp()
+    con = get_connection()
+    with con:
+        if retry_delay is None:
+            status = "dead"
+            cur = con.execute(
+                """
+                UPDATE jobs SET status = 'dead', last_error = ?, leased_until = NULL, updated_at = ?
+                WHERE job_id = ? AND lease_owner = ? AND status = 'running'
+            """,
+                (error, now, job_id, owner),
+            )
+        else:
+            status = "queued"
+            try:
+                cur = con.execute(
+                    """
+                    UPDATE jobs SET status = 'queued', last_error = ?, run_after = ?,
+                        leased_until = NULL, updated_at = ?
+                    WHERE job_id = ? AND lease_owner = ? AND status = 'running'
+                """,
+                    (error, _utc_timestamp(-retry_delay / 86400), now, job_id, owner),
+                )
+            except sqlite3.IntegrityError:
+                # The same work was queued again meanwhile; let that job do it
+                status = "superseded"
+                cur = con.execute(
+                    """
+                    UPDATE jobs SET status = 'superseded', last_error = ?, leased_until = NULL, updated_at = ?
+                    WHERE job_id = ? AND lease_owner = ? AND status = 'running'
+                """,
+                    (error, now, job_id, owner),
+                )
+    return status if cur.rowcount else None
+
+
+def get_job(job_id: int):
+    con = get_connection()
+    row = con.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+    return _job_row(row)
+
+
+def list_jobs(status: str = None, kind: str = None, limit: int = 50):
+    """Return the most recently updated jobs, optionally filtered."""
+    clauses, params = [], []
+    if status:
+        clauses.append("status = ?")
+        params.append(status)
+    if kind:
+        clauses.append("kind = ?")
+        params.append(kind)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    con = get_connection()
+    rows = con.execute(
+        f"SELECT * FROM jobs {where} ORDER BY updated_at DESC, job_id DESC LIMIT ?",
+        (*params, limit),
+    ).fetchall()
+    return [_job_row(row) for row in rows]
+
+
+def retry_job(job_id: int) -> bool:
+    """Queue a dead job again with a fresh attempt budget."""
+    con = get_connection()
+    try:
+        with con:
+            cur = con.execute(
+                """
+                UPDATE jobs SET status = 'queued', attempts = 0, run_after = ?, updated_at = ?
+                WHERE job_id = ? AND status = 'dead'
+            """,
+                (_utc_timestamp(), _utc_timestamp(), job_id),
+            )
+    except sqlite3.IntegrityError:
+        # A job with the same dedup key is already waiting
+        return False
+    return cur.rowcount > 0
+
+
+def job_counts() -> dict:
+    """Return the number of jobs per status, plus how many are ready to run now."""
+    con = get_connection()
+    counts = {
+        status: count
+        for status, count in con.execute(
+            "SELECT status, COUNT(*) FROM jobs GROUP BY status"
+        ).fetchall()
+    }
+    counts["ready"] = con.execute(
+        "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND run_after <= ?",
+        (_utc_timestamp(),),
+    ).fetchone()[0]
+    return counts
+
+
+def prune_jobs(retention_days: float = None, db_path: str = None) -> int:
+    """Delete done, dead and superseded jobs last updated more than retention_days ago."""
+    retention_days = JOB_RETENTION_DAYS if retention_days is None else retention_days
+    con = get_connection(db_path)
+    with con:
+        cur = con.execute(
+            "DELETE FROM jobs WHERE status IN ('done', 'dead', 'superseded') AND updated_at < ?",
+            (_utc_timestamp(retention_days),),
+        )
+    return cur.rowcount
+
+
 # Activity Log functions
+# Activity rows are buffered in memory and written in batches (one executemany
+# transaction per flush) so busy sources don't pay a commit per event. Reads
+# merge in the rows that haven't been flushed yet so the feed stays fresh.
+ACTIVITY_FLUSH_ROWS = int(os.getenv("ACTIVITY_FLUSH_ROWS", "50"))
+ACTIVITY_FLUSH_INTERVAL = float(os.getenv("ACTIVITY_FLUSH_INTERVAL", "2.0"))
+
+
+def _write_activity_rows(rows):
+    # One transaction per database file; unsharded this is a single batch
+    batches = {}
+    for row in rows:
+        batches.setdefault(client_db_path(row[0]), []).append(row)
+    for db_path, batch in batches.items():
+        # Fold the batch into one status update per (client, source)
+        seen = {}
+        for row in batch:
+            count, last_at = seen.get((row[0], row[1]), (0, row[5]))
+            seen[(row[0], row[1])] = (count + 1, max(last_at, row[5]))
+        con = get_connection(db_path)
+        with con:
+            con.executemany(
+                """
+                INSERT INTO activity_log (client_id, source, title, summary, color, created_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """,
+                batch,
+            )
+            con.executemany(
+                _SOURCE_STATUS_UPSERT,
+                [
+                    (client_id, source, last_at, count, 0)
+                    for (client_id, source), (count, last_at) in seen.items()
+                ],
+            )
+
+
+_activity_buffer = WriteBuffer(
+    _write_activity_rows,
+    max_rows=ACTIVITY_FLUSH_ROWS,
+    max_delay=ACTIVITY_FLUSH_INTERVAL,
+    name="activity-writer",
+)
+
+
+def _utc_timestamp(days_ago: float = 0) -> str:
+    # Same format as SQLite's CURRENT_TIMESTAMP so buffered rows sort alongside stored ones
+    moment = datetime.now(timezone.utc) - timedelta(days=days_ago)
+    return moment.strftime("%Y-%m-%d %H:%M:%S")
+
+
 def log_activity(client_id: str, source: str, title: str, summary: str, color: str):
-    con = get_connection()
+    _activity_buffer.add((client_id, source, title, summary, color, _utc_timestamp()))
+
+
+def flush_activity() -> int:
+    """Write buffered activity rows now. Returns the number of rows written."""
+    return _activity_buffer.flush()
+
+
+def close_buffers():
+    """Stop the background flushers and write everything still buffered."""
+    _activity_buffer.close()
+    _message_buffer.close()
+
+
+atexit.register(close_buffers)
+
+
+def get_recent_activity(client_id: str, limit: int = 10):
+    with _activity_buffer.reading() as pending:
+        con = _client_connection(client_id)
+        cur = con.cursor()
+        cur.execute(
+            """
+            SELECT * FROM activity_log WHERE client_id = ?
+            ORDER BY id DESC
+            LIMIT ?
+        """,
+            (client_id, limit),
+        )
+        logs = [dict(log) for log in cur.fetchall()]
+    # Unflushed rows are the newest; they have no id until they are written
+    unflushed = [
+        {
+            "id": None,
+            "client_id": row[0],
+            "source": row[1],
+            "title": row[2],
+            "summary": row[3],
+            "color": row[4],
+            "created_at": row[5],
+        }
+        for row in reversed(pending)
+        if row[0] == client_id
+    ]
+    return (unflushed + logs)[:limit]
+
+
+def get_activity_since(client_id: str, since_id: int, limit: int = 10):
+    """
+    Return up to limit activity rows newer than since_id, oldest first.
+
+    Buffered rows are flushed first so every returned row has a stable id. The
+    last row's id is the caller's next cursor: when more than limit rows are
+    newer, the rest come back on the following calls instead of being skipped.
+    When nothing is newer this is a single index seek that returns no rows.
+    """
+    if _activity_buffer.pending():
+        _activity_buffer.flush()
+    con = _client_connection(client_id)
     cur = con.cursor()
     cur.execute(
         """
-        INSERT INTO activity_log (client_id, source, title, summary, color)
-        VALUES (?, ?, ?, ?, ?)
+        SELECT * FROM activity_log WHERE client_id = ? AND id > ?
+        ORDER BY id ASC
+        LIMIT ?
     """,
-        (client_id, source, title, summary, color),
+        (client_id, since_id, limit),
     )
-    con.commit()
-    con.close()
+    return [dict(log) for log in cur.fetchall()]
 
-def get_recent_activity(client_id: str, limit: int = 10):
-    con = get_connection()
-    con.row_factory = sqlite3.Row
+
+# Activity retention
+# Raw activity rows older than ACTIVITY_COMPACT_AFTER_DAYS are folded into one
+# activity_daily row per (client, day, source) and deleted, so activity_log
+# only holds a small hot window. If ACTIVITY_ARCHIVE_DIR is set, the raw rows
+# are first copied into one attached database file per month. Daily summaries
+# older than ACTIVITY_RETENTION_DAYS are pruned; 0 keeps them forever.
+ACTIVITY_COMPACT_AFTER_DAYS = float(os.getenv("ACTIVITY_COMPACT_AFTER_DAYS", "7"))
+ACTIVITY_RETENTION_DAYS = float(os.getenv("ACTIVITY_RETENTION_DAYS", "365"))
+ACTIVITY_ARCHIVE_DIR = os.getenv("ACTIVITY_ARCHIVE_DIR")
+# Rows handled per transaction, so retention never holds the write lock for long
+RETENTION_BATCH_SIZE = 5000
+
+
+def _activity_boundary(con, cutoff: str):
+    """
+    Return the first id that is not older than cutoff.
+
+    Ids grow with time, so every row below the boundary is old. The scan walks
+    the table in id order and stops at the first recent row, so its cost is
+    proportional to the number of old rows rather than the table size.
+    """
+    row = con.execute(
+        "SELECT id FROM activity_log WHERE created_at >= ? ORDER BY id LIMIT 1",
+        (cutoff,),
+    ).fetchone()
+    if row:
+        return row[0]
+    row = con.execute("SELECT MAX(id) FROM activity_log").fetchone()
+    return (row[0] or 0) + 1
+
+
+def _archive_activity(con, start: int, end: int, archive_dir: str, prefix: str = ""):
+    """Copy raw activity rows with start <= id < end into per-month archive files."""
+    months = [
+        row[0]
+        for row in con.execute(
+            """
+            SELECT DISTINCT strftime('%Y_%m', created_at) FROM activity_log
+            WHERE id >= ? AND id < ?
+        """,
+            (start, end),
+        )
+    ]
+    os.makedirs(archive_dir, exist_ok=True)
+    for month in months:
+        path = os.path.join(archive_dir, f"activity_{prefix}{month}.db")
+        con.execute("ATTACH DATABASE ? AS archive", (path,))
+        try:
+            with con:
+                con.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS archive.activity_log (
+                        id INTEGER PRIMARY KEY,
+                        client_id TEXT,
+                        source TEXT,
+                        title TEXT,
+                        summary TEXT,
+                        color TEXT,
+                        created_at TIMESTAMP
+                    )
+                """
+                )
+                # OR IGNORE keeps a re-run after a crash from failing on copied rows
+                con.execute(
+                    """
+                    INSERT OR IGNORE INTO archive.activity_log
+                    SELECT id, client_id, source, title, summary, color, created_at
+                    FROM main.activity_log
+                    WHERE id >= ? AND id < ? AND strftime('%Y_%m', created_at) = ?
+                """,
+                    (start, end, month),
+                )
+        finally:
+            con.execute("DETACH DATABASE archive")
+
+
+def compact_activity(
+    older_than_days: float = None, archive_dir: str = None, db_path: str = None
+) -> int:
+    """
+    Fold old raw activity rows into per-day summaries and delete them.
+
+    Args:
+        older_than_days: Age after which rows are compacted
+            (defaults to ACTIVITY_COMPACT_AFTER_DAYS)
+        archive_dir: Directory for per-month archive files
+            (defaults to ACTIVITY_ARCHIVE_DIR; None skips archiving)
+        db_path: Database file to compact (defaults to DB_NAME)
+
+    Returns:
+        Number of raw rows compacted
+    """
+    if older_than_days is None:
+        older_than_days = ACTIVITY_COMPACT_AFTER_DAYS
+    if archive_dir is None:
+        archive_dir = ACTIVITY_ARCHIVE_DIR
+    con = get_connection(db_path)
+    # Shard ids overlap, so each shard archives into its own monthly files
+    prefix = ""
+    if db_path and db_path != DB_NAME:
+        prefix = os.path.splitext(os.path.basename(db_path))[0] + "_"
+    boundary = _activity_boundary(con, _utc_timestamp(older_than_days))
+    start = con.execute("SELECT MIN(id) FROM activity_log").fetchone()[0]
+    compacted = 0
+    while start is not None and start < boundary:
+        end = min(start + RETENTION_BATCH_SIZE, boundary)
+        if archive_dir:
+            _archive_activity(con, start, end, archive_dir, prefix)
+        with con:
+            con.execute(
+                """
+                INSERT INTO activity_daily
+                (client_id, day, source, event_count, first_at, last_at)
+                SELECT client_id, date(created_at), source, COUNT(*),
+                       MIN(created_at), MAX(created_at)
+                FROM activity_log WHERE id >= ? AND id < ?
+                GROUP BY client_id, date(created_at), source
+                ON CONFLICT (client_id, day, source) DO UPDATE SET
+                    event_count = event_count + excluded.event_count,
+                    first_at = MIN(first_at, excluded.first_at),
+                    last_at = MAX(last_at, excluded.last_at)
+            """,
+                (start, end),
+            )
+            cur = con.execute(
+                "DELETE FROM activity_log WHERE id >= ? AND id < ?", (start, end)
+            )
+            compacted += cur.rowcount
+        start = end
+    return compacted
+
+
+def prune_activity(retention_days: float = None, db_path: str = None) -> int:
+    """
+    Delete daily summaries older than the retention window.
+
+    Args:
+        retention_days: Days to keep (defaults to ACTIVITY_RETENTION_DAYS; 0 keeps all)
+        db_path: Database file to prune (defaults to DB_NAME)
+
+    Returns:
+        Number of summary rows deleted
+    """
+    if retention_days is None:
+        retention_days = ACTIVITY_RETENTION_DAYS
+    if retention_days <= 0:
+        return 0
+    con = get_connection(db_path)
+    with con:
+        cur = con.execute(
+            "DELETE FROM activity_daily WHERE day < ?",
+            (_utc_timestamp(retention_days)[:10],),
+        )
+    return cur.rowcount
+
+
+def get_activity_summary(client_id: str, days: int = 30):
+    """Return the client's per-day, per-source compacted activity counts, newest first."""
+    con = _client_connection(client_id)
     cur = con.cursor()
     cur.execute(
         """
-        SELECT * FROM activity_log WHERE client_id = ?
-        ORDER BY created_at DESC
-        LIMIT ?
+        SELECT * FROM activity_daily WHERE client_id = ? AND day >= ?
+        ORDER BY day DESC, source
     """,
-        (client_id, limit),
+        (client_id, _utc_timestamp(days)[:10]),
     )
-    logs = cur.fetchall()
-    con.close()
-    return [dict(log) for log in logs] if logs else []
\ No newline at end of file
+    return [dict(row) for row in cur.fetchall()]
+
+
+def run_activity_retention() -> dict:
+    """
+    Run one retention pass over every database file; returns row counts.
+
+    Compacts and prunes activity, deletes expired sessions and prunes old jobs.
+    """
+    totals = {"compacted": 0, "pruned": 0, "sessions_expired": 0, "jobs_pruned": 0}
+    for db_path in all_database_paths():
+        totals["compacted"] += compact_activity(db_path=db_path)
+        totals["pruned"] += prune_activity(db_path=db_path)
+        totals["sessions_expired"] += expire_sessions(db_path=db_path)
+        totals["jobs_pruned"] += prune_jobs(db_path=db_path)
+    return totals
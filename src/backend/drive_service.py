@@ -4,7 +4,7 @@ It polls Google Drive documents for changes, extracts content, and feeds it to B
 
 Key features:
 - OAuth2 authentication with Google Drive
-- Polling mechanism to detect content changes
+- Polling jobs ("drive_poll" queues a "drive_document" job per document) to detect content changes
 - Content extraction from Google Docs
 - Integration with Backboard API for memory storage
 """
@@ -13,8 +13,11 @@ import os
 import time
 import asyncio
 import hashlib
+import threading
 from datetime import datetime
-from typing import Optional, Dict, List
+from typing import Optional, Dict
+import google_auth_httplib2
+import httplib2
 from dotenv import load_dotenv
 from google.oauth2.credentials import Credentials
 from google.auth.transport.requests import Request
@@ -22,8 +25,9 @@ from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 from src.backend import db
-from backboard import BackboardClient
-from src.backend import encryption
+from src.backend import async_db
+from src.backend import backboard_clients
+from src.backend import jobs
 
 load_dotenv()
 
@@ -31,6 +35,10 @@ load_dotenv()
 SCOPES = ["https://www.googleapis.com/auth/drive.readonly"]
 
 
+class DriveAuthenticationRequired(Exception):
+    """Raised when no usable token exists and interactive OAuth is not allowed."""
+
+
 class DriveService:
     """
     Service class to manage Google Drive integration.
@@ -61,11 +69,25 @@ class DriveService:
 
         self.service = None
         self.creds = None
-
-    def authenticate(self):
+        # Drive calls run on worker threads; httplib2 connections are not thread-safe
+        self._thread = threading.local()
+
+    def _http(self):
+        """Return this thread's authorized HTTP transport."""
+        http = getattr(self._thread, "http", None)
+        if http is None:
+            http = google_auth_httplib2.AuthorizedHttp(self.creds, http=httplib2.Http())
+            self._thread.http = http
+        return http
+
+    def authenticate(self, interactive: bool = True):
         """
         Authenticate with Google Drive API using OAuth2.
         Creates new credentials if none exist, refreshes if expired.
+
+        Args:
+            interactive: Start the browser OAuth flow when no usable token
+                exists; if False, raise DriveAuthenticationRequired instead
         """
         # Check if token file exists and load credentials
         if os.path.exists(self.token_path):
@@ -76,6 +98,11 @@ class DriveService:
             if self.creds and self.creds.expired and self.creds.refresh_token:
                 self.creds.refresh(Request())
             else:
+                if not interactive:
+                    raise DriveAuthenticationRequired(
+                        f"No valid Google Drive token at {self.token_path}; "
+                        "authenticate through /drive/authenticate first"
+                    )
                 if not os.path.exists(self.credentials_path):
                     raise FileNotFoundError(
                         f"Credentials file not found at {self.credentials_path}. "
@@ -109,7 +136,7 @@ class DriveService:
             request = self.service.files().export_media(
                 fileId=file_id, mimeType="text/plain"
             )
-            content = request.execute()
+            content = request.execute(http=self._http())
             return content.decode("utf-8")
         except HttpError as error:
             print(f"Error fetching document {file_id}: {error}")
@@ -132,7 +159,7 @@ class DriveService:
                     fileId=file_id,
                     fields="id, name, modifiedTime, mimeType, webViewLink",
                 )
-                .execute()
+                .execute(http=self._http())
             )
             return file
         except HttpError as error:
@@ -151,22 +178,25 @@ class DriveService:
         """
         return hashlib.md5(content.encode("utf-8")).hexdigest()
 
-    async def process_document(self, file_id: str, client_id: str):
+    async def process_document(self, file_id: str, client_id: str, raise_errors: bool = False):
         """
         Process a single document: extract content and send to Backboard if changed.
 
         Args:
             file_id: Google Drive file ID
             client_id: Client ID for Backboard integration
+            raise_errors: Re-raise Backboard and database errors instead of
+                only logging them, so a job runner can retry
         """
         # Get file metadata
-        metadata = self.get_file_metadata(file_id)
+        # The Google API client blocks, so Drive calls run off the event loop
+        metadata = await asyncio.to_thread(self.get_file_metadata, file_id)
         if not metadata:
             print(f"Failed to get metadata for file {file_id}")
             return
 
         # Extract content
-        content = self.get_document_content(file_id)
+        content = await asyncio.to_thread(self.get_document_content, file_id)
         if not content:
             print(f"Failed to extract content from file {file_id}")
             return
@@ -175,7 +205,9 @@ class DriveService:
         content_hash = self.compute_content_hash(content)
 
         # Check if document has been processed before
-        existing_doc = db.lookup_drive_document(file_id)
+        existing_doc = await async_db.lookup_drive_document(
+            file_id, include_content=False, client_id=client_id
+        )
 
         if existing_doc:
             # Document exists - check if content changed
@@ -189,34 +221,34 @@ class DriveService:
         # Send content to Backboard
         try:
             # Get client from database
-            client = db.lookup_client(client_id)
+            client = await async_db.lookup_client(client_id)
             if not client:
                 print(f"Client {client_id} not found")
                 return
 
-            # Decrypt API key
-            decrypted_api_key = encryption.decrypt_api_key(client["api_key"])
-            backboard_client = BackboardClient(api_key=decrypted_api_key)
-
             # Get assistant
-            assistant = db.lookup_assistant(client_id)
+            assistant = await async_db.lookup_assistant(client_id)
             if not assistant:
                 print(f"No assistant found for client {client_id}")
                 return
 
             assistant_id = assistant["assistant_id"]
 
-            # Create a temporary text file with the content
-            import tempfile
-
-            temp_file_path = None
-            try:
-                # Create temporary file with document content
-                with tempfile.NamedTemporaryFile(
-                    mode="w", suffix=".txt", delete=False, encoding="utf-8"
-                ) as temp_file:
-                    # Write content with metadata header
-                    header = f"""Document: {metadata['name']}
+            # Pooled client; the stored key is decrypted once per process
+            async with backboard_clients.client(
+                client_id, client["api_key"]
+            ) as backboard_client:
+                # Create a temporary text file with the content
+                import tempfile
+
+                temp_file_path = None
+                try:
+                    # Create temporary file with document content
+                    with tempfile.NamedTemporaryFile(
+                        mode="w", suffix=".txt", delete=False, encoding="utf-8"
+                    ) as temp_file:
+                        # Write content with metadata header
+                        header = f"""Document: {metadata['name']}
 Last Modified: {metadata['modifiedTime']}
 Source: Google Drive
 Link: {metadata.get('webViewLink', 'N/A')}
@@ -224,48 +256,50 @@ Link: {metadata.get('webViewLink', 'N/A')}
 {'='*60}
 
 """
-                    temp_file.write(header + content)
-                    temp_file_path = temp_file.name
-
-                # Upload document to assistant
-                print(f"Uploading {metadata['name']} to Backboard...")
-                document = await backboard_client.upload_document_to_assistant(
-                    assistant_id, temp_file_path
-                )
-
-                # Wait for document to be indexed
-                print(f"Waiting for document to be indexed...")
-                max_wait_time = 60  # Maximum 60 seconds
-                start_time = time.time()
+                        temp_file.write(header + content)
+                        temp_file_path = temp_file.name
 
-                while time.time() - start_time < max_wait_time:
-                    status = await backboard_client.get_document_status(
-                        document.document_id
+                    # Upload document to assistant
+                    print(f"Uploading {metadata['name']} to Backboard...")
+                    document = await backboard_client.upload_document_to_assistant(
+                        assistant_id, temp_file_path
                     )
-                    if status.status == "indexed":
-                        print(f"[OK] Document indexed successfully: {metadata['name']}")
-                        break
-                    elif status.status == "failed":
-                        print(f"[ERROR] Document indexing failed: {status.status_message}")
-                        return
-                    await asyncio.sleep(2)
-                else:
-                    print(f"[WARN]  Document indexing timeout for {metadata['name']}")
-
-            finally:
-                # Clean up temporary file
-                if temp_file_path and os.path.exists(temp_file_path):
-                    os.remove(temp_file_path)
+
+                    # Wait for document to be indexed
+                    print(f"Waiting for document to be indexed...")
+                    max_wait_time = 60  # Maximum 60 seconds
+                    start_time = time.time()
+
+                    while time.time() - start_time < max_wait_time:
+                        status = await backboard_client.get_document_status(
+                            document.document_id
+                        )
+                        if status.status == "indexed":
+                            print(f"[OK] Document indexed successfully: {metadata['name']}")
+                            break
+                        elif status.status == "failed":
+                            print(f"[ERROR] Document indexing failed: {status.status_message}")
+                            return
+                        await asyncio.sleep(2)
+                    else:
+                        print(f"[WARN]  Document indexing timeout for {metadata['name']}")
+
+                finally:
+                    # Clean up temporary file
+                    if temp_file_path and os.path.exists(temp_file_path):
+                        os.remove(temp_file_path)
 
             print(f"Successfully uploaded to Backboard: {metadata['name']}")
 
             # Update or create database entry
             if existing_doc:
                 print(f"Updating existing document in DB: {file_id}")
-                db.update_drive_document(file_id, content_hash, content)
+                await async_db.update_drive_document(
+                    file_id, content_hash, content, client_id=client_id
+                )
             else:
                 print(f"Creating new document in DB: {file_id} for client {client_id}")
-                db.create_drive_document(
+                await async_db.create_drive_document(
                     file_id=file_id,
                     client_id=client_id,
                     file_name=metadata["name"],
@@ -276,7 +310,7 @@ Link: {metadata.get('webViewLink', 'N/A')}
             print(f"Document saved to database: {file_id}")
 
             # Log activity for dashboard
-            db.log_activity(
+            await async_db.log_activity(
                 client_id=client_id,
                 source="Drive",
                 title=f"Document '{metadata['name']}' synced",
@@ -294,37 +328,8 @@ Link: {metadata.get('webViewLink', 'N/A')}
             import traceback
 
             traceback.print_exc()
-
-    async def poll_documents(
-        self, file_ids: List[str], client_id: str, interval: int = 300
-    ):
-        """
-        Continuously poll Google Drive documents for changes.
-
-        Args:
-            file_ids: List of Google Drive file IDs to monitor
-            client_id: Client ID for Backboard integration
-            interval: Polling interval in seconds (default: 5 minutes)
-        """
-        print(
-            f"Starting Drive polling for {len(file_ids)} documents (interval: {interval}s)"
-        )
-
-        while True:
-            try:
-                for file_id in file_ids:
-                    await self.process_document(file_id, client_id)
-
-                print(f"Waiting {interval} seconds before next poll...")
-                await asyncio.sleep(interval)
-
-            except KeyboardInterrupt:
-                print("\nStopping Drive polling...")
-                break
-            except Exception as e:
-                print(f"Error during polling: {e}")
-                # Wait before retrying even if there's an error
-                await asyncio.sleep(interval)
+            if raise_errors:
+                raise
 
     def register_document_for_monitoring(self, file_id: str, client_id: str):
         """
@@ -340,7 +345,9 @@ Link: {metadata.get('webViewLink', 'N/A')}
             raise ValueError(f"Cannot access file {file_id}")
 
         # Store in database
-        existing = db.lookup_drive_document(file_id)
+        existing = db.lookup_drive_document(
+            file_id, include_content=False, client_id=client_id
+        )
         if not existing:
             db.create_drive_document(
                 file_id=file_id,
@@ -355,6 +362,85 @@ Link: {metadata.get('webViewLink', 'N/A')}
             print(f"Document already registered: {metadata['name']}")
 
 
+async def enqueue_document(file_id: str, client_id: str):
+    """
+    Queue a "drive_document" job that processes the document.
+
+    A document already waiting in the queue is not queued twice.
+
+    Returns:
+        The job id, or None if the document was already queued
+    """
+    return await jobs.enqueue(
+        "drive_document",
+        {"file_id": file_id, "client_id": client_id},
+        dedup_key=f"drive:{client_id}:{file_id}",
+    )
+
+
+async def enqueue_poll(client_id: str, interval: int):
+    """
+    Queue a "drive_poll" job that polls the client's documents every interval seconds.
+
+    Returns:
+        The job id, or None if a poll for the client is already queued
+    """
+    return await jobs.enqueue(
+        "drive_poll",
+        {"client_id": client_id, "interval": interval},
+        dedup_key=f"drive_poll:{client_id}",
+    )
+
+
+# Shared by the Drive jobs; authenticated on first use from token.json
+_job_service: Optional[DriveService] = None
+_job_service_lock = asyncio.Lock()
+
+
+async def _get_job_service() -> DriveService:
+    global _job_service
+
+    async with _job_service_lock:
+        if not _job_service:
+            service = DriveService()
+            try:
+                # A worker has no browser: never start the interactive flow here
+                await asyncio.to_thread(service.authenticate, interactive=False)
+            except DriveAuthenticationRequired as e:
+                raise jobs.PermanentJobError(str(e))
+            _job_service = service
+    return _job_service
+
+
+@jobs.handler("drive_document")
+async def run_drive_document(payload: dict):
+    """Job: process one Drive document, retried if Backboard fails."""
+    service = await _get_job_service()
+    await service.process_document(
+        payload["file_id"], payload["client_id"], raise_errors=True
+    )
+
+
+@jobs.handler("drive_poll")
+async def run_drive_poll(payload: dict):
+    """Job: queue every registered document of a client, then poll again after interval."""
+    client_id = payload["client_id"]
+    documents = await async_db.get_all_drive_documents_for_client(client_id)
+    if not documents:
+        print(f"Stopping Drive polling for {client_id}: no documents registered")
+        return
+
+    for doc in documents:
+        await enqueue_document(doc["file_id"], client_id)
+
+    await jobs.enqueue(
+        "drive_poll",
+        payload,
+        dedup_key=f"drive_poll:{client_id}",
+        delay=payload["interval"],
+    )
+
+
 # Helper function to extract file ID from Google Drive URL
 def extract_file_id_from_url(url: str) -> Optional[str]:
     """
@@ -12,6 +12,7 @@ import asyncio
 import json
 from typing import AsyncGenerator, Optional
 from datetime import datetime
+from src.backend import answer_cache
 
 # Event queue for SSE - stores events that will be sent to connected clients
 event_queues: list[asyncio.Queue] = []
@@ -21,6 +22,9 @@ async def emit_event(source: str, client_id: Optional[str] = None):
     """
     Emit an event to all connected SSE clients.
 
+    Every source calls this once its ingestion succeeded, so this is also where
+    the client's cached query answers are invalidated.
+
     Args:
         source: The source of the data - must be one of: "drive", "repo", "telegram"
         client_id: Optional client ID associated with the event
@@ -28,6 +32,9 @@ async def emit_event(source: str, client_id: Optional[str] = None):
     if source not in ("drive", "repo", "telegram"):
         raise ValueError(f"Invalid source: {source}. Must be one of: drive, repo, telegram")
 
+    # Without a client_id we can't tell whose memory changed
+    answer_cache.bump_generation(client_id)
+
     event_data = {
         "source": source,
         "timestamp": datetime.utcnow().isoformat(),
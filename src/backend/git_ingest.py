@@ -0,0 +1,178 @@
+"""
+Background ingestion of GitHub pushes.
+
+/git/webhook only validates the payload, stores a delivery (see the "Webhook
+deliveries" section of db.py) together with a "git_push" job and answers 202,
+so GitHub's 10 second timeout holds however big the push is. The job runs
+ingest_push on the server's JobWorkerPool: fetch the changed files
+concurrently (see git_service.fetch_files), update the local search index and
+send them to Backboard. Backboard errors are retried by the job queue; the
+delivery records how many messages were sent, so a retry resumes the send
+instead of repeating it. The delivery is marked failed once the job is
+dead-lettered.
+"""
+
+from src.backend import async_db
+from src.backend import backboard_clients
+from src.backend import jobs
+from src.backend.events import emit_event
+from src.backend.git_service import (
+    parse_github_url,
+    fetch_files,
+    should_ingest_file,
+    should_skip_directory,
+    pack_files,
+)
+
+async def ingest_push(
+    client_id: str,
+    repo_url: str,
+    changed: list,
+    removed: list,
+    default_branch: str = "main",
+    delivery_id: str = None,
+    thread_id: str = None,
+    messages_sent: int = 0,
+) -> dict:
+    """
+    Fetch the changed files of a push and ingest them.
+
+    Args:
+        client_id: The client the repository belongs to
+        repo_url: The repository URL
+        changed: Paths added or modified by the push
+        removed: Paths removed by the push
+        default_branch: Branch the files are read from
+        delivery_id: Webhook delivery to record Backboard progress on
+        thread_id: Thread an earlier attempt was sending to, if any
+        messages_sent: Messages that attempt already sent; they are skipped
+
+    Returns:
+        A result dict; status is "updated", "ignored" or "error"
+
+    Raises:
+        BackboardAPIError: If sending the files fails, so the job is retried
+    """
+    client = await async_db.lookup_client(client_id)
+    if not client:
+        return {"status": "error", "reason": "Client no longer exists"}
+
+    owner, repo = parse_github_url(repo_url)
+
+    if removed:
+        await async_db.index_repository_files(client_id, repo_url, [], removed=removed)
+
+    if not changed:
+        return {"status": "ignored", "reason": "No files changed"}
+
+    # Filter the changed files, then fetch them concurrently
+    raw_urls = {}
+
+    for file_path in changed:
+        # Skip files we don't want to ingest
+        if not should_ingest_file(file_path):
+            continue
+
+        # Skip files in directories we want to skip
+        path_parts = file_path.split("/")
+        if any(should_skip_directory(part) for part in path_parts[:-1]):
+            continue
+
+        # Fetch the file content directly using raw GitHub URL
+        raw_urls[file_path] = f"https://raw.githubusercontent.com/{owner}/{repo}/{default_branch}/{file_path}"
+
+    changed_files = await fetch_files(raw_urls)
+
+    if not changed_files:
+        return {"status": "ignored", "reason": "No ingestable files changed"}
+
+    # Keep the local search index in step with what gets ingested
+    await async_db.index_repository_files(client_id, repo_url, changed_files)
+
+    # Send to Backboard memory
+    assistant = await async_db.lookup_assistant(client_id)
+    if not assistant:
+        return {"status": "error", "reason": "No assistant found"}
+
+    assistant_id = assistant["assistant_id"]
+    # Files are packed into as few messages as the size budget allows
+    messages = pack_files(changed_files)
+    async with backboard_clients.client(client_id, client["api_key"]) as backboard_client:
+        if thread_id is None:
+            thread = await backboard_client.create_thread(assistant_id)
+            thread_id = thread.thread_id
+            messages_sent = 0
+            if delivery_id:
+                await async_db.record_webhook_delivery_progress(delivery_id, thread_id, 0)
+
+        # Progress is recorded after every message, so a retry after a partial
+        # send only sends what Backboard has not got yet
+        for index in range(messages_sent, len(messages)):
+            async for chunk in await backboard_client.add_message(
+                thread_id=thread_id,
+                content=messages[index],
+                memory="Auto",
+                stream=True,
+            ):
+                pass  # Just consume the stream
+            if delivery_id:
+                await async_db.record_webhook_delivery_progress(delivery_id, thread_id, index + 1)
+
+    # Log activity for dashboard
+    await async_db.log_activity(
+        client_id=client_id,
+        source="GitHub",
+        title=f"New push to {repo}",
+        summary=f"Processed {len(changed_files)} files: {', '.join([f[0] for f in changed_files[:3]])}{'...' if len(changed_files) > 3 else ''}",
+        color="blue"
+    )
+
+    # Emit event to notify frontend of repo update
+    await emit_event("repo", client_id)
+
+    return {
+        "status": "updated",
+        "repo_url": repo_url,
+        "files_updated": len(changed_files),
+        "messages_sent": len(messages),
+        "files": [f[0] for f in changed_files],
+    }
+
+
+async def _delivery_dead(payload: dict, error: str):
+    await async_db.update_webhook_delivery(payload["delivery_id"], "failed", error=error)
+
+
+@jobs.handler("git_push", on_dead=_delivery_dead)
+async def run_delivery(payload: dict):
+    """Ingest the webhook delivery named by payload["delivery_id"]."""
+    delivery = await async_db.lookup_webhook_delivery(payload["delivery_id"])
+    # A dead-lettered delivery is "failed" and runs again if its job is retried
+    if delivery is None or delivery["status"] == "done":
+        return
+    await async_db.update_webhook_delivery(delivery["delivery_id"], "running")
+    push = delivery["payload"]
+    try:
+        result = await ingest_push(
+            delivery["client_id"],
+            delivery["repo_url"],
+            push["changed"],
+            push["removed"],
+            push.get("default_branch", "main"),
+            delivery_id=delivery["delivery_id"],
+            thread_id=delivery["thread_id"],
+            messages_sent=delivery["messages_sent"],
+        )
+    except Exception as e:
+        print(f"Error ingesting delivery {delivery['delivery_id']}: {e}")
+        await async_db.update_webhook_delivery(
+            delivery["delivery_id"], "queued", error=f"{type(e).__name__}: {e}"
+        )
+        raise
+    if result["status"] == "error":
+        # Missing client or assistant; retrying will not help
+        await async_db.update_webhook_delivery(
+            delivery["delivery_id"], "failed", result=result, error=result["reason"]
+        )
+    else:
+        await async_db.update_webhook_delivery(delivery["delivery_id"], "done", result=result)
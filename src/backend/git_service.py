@@ -1,6 +1,10 @@
 """Helper functions for ingesting content from Git repositories via GitHub API"""
 
+import asyncio
+import os
+import httpx
 import requests
+from typing import Optional
 from urllib.parse import urlparse
 
 GITHUB_API_BASE = "https://api.github.com"
@@ -69,13 +73,102 @@ def fetch_file_content(download_url: str):
     if not download_url:
         return None
     try:
-        response = requests.get(download_url)
+        response = requests.get(download_url, timeout=REQUEST_TIMEOUT)
         response.raise_for_status()
         return response.text
     except requests.exceptions.RequestException as e:
         print(f"Error fetching file content from {download_url}: {e}")
         return None
 
+# Concurrent raw file downloads per push, the deadline for each (seconds) and
+# the largest file ingested (bytes); larger files are skipped
+GIT_FETCH_CONCURRENCY = int(os.getenv("GIT_FETCH_CONCURRENCY", "16"))
+GIT_FETCH_TIMEOUT = float(os.getenv("GIT_FETCH_TIMEOUT", "15"))
+GIT_MAX_FILE_BYTES = int(os.getenv("GIT_MAX_FILE_BYTES", "1000000"))
+
+# Shared by every push so raw.githubusercontent.com connections are kept alive
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def _get_http_client() -> httpx.AsyncClient:
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            timeout=GIT_FETCH_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=GIT_FETCH_CONCURRENCY * 2,
+                max_keepalive_connections=GIT_FETCH_CONCURRENCY,
+            ),
+            follow_redirects=True,
+        )
+    return _http_client
+
+
+async def close_http_client():
+    """Close the shared download client; call on shutdown."""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+async def _download(client: httpx.AsyncClient, url: str, max_bytes: int) -> Optional[str]:
+    async with client.stream("GET", url) as response:
+        response.raise_for_status()
+        declared = response.headers.get("Content-Length", "")
+        # A malformed header is ignored; the cap below still applies
+        if declared.isdigit() and int(declared) > max_bytes:
+            print(f"Skipping {url}: {declared} bytes is over the {max_bytes} byte limit")
+            return None
+        body = bytearray()
+        # The header can be missing or wrong, so the cap is enforced while reading
+        async for chunk in response.aiter_bytes():
+            body.extend(chunk)
+            if len(body) > max_bytes:
+                print(f"Skipping {url}: over the {max_bytes} byte limit")
+                return None
+        return body.decode(response.encoding or "utf-8", errors="replace")
+
+
+async def fetch_files(
+    urls: dict[str, str],
+    concurrency: int = GIT_FETCH_CONCURRENCY,
+    timeout: float = GIT_FETCH_TIMEOUT,
+    max_bytes: int = GIT_MAX_FILE_BYTES,
+    client: httpx.AsyncClient = None,
+) -> list[tuple[str, str]]:
+    """Download many raw files concurrently on the shared keep-alive client.
+
+    Files that fail, time out, are empty or exceed max_bytes are logged and
+    left out, as fetch_file_content did one at a time.
+
+    Args:
+        urls: Download URL per file path
+        concurrency: Downloads in flight at once
+        timeout: Seconds allowed for each download, body included
+        max_bytes: Largest file kept
+        client: HTTP client to use instead of the shared one
+
+    Returns:
+        (path, content) for every fetched file, in the order of urls
+    """
+    client = client or _get_http_client()
+    slots = asyncio.Semaphore(max(1, concurrency))
+
+    async def fetch(path: str, url: str) -> Optional[str]:
+        async with slots:
+            try:
+                return await asyncio.wait_for(_download(client, url, max_bytes), timeout)
+            except asyncio.TimeoutError:
+                print(f"Error fetching file {path}: timed out after {timeout}s")
+            except httpx.HTTPError as e:
+                print(f"Error fetching file {path}: {e}")
+            return None
+
+    contents = await asyncio.gather(*(fetch(path, url) for path, url in urls.items()))
+    return [(path, content) for path, content in zip(urls, contents) if content]
+
+
 def should_ingest_file(filename: str) -> bool:
     """Return True if this file should be ingested (skip images, binaries, etc.)."""
     
@@ -87,3 +180,69 @@ def should_skip_directory(dir_name: str) -> bool:
     """Return True if this directory should be skipped."""
     return dir_name in SKIP_DIRECTORIES
 
+# Upper bound on one packed Backboard message, in UTF-8 bytes (roughly 4 bytes
+# per token for source code)
+MESSAGE_BUDGET_BYTES = int(os.getenv("GIT_MESSAGE_BUDGET_BYTES", "60000"))
+
+PACK_HEADER = "Updated files:\n\n"
+
+
+def _size(text: str) -> int:
+    return len(text.encode("utf-8"))
+
+
+def _file_block(path: str, content: str, part: str = "") -> str:
+    return f"===== FILE: {path}{part} =====\n{content}\n===== END FILE: {path}{part} =====\n\n"
+
+
+def _split_content(content: str, limit: int) -> list[str]:
+    """Split content into pieces of at most limit bytes, at line breaks where possible."""
+    pieces, current, current_size = [], [], 0
+    for line in content.splitlines(keepends=True):
+        while _size(line) > limit:
+            # A single line longer than the limit: cut it on character boundaries
+            cut = max(1, len(line.encode("utf-8")[:limit].decode("utf-8", "ignore")))
+            if current:
+                pieces.append("".join(current))
+                current, current_size = [], 0
+            pieces.append(line[:cut])
+            line = line[cut:]
+        if current_size + _size(line) > limit:
+            pieces.append("".join(current))
+            current, current_size = [], 0
+        current.append(line)
+        current_size += _size(line)
+    if current or not pieces:
+        pieces.append("".join(current))
+    return pieces
+
+
+def pack_files(files: list[tuple[str, str]], budget: int = MESSAGE_BUDGET_BYTES) -> list[str]:
+    """Group changed files into as few messages as fit the byte budget.
+    
+    Each file is wrapped in "===== FILE: path =====" / "===== END FILE: path ====="
+    delimiters so every piece of a message can be traced back to its file. A
+    file too large for one message is split across messages as "path (part i/n)".
+    Files keep their order.
+    """
+    blocks = []
+    for path, content in files:
+        if _size(PACK_HEADER + _file_block(path, content)) <= budget:
+            blocks.append(_file_block(path, content))
+            continue
+        # Leave room for the header and the longest delimiters a part can get
+        overhead = _size(PACK_HEADER + _file_block(path, "", f" (part {len(content)}/{len(content)})"))
+        pieces = _split_content(content, max(1, budget - overhead))
+        for i, piece in enumerate(pieces, 1):
+            blocks.append(_file_block(path, piece, f" (part {i}/{len(pieces)})"))
+
+    messages, current = [], PACK_HEADER
+    for block in blocks:
+        if current != PACK_HEADER and _size(current + block) > budget:
+            messages.append(current.rstrip() + "\n")
+            current = PACK_HEADER
+        current += block
+    if current != PACK_HEADER:
+        messages.append(current.rstrip() + "\n")
+    return messages
+
@@ -0,0 +1,222 @@
+"""
+Durable background jobs.
+
+Work that must survive restarts (git pushes, Drive documents, Telegram
+forwarding) is queued in the jobs table (see the "Job queue" section of db.py)
+and run by a JobWorkerPool. Modules register a coroutine per job kind:
+
+    @jobs.handler("drive_document")
+    async def run_drive_document(payload):
+        ...
+
+and queue work with `await jobs.enqueue("drive_document", {...}, dedup_key=...)`.
+A handler that returns marks the job done. One that raises is retried after a
+jittered exponential backoff until the job runs out of attempts and is
+dead-lettered; raising PermanentJobError dead-letters it straight away. A pool
+only leases kinds that have a handler in its process, so the server and the
+Telegram bot can share one database and each drain their own kinds.
+"""
+
+import asyncio
+import os
+import random
+import secrets
+import socket
+from typing import Awaitable, Callable, Optional
+from src.backend import async_db
+
+# Concurrent jobs per process
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+# Seconds a leased job stays owned by its worker; renewed while it runs
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "300"))
+# Backoff between attempts, in seconds
+JOB_RETRY_BASE_DELAY = float(os.getenv("JOB_RETRY_BASE_DELAY", "10"))
+JOB_RETRY_MAX_DELAY = float(os.getenv("JOB_RETRY_MAX_DELAY", "900"))
+# Seconds an idle worker waits before checking the table again; jobs queued by
+# this process wake it immediately
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "2"))
+
+
+class PermanentJobError(Exception):
+    """Raised by a handler for failures that retrying cannot fix."""
+
+
+class _Handler:
+    def __init__(self, run, on_dead):
+        self.run = run
+        self.on_dead = on_dead
+
+
+_handlers = {}
+_wakeup: Optional[asyncio.Event] = None
+
+
+def handler(kind: str, on_dead: Callable[[dict, str], Awaitable[None]] = None):
+    """
+    Register the coroutine that runs jobs of kind.
+
+    Args:
+        kind: Job kind
+        on_dead: Optional coroutine called with (payload, error) when a job of
+            this kind is dead-lettered
+    """
+    def register(run):
+        _handlers[kind] = _Handler(run, on_dead)
+        return run
+
+    return register
+
+
+def notify():
+    """Wake idle workers in this process after queueing a job."""
+    if _wakeup is not None:
+        _wakeup.set()
+
+
+async def enqueue(kind: str, payload: dict, dedup_key: str = None, delay: float = 0, max_attempts: int = None):
+    """
+    Queue a job and wake the workers.
+
+    Returns:
+        The job id, or None if a job with dedup_key is already waiting
+    """
+    job_id = await async_db.enqueue_job(
+        kind, payload, dedup_key=dedup_key, delay=delay, max_attempts=max_attempts
+    )
+    if job_id is not None and delay <= 0:
+        notify()
+    return job_id
+
+
+def retry_delay(attempts: int, base: float = JOB_RETRY_BASE_DELAY, cap: float = JOB_RETRY_MAX_DELAY) -> float:
+    """Full-jitter exponential backoff after the given number of attempts."""
+    return random.uniform(0, min(cap, base * 2 ** max(0, attempts - 1)))
+
+
+class JobWorkerPool:
+    """Runs queued jobs on a fixed number of asyncio workers."""
+
+    def __init__(
+        self,
+        workers: int = JOB_WORKERS,
+        lease_seconds: float = JOB_LEASE_SECONDS,
+        poll_interval: float = JOB_POLL_INTERVAL,
+    ):
+        """
+        Args:
+            workers: Jobs run concurrently
+            lease_seconds: Lease length; renewed every third of it while a job runs
+            poll_interval: Idle wait between checks of the table
+        """
+        self.workers = workers
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        # Unique per process, so a restarted server never completes a job
+        # leased by its previous incarnation
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{secrets.token_hex(4)}"
+        self._tasks = []
+        self.running = 0
+        self.completed = 0
+        self.retried = 0
+        self.dead = 0
+
+    async def run_one(self) -> bool:
+        """
+        Lease and run one ready job.
+
+        Returns:
+            False if no job was ready
+        """
+        job = await async_db.lease_job(self.owner, list(_handlers), self.lease_seconds)
+        if job is None:
+            return False
+        registered = _handlers.get(job["kind"])
+        self.running += 1
+        heartbeat = asyncio.create_task(self._heartbeat(job["job_id"]))
+        try:
+            if job["attempts"] > job["max_attempts"]:
+                # Only reachable through expired leases, e.g. a job that keeps
+                # killing its worker
+                raise PermanentJobError("Lease expired on every attempt")
+            await registered.run(job["payload"])
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            retryable = not isinstance(e, PermanentJobError) and job["attempts"] < job["max_attempts"]
+            delay = retry_delay(job["attempts"]) if retryable else None
+            status = await async_db.fail_job(job["job_id"], self.owner, error, delay)
+            if status == "queued":
+                self.retried += 1
+                print(f"Job {job['job_id']} ({job['kind']}) failed, retrying in {delay:.0f}s: {error}")
+            elif status == "dead":
+                self.dead += 1
+                print(f"Job {job['job_id']} ({job['kind']}) dead-lettered: {error}")
+                if registered.on_dead is not None:
+                    try:
+                        await registered.on_dead(job["payload"], error)
+                    except Exception as hook_error:
+                        print(f"Error in dead-letter hook for job {job['job_id']}: {hook_error}")
+            elif status == "superseded":
+                # A newer copy of this job is already waiting and will do the work
+                self.retried += 1
+                print(f"Job {job['job_id']} ({job['kind']}) failed, superseded by a waiting duplicate: {error}")
+        else:
+            await async_db.complete_job(job["job_id"], self.owner)
+            self.completed += 1
+        finally:
+            heartbeat.cancel()
+            self.running -= 1
+        return True
+
+    async def _heartbeat(self, job_id: int):
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                await async_db.extend_job_lease(job_id, self.owner, self.lease_seconds)
+            except Exception as e:
+                print(f"Error extending lease of job {job_id}: {e}")
+
+    async def _work(self):
+        while True:
+            # Cleared before leasing, so a job queued meanwhile still wakes the wait
+            _wakeup.clear()
+            try:
+                if await self.run_one():
+                    continue
+            except Exception as e:
+                print(f"Error running jobs: {e}")
+            try:
+                await asyncio.wait_for(_wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        """Start the workers on the running event loop."""
+        global _wakeup
+        if _wakeup is None:
+            _wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """
+        Stop the workers.
+
+        Jobs cut off here keep their lease until it expires and are then
+        picked up again, by this process after a restart or by another one.
+        """
+        global _wakeup
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        _wakeup = None
+
+    def stats(self) -> dict:
+        """Return worker counters for this process."""
+        return {
+            "workers": len(self._tasks),
+            "running": self.running,
+            "completed": self.completed,
+            "retried": self.retried,
+            "dead": self.dead,
+            "kinds": sorted(_handlers),
+        }
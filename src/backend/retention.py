@@ -0,0 +1,45 @@
+"""
+Background retention for the activity log.
+
+The server starts retention_loop() from its lifespan. Each pass runs
+db.run_activity_retention on the DB thread pool: old activity rows are compacted
+into per-day summaries (optionally archived to per-month files) and expired
+summaries are pruned. Idle conversation sessions and old finished jobs are
+deleted in the same pass.
+See the "Activity retention" section of db.py for settings.
+"""
+
+import asyncio
+import os
+from src.backend import async_db
+from src.backend import db
+
+# Seconds between retention passes
+RETENTION_INTERVAL = float(os.getenv("RETENTION_INTERVAL", "3600"))
+
+
+async def run_retention() -> dict:
+    """Run a single retention pass without blocking the event loop."""
+    return await async_db.run(db.run_activity_retention)
+
+
+async def retention_loop(interval: float = RETENTION_INTERVAL):
+    """
+    Run retention passes forever, every interval seconds.
+
+    Args:
+        interval: Seconds to wait between passes
+    """
+    while True:
+        try:
+            result = await run_retention()
+            if any(result.values()):
+                print(
+                    f"Activity retention: compacted {result['compacted']} rows, "
+                    f"pruned {result['pruned']} daily summaries, "
+                    f"expired {result.get('sessions_expired', 0)} sessions, "
+                    f"pruned {result.get('jobs_pruned', 0)} finished jobs"
+                )
+        except Exception as e:
+            print(f"Error running activity retention: {e}")
+        await asyncio.sleep(interval)
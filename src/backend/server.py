@@ -6,24 +6,55 @@ it is possible to have multiple agents each with their own assistants.
 """
 
 import os
+import json
+import secrets
 import asyncio
 import requests
+from contextlib import asynccontextmanager
 from backboard import BackboardClient
-from backboard.exceptions import BackboardAPIError
-from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import StreamingResponse
+from backboard.exceptions import BackboardAPIError, BackboardRateLimitError
+from fastapi import FastAPI, Header, HTTPException, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from src.backend import encryption
 from src.backend import db
-from src.backend.drive_service import DriveService, extract_file_id_from_url
-from src.backend.git_service import parse_github_url, fetch_repo_contents, fetch_file_content, should_ingest_file, should_skip_directory
+from src.backend import async_db
+from src.backend import backboard_clients
+from src.backend import answer_cache
+from src.backend import jobs
+# Importing drive_service also registers the "drive_document" and "drive_poll" job handlers
+from src.backend.drive_service import DriveService, enqueue_poll, extract_file_id_from_url
+from src.backend.git_service import parse_github_url, fetch_repo_contents, close_http_client
 from src.backend.events import emit_event, event_stream
+from src.backend.single_flight import SingleFlight
+from src.backend.retention import retention_loop
+# Imported for its side effect of registering the "git_push" job handler
+from src.backend import git_ingest  # noqa: F401
 
-app = FastAPI()
 
-def get_or_create_client(client_id: str):
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await async_db.init_db()
+    retention_task = asyncio.create_task(retention_loop())
+    job_workers.start()
+    yield
+    retention_task.cancel()
+    await job_workers.stop()
+    await backboard_clients.close()
+    await close_http_client()
+    # Drain the DB thread pool, write buffered activity, then release connections
+    async_db.shutdown()
+    db.close_buffers()
+    db.close_connections()
+
+
+job_workers = jobs.JobWorkerPool()
+
+app = FastAPI(lifespan=lifespan)
+
+async def get_or_create_client(client_id: str):
     """Helper to ensure a client exists, specifically for local testing with default_user."""
-    client = db.lookup_client(client_id)
+    client = await async_db.lookup_client(client_id)
     if not client and client_id == "default_user":
         # Check if we have a real key in .env, otherwise use mock
         real_key = os.getenv("BACKBOARD_API_KEY")
@@ -34,10 +65,10 @@ def get_or_create_client(client_id: str):
         except ValueError:
             encrypted_key = key_to_use
             
-        db.create_client("default_user", encrypted_key)
+        await async_db.create_client("default_user", encrypted_key)
         # Also create a mock assistant for the default user (must be valid UUID format)
-        db.create_assistant("00000000-0000-0000-0000-000000000000", "default_user")
-        client = db.lookup_client(client_id)
+        await async_db.create_assistant("00000000-0000-0000-0000-000000000000", "default_user")
+        client = await async_db.lookup_client(client_id)
     return client
 
 # Enable CORS
@@ -47,6 +78,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Activity-Cursor", "X-Session-Id"],
 )
 
 drive_service = None  # Will be initialized when needed
@@ -103,21 +135,23 @@ async def emit_event_endpoint(source: str, client_id: str = None):
 @app.post("/client")
 async def create_client(client_id: str, api_key: str, status_code=201):
     # Check for client in database
-    client = db.lookup_client(client_id)
+    client = await async_db.lookup_client(client_id)
     # Return if client already exists
     if client:
         raise HTTPException(status_code=409, detail="Client already exists!")
     # Connect to backboard
-    backboard_client = BackboardClient(api_key=api_key)
-    # Create assistant
-    assistant = await backboard_client.create_assistant(
-        name="Test Assistant",
-        description="An assistant designed to understand your code",
-    )
+    async with BackboardClient(api_key=api_key) as backboard_client:
+        # Create assistant
+        assistant = await backboard_clients.limited(client_id, backboard_client).create_assistant(
+            name="Test Assistant",
+            description="An assistant designed to understand your code",
+        )
     # Create entries for db
     encrypted_api_key = encryption.encrypt_api_key(api_key)
-    db.create_assistant(assistant.assistant_id, client_id)
-    db.create_client(client_id, encrypted_api_key)
+    await async_db.create_assistant(assistant.assistant_id, client_id)
+    await async_db.create_client(client_id, encrypted_api_key)
+    # Drop any pooled client built from a previous key for this client_id
+    await backboard_clients.invalidate(client_id)
 
     return {
         "status": "created",
@@ -126,79 +160,329 @@ async def create_client(client_id: str, api_key: str, status_code=201):
     }
 
 
+async def open_session_thread(backboard_client, client_id: str, assistant_id: str, session_id: str):
+    """
+    Return (thread_id, session_id) for a live session, or start a new session.
+
+    Callers hand the (possibly new) session id back to the client, which passes
+    it with its next message to reuse the thread.
+    """
+    thread_id = await async_db.use_session(client_id, session_id) if session_id else None
+    if thread_id is None:
+        thread = await backboard_client.create_thread(assistant_id)
+        thread_id = thread.thread_id
+        session_id = await async_db.create_session(client_id, thread_id)
+    return thread_id, session_id
+
+
+def backboard_error_message(e: BackboardAPIError) -> str:
+    if isinstance(e, BackboardRateLimitError):
+        return "Local Server Message: Backboard is rate limiting requests right now. Please try again in a moment."
+    if "API Key" in str(e):
+        return "Local Server Message: I detected that no real Backboard API Key is configured. Please add `BACKBOARD_API_KEY` to your `.env` file to enable real AI responses!"
+    return f"Local Server Error: {str(e)}"
+
+
 # add_thread uses client_ids assistant and prompts backboard with content
 @app.post("/messages/send")
-async def add_thread(client_id: str, content: str, status_code=201):
-    client = get_or_create_client(client_id)
+async def add_thread(client_id: str, content: str, response: Response, status_code=201, x_session_id: str = Header(None)):
+    client = await get_or_create_client(client_id)
     if not client:
         raise HTTPException(status_code=404, detail="Client does not exist!")
     # For simplicity, we assume that each client has one assistant
-    decrypted_api_key = encryption.decrypt_api_key(client["api_key"])
-    backboard_client = BackboardClient(api_key=decrypted_api_key)
-    assistant = db.lookup_assistant(client_id)
+    assistant = await async_db.lookup_assistant(client_id)
     if not assistant:
         raise HTTPException(
             status_code=404, detail="No assistant found for this client!"
         )
     assistant_id = assistant["assistant_id"]
-    try:
-        thread = await backboard_client.create_thread(assistant_id)
-        output = []
-        async for chunk in await backboard_client.add_message(
-            thread_id=thread.thread_id,
-            content=content,
-            memory="auto",
-            stream=True
-        ):
-            if chunk['type'] == 'content_streaming':
-                output.append(chunk['content'])
-        return "".join(output)
-    except BackboardAPIError as e:
-        if "API Key" in str(e):
-            return "Local Server Message: I detected that no real Backboard API Key is configured. Please add `BACKBOARD_API_KEY` to your `.env` file to enable real AI responses!"
-        return f"Local Server Error: {str(e)}"
-    except Exception as e:
-        return f"Local Server unexpected error: {str(e)}"
+    async with backboard_clients.client(client_id, client["api_key"]) as backboard_client:
+        try:
+            thread_id, session_id = await open_session_thread(
+                backboard_client, client_id, assistant_id, x_session_id
+            )
+            response.headers["X-Session-Id"] = session_id
+            output = []
+            async for chunk in await backboard_client.add_message(
+                thread_id=thread_id,
+                content=content,
+                memory="auto",
+                stream=True
+            ):
+                if chunk['type'] == 'content_streaming':
+                    output.append(chunk['content'])
+            return "".join(output)
+        except BackboardAPIError as e:
+            return backboard_error_message(e)
+        except Exception as e:
+            return f"Local Server unexpected error: {str(e)}"
 
 # query sends backboards response along with sources of information
+# A question that starts a conversation is answered from answer_cache when the
+# client asked it before and nothing was ingested since; follow-ups inside a
+# session depend on the thread's history and always go to Backboard.
+# Identical session-less questions arriving while one is already being answered
+# share that single Backboard call (query_flights) instead of each making their own.
+query_flights = SingleFlight()
+
+
+async def ask_question(client: dict, client_id: str, assistant_id: str, content: str, session_id: str = None):
+    """
+    Ask the client's assistant a question.
+
+    Returns:
+        ((output, sources), session_id); session_id is None when the answer
+        came from the cache or from a call another request started
+
+    Raises:
+        BackboardAPIError: if Backboard fails
+    """
+    async def ask():
+        async with backboard_clients.client(client_id, client["api_key"]) as backboard_client:
+            thread_id, new_session_id = await open_session_thread(
+                backboard_client, client_id, assistant_id, session_id
+            )
+            output = []
+            sources = []
+            async for chunk in await backboard_client.add_message(
+                thread_id=thread_id,
+                content=content,
+                memory="auto",
+                stream=True
+            ):
+                if chunk['type'] == 'content_streaming':
+                    output.append(chunk['content'])
+                elif chunk['type'] == 'run_ended' and chunk.get("retrieved_memories", None):
+                    memories = chunk['retrieved_memories']
+                    for memory in memories:
+                        sources.append(memory['memory'])
+        output = "".join(output)
+        if not session_id and output:
+            answer_cache.put(client_id, content, (output, sources), generation)
+        return (output, sources), new_session_id
+
+    if session_id:
+        return await ask()
+    cached = answer_cache.get(client_id, content)
+    if cached is not None:
+        return cached, None
+    generation = answer_cache.generation(client_id)
+    (answer, new_session_id), joined = await query_flights.do(
+        (client_id, answer_cache.normalize_prompt(content)), ask
+    )
+    # The thread belongs to whoever started the call; the others get the
+    # answer without joining that conversation
+    return answer, None if joined else new_session_id
+
+
 @app.post("/messages/query")
-async def query(client_id: str, content: str, status_code=201):
-    client = get_or_create_client(client_id)
+async def query(client_id: str, content: str, response: Response, status_code=201, x_session_id: str = Header(None)):
+    client = await get_or_create_client(client_id)
     if not client:
         raise HTTPException(status_code=404, detail="Client does not exist!")
     # For simplicity, we assume that each client has one assistant
-    decrypted_api_key = encryption.decrypt_api_key(client["api_key"])
-    backboard_client = BackboardClient(api_key=decrypted_api_key)
-    assistant = db.lookup_assistant(client_id)
+    assistant = await async_db.lookup_assistant(client_id)
     if not assistant:
         raise HTTPException(
             status_code=404, detail="No assistant found for this client!"
         )
-    assistant_id = assistant["assistant_id"]
     try:
-        thread = await backboard_client.create_thread(assistant_id)
-        output = []
-        sources = []
-        async for chunk in await backboard_client.add_message(
-            thread_id=thread.thread_id,
-            content=content,
-            memory="auto",
-            stream=True
-        ):
-            if chunk['type'] == 'content_streaming':
-                output.append(chunk['content'])
-            elif chunk['type'] == 'run_ended' and chunk.get("retrieved_memories", None):
-                memories = chunk['retrieved_memories']
-                for memory in memories:
-                    sources.append(memory['memory'])
-        
-        output = "".join(output)
-        return (output, sources)
+        answer, session_id = await ask_question(
+            client, client_id, assistant["assistant_id"], content, x_session_id
+        )
     except BackboardAPIError as e:
-        msg = f"Local Server Message: I detected that no real Backboard API Key is configured. Please add `BACKBOARD_API_KEY` to your `.env` file to enable real AI responses!" if "API Key" in str(e) else f"Local Server Error: {str(e)}"
-        return (msg, [])
+        return (backboard_error_message(e), [])
     except Exception as e:
         return (f"Local Server unexpected error: {str(e)}", [])
+    if session_id:
+        response.headers["X-Session-Id"] = session_id
+    return answer
+
+
+# Questions answered concurrently per /messages/batch request, and the most
+# prompts one request may carry
+MESSAGE_BATCH_CONCURRENCY = int(os.getenv("MESSAGE_BATCH_CONCURRENCY", "8"))
+MESSAGE_BATCH_MAX_PROMPTS = int(os.getenv("MESSAGE_BATCH_MAX_PROMPTS", "100"))
+
+
+@app.post("/messages/batch")
+async def batch_query(client_id: str, request: Request, concurrency: int = MESSAGE_BATCH_CONCURRENCY):
+    """
+    Answer many questions concurrently, streaming NDJSON in completion order.
+
+    Body: {"prompts": ["...", ...]}. Each line is one of
+        {"index": i, "prompt": ..., "answer": ..., "sources": [...], "session_id": ...}
+        {"index": i, "prompt": ..., "error": ...}
+    where index is the prompt's position in the request. Every prompt starts
+    its own conversation, so repeats are served by the answer cache or share
+    one Backboard call.
+
+    Args:
+        client_id: The client ID
+        concurrency: Questions in flight at once (capped at MESSAGE_BATCH_CONCURRENCY)
+    """
+    client = await get_or_create_client(client_id)
+    if not client:
+        raise HTTPException(status_code=404, detail="Client does not exist!")
+    assistant = await async_db.lookup_assistant(client_id)
+    if not assistant:
+        raise HTTPException(
+            status_code=404, detail="No assistant found for this client!"
+        )
+    try:
+        payload = await request.json()
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid JSON payload")
+    prompts = payload.get("prompts") if isinstance(payload, dict) else None
+    if not isinstance(prompts, list) or not prompts or not all(isinstance(p, str) for p in prompts):
+        raise HTTPException(status_code=400, detail="prompts must be a non-empty list of strings")
+    if len(prompts) > MESSAGE_BATCH_MAX_PROMPTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {MESSAGE_BATCH_MAX_PROMPTS} prompts per batch",
+        )
+    assistant_id = assistant["assistant_id"]
+    slots = asyncio.Semaphore(max(1, min(concurrency, MESSAGE_BATCH_CONCURRENCY)))
+
+    async def answer(index: int, prompt: str) -> dict:
+        item = {"index": index, "prompt": prompt}
+        async with slots:
+            try:
+                (output, sources), session_id = await ask_question(
+                    client, client_id, assistant_id, prompt
+                )
+            except BackboardAPIError as e:
+                item["error"] = backboard_error_message(e)
+            except Exception as e:
+                item["error"] = f"Local Server unexpected error: {str(e)}"
+            else:
+                item.update(answer=output, sources=sources, session_id=session_id)
+        return item
+
+    async def body():
+        tasks = [asyncio.ensure_future(answer(i, p)) for i, p in enumerate(prompts)]
+        try:
+            for done in asyncio.as_completed(tasks):
+                yield json.dumps(await done) + "\n"
+        finally:
+            # The caller went away: stop the questions not yet answered
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(
+        body(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# Streaming variants of /messages/send and /messages/query
+# Chunks are forwarded as soon as Backboard produces them, either as
+# Server-Sent Events ("data: {...}\n\n") or as NDJSON (one JSON object per
+# line). Frames, in order:
+#   {"type": "session", "session_id": ...}    reuse it via the X-Session-Id header
+#   {"type": "content", "content": ...}       zero or more answer chunks
+#   {"type": "done", "sources": [...]}        retrieved memories (query only)
+#   {"type": "error", "message": ...}         replaces "done" if the call fails
+STREAM_FORMATS = {"sse": "text/event-stream", "ndjson": "application/x-ndjson"}
+
+
+def encode_frame(frame: dict, format: str) -> str:
+    data = json.dumps(frame)
+    return f"data: {data}\n\n" if format == "sse" else f"{data}\n"
+
+
+async def stream_answer(client_id: str, content: str, session_id: str, format: str, include_sources: bool):
+    client = await get_or_create_client(client_id)
+    if not client:
+        raise HTTPException(status_code=404, detail="Client does not exist!")
+    assistant = await async_db.lookup_assistant(client_id)
+    if not assistant:
+        raise HTTPException(
+            status_code=404, detail="No assistant found for this client!"
+        )
+    if format not in STREAM_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(STREAM_FORMATS)}")
+    assistant_id = assistant["assistant_id"]
+
+    async def frames():
+        # The pooled client is built (and its key decrypted) inside the try, so
+        # an undecryptable key also ends the stream with an error frame
+        try:
+            async with backboard_clients.client(client_id, client["api_key"]) as backboard_client:
+                thread_id, new_session_id = await open_session_thread(
+                    backboard_client, client_id, assistant_id, session_id
+                )
+                yield {"type": "session", "session_id": new_session_id}
+                sources = []
+                async for chunk in await backboard_client.add_message(
+                    thread_id=thread_id,
+                    content=content,
+                    memory="auto",
+                    stream=True
+                ):
+                    if chunk['type'] == 'content_streaming':
+                        yield {"type": "content", "content": chunk['content']}
+                    elif chunk['type'] == 'run_ended' and chunk.get("retrieved_memories", None):
+                        sources.extend(memory['memory'] for memory in chunk['retrieved_memories'])
+                done = {"type": "done"}
+                if include_sources:
+                    done["sources"] = sources
+                yield done
+        except BackboardAPIError as e:
+            yield {"type": "error", "message": backboard_error_message(e)}
+        except Exception as e:
+            yield {"type": "error", "message": f"Local Server unexpected error: {str(e)}"}
+
+    async def body():
+        async for frame in frames():
+            yield encode_frame(frame, format)
+
+    return StreamingResponse(
+        body(),
+        media_type=STREAM_FORMATS[format],
+        headers={
+            "Cache-Control": "no-cache",
+            # Stop reverse proxies from buffering the stream
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+
+@app.post("/messages/send/stream")
+async def add_thread_stream(client_id: str, content: str, format: str = "sse", x_session_id: str = Header(None)):
+    """
+    Streaming /messages/send: answer chunks are sent as they arrive.
+
+    Args:
+        client_id: The client ID
+        content: The message
+        format: "sse" (Server-Sent Events) or "ndjson"
+    """
+    return await stream_answer(client_id, content, x_session_id, format, include_sources=False)
+
+
+@app.post("/messages/query/stream")
+async def query_stream(client_id: str, content: str, format: str = "sse", x_session_id: str = Header(None)):
+    """
+    Streaming /messages/query: answer chunks as they arrive, then the sources.
+
+    Args:
+        client_id: The client ID
+        content: The question
+        format: "sse" (Server-Sent Events) or "ndjson"
+    """
+    return await stream_answer(client_id, content, x_session_id, format, include_sources=True)
+
+
+@app.delete("/sessions/{session_id}")
+async def end_session(client_id: str, session_id: str):
+    """
+    End a conversation session; the next message starts a new Backboard thread.
+    """
+    if not await async_db.end_session(client_id, session_id):
+        raise HTTPException(status_code=404, detail="Session does not exist!")
+    return {"status": "ended", "session_id": session_id}
 
 #@app.post("/messages/summarize")
 #async def summarize(client_id: str, status_code=201):
@@ -241,7 +525,7 @@ async def register_drive_document(client_id: str, drive_url: str, status_code=20
     global drive_service
 
     # Check if client exists
-    client = db.lookup_client(client_id)
+    client = await async_db.lookup_client(client_id)
     if not client:
         raise HTTPException(status_code=404, detail="Client does not exist!")
 
@@ -257,7 +541,10 @@ async def register_drive_document(client_id: str, drive_url: str, status_code=20
         raise HTTPException(status_code=400, detail="Invalid Drive URL or file ID")
 
     try:
-        drive_service.register_document_for_monitoring(file_id, client_id)
+        # Registration does blocking Drive API and SQLite calls; keep them off the loop
+        await asyncio.to_thread(
+            drive_service.register_document_for_monitoring, file_id, client_id
+        )
         return {
             "status": "registered",
             "file_id": file_id,
@@ -281,7 +568,7 @@ async def process_drive_document(client_id: str, file_id: str, status_code=201):
     global drive_service
 
     # Check if client exists
-    client = db.lookup_client(client_id)
+    client = await async_db.lookup_client(client_id)
     if not client:
         raise HTTPException(status_code=404, detail="Client does not exist!")
 
@@ -315,12 +602,12 @@ async def start_drive_polling(client_id: str, interval: int = 300, status_code=2
     global drive_service
 
     # Check if client exists
-    client = db.lookup_client(client_id)
+    client = await async_db.lookup_client(client_id)
     if not client:
         raise HTTPException(status_code=404, detail="Client does not exist!")
 
     # Get all registered documents for this client
-    documents = db.get_all_drive_documents_for_client(client_id)
+    documents = await async_db.get_all_drive_documents_for_client(client_id)
 
     if not documents:
         raise HTTPException(
@@ -335,8 +622,8 @@ async def start_drive_polling(client_id: str, interval: int = 300, status_code=2
 
     file_ids = [doc["file_id"] for doc in documents]
 
-    # Start polling in background
-    asyncio.create_task(drive_service.poll_documents(file_ids, client_id, interval))
+    # The poll runs as a job that re-queues itself, so it survives restarts
+    await enqueue_poll(client_id, interval)
 
     return {
         "status": "polling_started",
@@ -347,24 +634,62 @@ async def start_drive_polling(client_id: str, interval: int = 300, status_code=2
     }
 
 
+# Page size limits for /drive/documents
+DOCUMENTS_PAGE_SIZE = 100
+DOCUMENTS_MAX_PAGE_SIZE = 500
+
+
 @app.get("/drive/documents")
-async def get_drive_documents(client_id: str):
+async def get_drive_documents(
+    client_id: str,
+    cursor: str = None,
+    limit: int = DOCUMENTS_PAGE_SIZE,
+    fields: str = None,
+    include_content: bool = False,
+):
     """
-    Get all registered Drive documents for a client.
+    Get a page of registered Drive documents for a client.
 
     Args:
         client_id: The client ID
+        cursor: next_cursor from the previous page; omit for the first page
+        limit: Page size (capped at DOCUMENTS_MAX_PAGE_SIZE)
+        fields: Comma-separated metadata columns to return, e.g. "file_name,updated_at"
+        include_content: Also return each document's full text
+
+    document_count is the client's total; page_count is the number of
+    documents in this page.
     """
-    client = db.lookup_client(client_id)
+    client = await async_db.lookup_client(client_id)
     if not client:
         raise HTTPException(status_code=404, detail="Client does not exist!")
 
-    documents = db.get_all_drive_documents_for_client(client_id)
+    if limit < 1:
+        raise HTTPException(status_code=400, detail="limit must be at least 1")
+    limit = min(limit, DOCUMENTS_MAX_PAGE_SIZE)
+    field_list = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+
+    try:
+        documents, next_cursor = await async_db.list_drive_documents(
+            client_id,
+            after=cursor,
+            limit=limit,
+            fields=field_list,
+            include_content=include_content,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # document_count stays the client's total, as before pagination; the
+    # source status row keeps it without counting the table
+    status = await async_db.get_source_status(client_id)
 
     return {
         "client_id": client_id,
-        "document_count": len(documents),
+        "document_count": status.get("Drive", {}).get("document_count", 0),
+        "page_count": len(documents),
         "documents": documents,
+        "next_cursor": next_cursor,
     }
 
 @app.get("/system/status")
@@ -372,18 +697,14 @@ async def get_system_status(client_id: str = "default_user"):
     """
     Get the connection status of all services.
     """
-    client = get_or_create_client(client_id)
+    client = await get_or_create_client(client_id)
 
-    drive_docs = db.get_all_drive_documents_for_client(client_id)
-    
-    # Get last updated times from activity log
-    activity = db.get_recent_activity(client_id, limit=50)
-    
-    def get_last_time(source_name):
-        for log in activity:
-            if log["source"] == source_name:
-                return log["created_at"]
-        return None
+    # One row per source, maintained by the writers
+    status = await async_db.get_source_status(client_id)
+    empty = {"last_event_at": None, "event_count": 0, "document_count": 0}
+    drive = status.get("Drive", empty)
+    telegram = status.get("Telegram", empty)
+    github = status.get("GitHub", empty)
 
     # Check if telegram bot is running (simplified placeholder)
     telegram_connected = False 
@@ -395,31 +716,97 @@ async def get_system_status(client_id: str = "default_user"):
             "has_api_key": client is not None and client.get("api_key") is not None
         },
         "drive": {
-            "connected": len(drive_docs) > 0,
-            "document_count": len(drive_docs),
-            "lastUpdated": get_last_time("Drive") or (drive_docs[0]["updated_at"] if drive_docs else None)
+            "connected": drive["document_count"] > 0,
+            "document_count": drive["document_count"],
+            "lastUpdated": drive["last_event_at"]
         },
         "telegram": {
-            "connected": telegram_connected or get_last_time("Telegram") is not None,
-            "lastUpdated": get_last_time("Telegram")
+            "connected": telegram_connected or telegram["last_event_at"] is not None,
+            "lastUpdated": telegram["last_event_at"]
         },
         "codebase": {
-            "connected": get_last_time("GitHub") is not None,
-            "lastUpdated": get_last_time("GitHub")
+            "connected": github["last_event_at"] is not None,
+            "lastUpdated": github["last_event_at"]
         }
     }
 
+@app.get("/system/metrics")
+async def get_system_metrics():
+    """
+    Get in-process cache and queue counters for monitoring.
+    """
+    return {
+        "lookup_cache": db.cache_stats(),
+        "backboard_clients": backboard_clients.stats(),
+        "backboard_limiter": backboard_clients.limiter_stats(),
+        "answer_cache": answer_cache.stats(),
+        "query_flights": query_flights.stats(),
+        "jobs": {**job_workers.stats(), "queue": await async_db.job_counts()},
+    }
+
+# Page size limit for /jobs
+JOBS_MAX_PAGE_SIZE = 500
+
+
+@app.get("/jobs")
+async def get_jobs(status: str = None, kind: str = None, limit: int = 50):
+    """
+    List background jobs, most recently updated first.
+
+    Args:
+        status: Only jobs in this status ("queued", "running", "done", "dead"
+            or "superseded")
+        kind: Only jobs of this kind, e.g. "git_push"
+        limit: Maximum jobs to return (capped at JOBS_MAX_PAGE_SIZE)
+    """
+    if limit < 1:
+        raise HTTPException(status_code=400, detail="limit must be at least 1")
+    job_list = await async_db.list_jobs(status, kind, min(limit, JOBS_MAX_PAGE_SIZE))
+    return {"job_count": len(job_list), "jobs": job_list}
+
+
+@app.post("/jobs/{job_id}/retry")
+async def retry_dead_job(job_id: int):
+    """
+    Queue a dead-lettered job again with a fresh attempt budget.
+    """
+    job = await async_db.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] != "dead":
+        raise HTTPException(status_code=409, detail="Only dead jobs can be retried")
+    if not await async_db.retry_job(job_id):
+        raise HTTPException(status_code=409, detail="The same work is already queued")
+    jobs.notify()
+    return {"status": "queued", "job_id": job_id}
+
 @app.get("/activity")
-async def get_activity(client_id: str = "default_user", limit: int = 10):
+async def get_activity(
+    client_id: str = "default_user", limit: int = 10, since_id: int = None
+):
     """
     Get recent activity across all sources.
+
+    Pass the X-Activity-Cursor header from the previous response as since_id to
+    receive the next limit entries after it; keep polling with the new cursor
+    until a 204 with no body says nothing more has changed.
     """
-    activity = db.get_recent_activity(client_id, limit)
-    
+    if since_id is not None:
+        activity = await async_db.get_activity_since(client_id, since_id, limit)
+        if not activity:
+            return Response(
+                status_code=204, headers={"X-Activity-Cursor": str(since_id)}
+            )
+        # Read oldest first so the cursor never skips rows; shown newest first
+        activity.reverse()
+    else:
+        activity = await async_db.get_recent_activity(client_id, limit)
+
     # Format for frontend if necessary (e.g., converting time to friendly format)
     # The frontend expects { source, title, summary, time, color }
     formatted_activity = [
         {
+            "id": log["id"],
             "source": log["source"],
             "title": log["title"],
             "summary": log["summary"],
@@ -428,8 +815,54 @@ async def get_activity(client_id: str = "default_user", limit: int = 10):
         }
         for log in activity
     ]
-    
-    return formatted_activity
+
+    # Entries not yet flushed to disk have no id; they are re-sent once stored
+    stored_ids = [log["id"] for log in activity if log["id"] is not None]
+    cursor = max(stored_ids) if stored_ids else (since_id or 0)
+    return JSONResponse(
+        formatted_activity, headers={"X-Activity-Cursor": str(cursor)}
+    )
+
+
+@app.get("/activity/summary")
+async def get_activity_summary(client_id: str = "default_user", days: int = 30):
+    """
+    Get per-day activity counts by source for activity that has been compacted.
+    """
+    return await async_db.get_activity_summary(client_id, days)
+
+
+# Result limits for /search
+SEARCH_RESULTS = 20
+SEARCH_MAX_RESULTS = 100
+
+
+@app.get("/search")
+async def search(client_id: str, q: str, limit: int = SEARCH_RESULTS, source: str = None):
+    """
+    Keyword search over a client's Drive documents, Telegram messages and repository files.
+    Answered from the local full-text index, so no Backboard call is made.
+
+    Args:
+        client_id: The client ID
+        q: Search terms; every term must match
+        limit: Maximum number of results (capped at SEARCH_MAX_RESULTS)
+        source: Optional filter: "Drive", "Telegram" or "GitHub"
+    """
+    client = await async_db.lookup_client(client_id)
+    if not client:
+        raise HTTPException(status_code=404, detail="Client does not exist!")
+
+    if limit < 1:
+        raise HTTPException(status_code=400, detail="limit must be at least 1")
+    limit = min(limit, SEARCH_MAX_RESULTS)
+
+    try:
+        results = await async_db.search(client_id, q, limit=limit, source=source)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return {"query": q, "result_count": len(results), "results": results}
 
 
 @app.post("/git/register")
@@ -442,12 +875,12 @@ async def register_git_repository(client_id: str, repo_url: str, status_code=201
         client_id: The client ID
         repo_url: Git repository URL
     """
-    client = db.lookup_client(client_id)
+    client = await async_db.lookup_client(client_id)
     if not client:
         raise HTTPException(status_code=404, detail="Client does not exist")
 
     # Check repository
-    repository = db.lookup_repository(repo_url)
+    repository = await async_db.lookup_repository(repo_url)
     if repository:
         raise HTTPException(status_code=409, detail="Repository already registered")
 
@@ -458,7 +891,7 @@ async def register_git_repository(client_id: str, repo_url: str, status_code=201
         raise HTTPException(status_code=400, detail=str(e))
 
     # Add repository to database
-    db.add_repository(repo_url, client_id)
+    await async_db.add_repository(repo_url, client_id)
 
     # Auto-create webhook if credentials are configured
     webhook_created = False
@@ -500,13 +933,21 @@ async def register_git_repository(client_id: str, repo_url: str, status_code=201
 
 
 @app.post("/git/webhook")
-async def git_webhook(request: Request):
+async def git_webhook(request: Request, x_github_delivery: str = Header(None)):
     """
     Webhook endpoint to receive updates from GitHub on pushes.
     GitHub calls this URL whenever a push happens to a registered repo.
     Only processes files that were added or modified in the push.
+
+    The push is stored as a delivery and ingested in the background (see
+    git_ingest.py), so this answers 202 right away however large the push is.
+    Poll /git/deliveries/{delivery_id} for the outcome. A redelivery (same
+    X-GitHub-Delivery) is not ingested again.
     """
-    payload = await request.json()
+    try:
+        payload = await request.json()
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid JSON payload")
 
     # Extract repo URL from GitHub's payload
     repo_url = payload.get("repository", {}).get("html_url")
@@ -514,7 +955,7 @@ async def git_webhook(request: Request):
         raise HTTPException(status_code=400, detail="Invalid webhook payload")
 
     # Check if this repo is registered in our system
-    repository = db.lookup_repository(repo_url)
+    repository = await async_db.lookup_repository(repo_url)
     if not repository:
         return {"status": "ignored", "reason": "Repository not registered"}
 
@@ -522,95 +963,68 @@ async def git_webhook(request: Request):
     client_id = repository["client_id"]
 
     # Check client still exists
-    client = db.lookup_client(client_id)
+    client = await async_db.lookup_client(client_id)
     if not client:
         return {"status": "error", "reason": "Client no longer exists"}
 
-    owner, repo = parse_github_url(repo_url)
-
     # Extract changed files from the commits in the payload
     # Each commit has "added", "modified", and "removed" arrays
     changed_file_paths = set()
+    removed_file_paths = set()
     commits = payload.get("commits", [])
 
     for commit in commits:
         # We care about added and modified files (not removed)
         for file_path in commit.get("added", []):
             changed_file_paths.add(file_path)
+            removed_file_paths.discard(file_path)
         for file_path in commit.get("modified", []):
             changed_file_paths.add(file_path)
+        # Removed files only need to leave the local search index
+        for file_path in commit.get("removed", []):
+            changed_file_paths.discard(file_path)
+            removed_file_paths.add(file_path)
 
-    if not changed_file_paths:
+    if not changed_file_paths and not removed_file_paths:
         return {"status": "ignored", "reason": "No files changed"}
 
-    # Filter and fetch only the changed files
-    changed_files = []
-
-    for file_path in changed_file_paths:
-        # Skip files we don't want to ingest
-        if not should_ingest_file(file_path):
-            continue
-
-        # Skip files in directories we want to skip
-        path_parts = file_path.split("/")
-        if any(should_skip_directory(part) for part in path_parts[:-1]):
-            continue
-
-        # Fetch the file content directly using raw GitHub URL
-        try:
+    delivery_id = x_github_delivery or secrets.token_urlsafe(16)
+    created = await async_db.create_webhook_delivery(
+        delivery_id,
+        client_id,
+        repo_url,
+        {
+            "changed": sorted(changed_file_paths),
+            "removed": sorted(removed_file_paths),
             # Get default branch from payload or use 'main'
-            default_branch = payload.get("repository", {}).get("default_branch", "main")
-            raw_url = f"https://raw.githubusercontent.com/{owner}/{repo}/{default_branch}/{file_path}"
-            content = fetch_file_content(raw_url)
-            if content:
-                changed_files.append((file_path, content))
-        except Exception as e:
-            print(f"Error fetching file {file_path}: {e}")
-
-    if not changed_files:
-        return {"status": "ignored", "reason": "No ingestable files changed"}
-
-    # Send to Backboard memory
-    decrypted_api_key = encryption.decrypt_api_key(client["api_key"])
-    backboard_client = BackboardClient(api_key=decrypted_api_key)
-    assistant = db.lookup_assistant(client_id)
-    if not assistant:
-        return {"status": "error", "reason": "No assistant found"}
-
-    assistant_id = assistant["assistant_id"]
-    try:
-        thread = await backboard_client.create_thread(assistant_id)
-    except BackboardAPIError as e:
-        print(f"Error creating thread for git webhook: {e}")
-        return {"status": "error", "reason": f"Backboard API Error: {str(e)}"}
-    except Exception as e:
-        print(f"Unexpected error in git webhook: {e}")
-        return {"status": "error", "reason": f"Unexpected error: {str(e)}"}
-
-    for file_path, file_content in changed_files:
-        async for chunk in await backboard_client.add_message(
-            thread_id=thread.thread_id,
-            content=f"Updated file: {file_path}\n\n{file_content}",
-            memory="Auto",
-            stream=True,
-        ):
-            pass  # Just consume the stream
-
-    # Log activity for dashboard
-    db.log_activity(
-        client_id=client_id,
-        source="GitHub",
-        title=f"New push to {repo}",
-        summary=f"Processed {len(changed_files)} files: {', '.join([f[0] for f in changed_files[:3]])}{'...' if len(changed_files) > 3 else ''}",
-        color="blue"
+            "default_branch": payload.get("repository", {}).get("default_branch", "main"),
+        },
+    )
+    if created:
+        jobs.notify()
+    delivery = await async_db.lookup_webhook_delivery(delivery_id)
+    return JSONResponse(
+        status_code=202,
+        content={
+            "status": delivery["status"],
+            "delivery_id": delivery_id,
+            "duplicate": not created,
+        },
     )
 
-    # Emit event to notify frontend of repo update
-    await emit_event("repo", client_id)
 
-    return {
-        "status": "updated",
-        "repo_url": repo_url,
-        "files_updated": len(changed_files),
-        "files": [f[0] for f in changed_files],
-    }
+@app.get("/git/deliveries/{delivery_id}")
+async def get_webhook_delivery(delivery_id: str):
+    """
+    Get the ingestion status of a webhook delivery.
+
+    status is "queued", "running", "done" or "failed"; result holds what
+    the webhook used to return synchronously (files updated, messages sent).
+    """
+    delivery = await async_db.lookup_webhook_delivery(delivery_id)
+    if not delivery:
+        raise HTTPException(status_code=404, detail="Delivery not found")
+    payload = delivery.pop("payload")
+    delivery["files_changed"] = len(payload["changed"])
+    delivery["files_removed"] = len(payload["removed"])
+    return delivery
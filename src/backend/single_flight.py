@@ -0,0 +1,61 @@
+"""
+In-flight deduplication of identical concurrent calls.
+
+When several requests ask for the same key at once, only the first runs the
+call; the others wait for it and receive the same result (or exception).
+Nothing is kept once the call finishes, so unlike a cache there is no
+staleness: a request arriving afterwards starts a fresh call.
+
+The call runs as its own task, so a caller that disconnects (and is
+cancelled) does not cancel the work the others are waiting for.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable, Tuple
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key."""
+
+    def __init__(self):
+        self._calls = {}
+        self.calls = 0
+        self.joined = 0
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Run call() unless a call for key is already in flight, then share its result.
+
+        Args:
+            key: Identifies calls that may be shared
+            call: Zero-argument coroutine function doing the work
+
+        Returns:
+            (result, joined) where joined is True if this caller attached to a
+            call started by another one
+        """
+        task = self._calls.get(key)
+        joined = task is not None
+        if joined:
+            self.joined += 1
+        else:
+            self.calls += 1
+            task = asyncio.ensure_future(call())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        return await asyncio.shield(task), joined
+
+    def _forget(self, key: Hashable, task: asyncio.Future):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Mark the exception as retrieved if every waiter went away
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        """Return call counters and the number of calls in flight."""
+        return {
+            "calls": self.calls,
+            "joined": self.joined,
+            "in_flight": len(self._calls),
+        }
@@ -0,0 +1,123 @@
+"""
+In-memory write buffer that batches row inserts.
+
+High-frequency writers (activity logging, chat messages) add rows here instead of
+committing one row per call. Rows are handed to a flush callback in a single
+batch once max_rows accumulate or max_delay seconds pass, whichever comes first.
+A background thread handles the time-based flush; call close() on shutdown to
+write whatever is still pending.
+"""
+
+import threading
+from contextlib import contextmanager
+from typing import Callable, List
+
+
+class WriteBuffer:
+    """
+    Accumulates rows and writes them in batches through write_rows.
+
+    write_rows receives a list of rows and must persist them in one transaction.
+    If it raises, the batch is put back at the front of the buffer so the next
+    flush retries it.
+    """
+
+    def __init__(
+        self,
+        write_rows: Callable[[List[tuple]], None],
+        max_rows: int = 50,
+        max_delay: float = 2.0,
+        name: str = "write-buffer",
+    ):
+        """
+        Args:
+            write_rows: Callable persisting a batch of rows
+            max_rows: Flush as soon as this many rows are pending
+            max_delay: Maximum seconds a row may wait before being flushed
+            name: Name of the background flusher thread
+        """
+        self.write_rows = write_rows
+        self.max_rows = max_rows
+        self.max_delay = max_delay
+        self.name = name
+        self._rows: List[tuple] = []
+        self._lock = threading.Lock()
+        # Held for the whole take-and-write so readers never see a batch in limbo
+        self._flush_lock = threading.RLock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add(self, row: tuple):
+        """Queue a row, flushing immediately if the size threshold is reached."""
+        with self._lock:
+            self._rows.append(row)
+            full = len(self._rows) >= self.max_rows
+            self._ensure_flusher()
+        if full:
+            self.flush()
+
+    def pending(self) -> List[tuple]:
+        """Return a copy of the rows not yet written, oldest first."""
+        with self._lock:
+            return list(self._rows)
+
+    @contextmanager
+    def reading(self):
+        """
+        Block flushes while the caller reads from the database.
+
+        Yields the pending rows, so a reader can merge them with what it queries
+        without a batch being committed (and counted twice) halfway through.
+        """
+        with self._flush_lock:
+            yield self.pending()
+
+    def flush(self) -> int:
+        """
+        Write every pending row in one batch.
+
+        Returns:
+            Number of rows written
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch, self._rows = self._rows, []
+            if not batch:
+                return 0
+            try:
+                self.write_rows(batch)
+            except Exception:
+                with self._lock:
+                    self._rows = batch + self._rows
+                raise
+            return len(batch)
+
+    def clear(self):
+        """Drop pending rows without writing them."""
+        with self._lock:
+            self._rows = []
+
+    def close(self):
+        """Stop the background flusher and write any remaining rows."""
+        self._stop.set()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        self._thread = None
+        self.flush()
+        self._stop.clear()
+
+    def _ensure_flusher(self):
+        # Called with self._lock held
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(
+                target=self._run, name=self.name, daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.max_delay):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error flushing {self.name}: {e}")
@@ -7,7 +7,8 @@ import sys
 import sqlite3
 import tempfile
 import pytest
-from unittest.mock import patch, MagicMock
+from contextlib import ExitStack
+from unittest.mock import patch, MagicMock, AsyncMock
 from cryptography.fernet import Fernet
 
 # Add the backend directory to the path
@@ -40,14 +41,36 @@ def clean_test_db():
         # Clear all tables
         try:
             cur.execute("DELETE FROM drive_documents")
-            cur.execute("DELETE FROM chats")
+            cur.execute("DELETE FROM messages")
             cur.execute("DELETE FROM assistants")
             cur.execute("DELETE FROM clients")
+            cur.execute("DELETE FROM document_blobs")
+            cur.execute("DELETE FROM webhook_deliveries")
+            cur.execute("DELETE FROM jobs")
             con.commit()
         except:
             pass
         finally:
             con.close()
+    # Drop pooled connections, buffered rows and cached lookups so each test starts fresh
+    backboard_clients = sys.modules.get("src.backend.backboard_clients")
+    if backboard_clients is not None:
+        backboard_clients._pool = backboard_clients.BackboardClientPool()
+    answer_cache = sys.modules.get("src.backend.answer_cache")
+    if answer_cache is not None:
+        answer_cache.clear()
+    for module_name in ("db", "src.backend.db"):
+        module = sys.modules.get(module_name)
+        if module is not None and hasattr(module, "_activity_buffer"):
+            module._activity_buffer.clear()
+        if module is not None and hasattr(module, "_message_buffer"):
+            module._message_buffer.clear()
+        if module is not None and hasattr(module, "clear_caches"):
+            module.clear_caches()
+        if module is not None and hasattr(module, "close_connections"):
+            module.close_connections()
+        if module is not None and hasattr(module, "init_db"):
+            module.init_db()
     yield
 
 
@@ -77,10 +100,13 @@ def temp_db(tmp_path):
     )
     cur.execute(
         """
-        CREATE TABLE IF NOT EXISTS chats (
-            chat_id TEXT PRIMARY KEY,
+        CREATE TABLE IF NOT EXISTS messages (
+            id INTEGER PRIMARY KEY,
+            client_id TEXT,
+            chat_id TEXT NOT NULL,
             channel_name TEXT,
-            chat TEXT
+            message TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
     """
     )
@@ -98,6 +124,20 @@ def temp_db(tmp_path):
         )
     """
     )
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS search_documents (
+            id INTEGER PRIMARY KEY,
+            client_id TEXT,
+            source TEXT NOT NULL,
+            ref TEXT NOT NULL,
+            title TEXT,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE (source, ref)
+        )
+    """
+    )
+    cur.execute("CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(title, body)")
     con.commit()
     con.close()
 
@@ -132,3 +172,46 @@ def mock_backboard_client():
     mock_client.create_thread = MagicMock(return_value=mock_thread)
 
     return mock_client
+
+
+@pytest.fixture
+def make_backboard():
+    """Build a mocked pooled BackboardClient whose add_message streams chunks."""
+    def make(*chunks, error=None):
+        chunks = chunks or ({"type": "content_streaming", "content": "hi"},)
+        instance = AsyncMock()
+        instance.create_thread.return_value = MagicMock(thread_id="thread_new")
+
+        async def add_message(**kwargs):
+            if error:
+                raise error
+            async def stream():
+                for chunk in chunks:
+                    yield chunk
+            return stream()
+
+        instance.add_message = MagicMock(side_effect=add_message)
+        return instance
+
+    return make
+
+
+@pytest.fixture
+def use_backboard():
+    """
+    Serve client "test" (assistant "asst_1") from a mocked BackboardClient.
+
+    Call it with the instance to install; the patches last until the test ends.
+    """
+    from src.backend import backboard_clients
+    from src.backend import db
+
+    with ExitStack() as stack:
+        def install(instance):
+            stack.enter_context(patch.object(db, "lookup_client", return_value={"client_id": "test", "api_key": "enc"}))
+            stack.enter_context(patch.object(db, "lookup_assistant", return_value={"assistant_id": "asst_1"}))
+            stack.enter_context(patch.object(backboard_clients, "BackboardClient", return_value=instance))
+            stack.enter_context(patch.object(backboard_clients.encryption, "decrypt_api_key", return_value="key"))
+            return instance
+
+        yield install
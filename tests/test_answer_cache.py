@@ -0,0 +1,61 @@
+"""
+Tests for answer_cache.py - cached /messages/query answers.
+"""
+from src.backend.answer_cache import AnswerCache, normalize_prompt
+
+
+class TestAnswerCache:
+    """Tests for the AnswerCache class."""
+
+    def test_normalized_prompts_share_an_entry(self):
+        """Test that case, spacing and trailing punctuation don't matter."""
+        cache = AnswerCache()
+        cache.put("c1", "How do I run the server?", ("answer", []), cache.generation("c1"))
+
+        assert normalize_prompt("  how do I   run the SERVER ") == "how do i run the server"
+        assert cache.get("c1", "how do i run the server") == ("answer", [])
+        assert cache.get("c2", "How do I run the server?") is None
+        assert cache.stats()["hits"] == 1
+
+    def test_bump_generation_invalidates_client(self):
+        """Test that ingestion for a client drops only that client's answers."""
+        cache = AnswerCache()
+        cache.put("c1", "q", "a1", cache.generation("c1"))
+        cache.put("c2", "q", "a2", cache.generation("c2"))
+
+        cache.bump_generation("c1")
+
+        assert cache.get("c1", "q") is None
+        assert cache.get("c2", "q") == "a2"
+        assert cache.stats()["stale"] == 1
+
+    def test_bump_without_client_invalidates_everyone(self):
+        """Test that an ingestion without a client_id drops every answer."""
+        cache = AnswerCache()
+        cache.put("c1", "q", "a1", cache.generation("c1"))
+
+        cache.bump_generation()
+
+        assert cache.get("c1", "q") is None
+
+    def test_put_ignores_answer_from_older_generation(self):
+        """Test that an answer computed before an ingestion is never stored."""
+        cache = AnswerCache()
+        generation = cache.generation("c1")
+        cache.bump_generation("c1")
+
+        cache.put("c1", "q", "old", generation)
+
+        assert cache.get("c1", "q") is None
+        assert cache.stats()["size"] == 0
+
+    def test_lru_eviction(self):
+        """Test that the least recently used answer is evicted past maxsize."""
+        cache = AnswerCache(maxsize=2)
+        for prompt in ("a", "b"):
+            cache.put("c1", prompt, prompt, cache.generation("c1"))
+        cache.get("c1", "a")
+        cache.put("c1", "c", "c", cache.generation("c1"))
+
+        assert cache.get("c1", "b") is None
+        assert cache.get("c1", "a") == "a"
@@ -0,0 +1,67 @@
+"""
+Tests for async_db.py - awaitable wrappers around db.py.
+"""
+import threading
+import pytest
+from unittest.mock import patch
+
+from src.backend import async_db
+from src.backend import db
+
+
+class TestRun:
+    """Tests for the DB thread pool runner."""
+
+    @pytest.mark.asyncio
+    async def test_run_executes_off_the_event_loop_thread(self):
+        """Test that database work runs on a dedicated db worker thread."""
+        thread_name = await async_db.run(lambda: threading.current_thread().name)
+
+        assert thread_name.startswith("db")
+        assert thread_name != threading.current_thread().name
+
+    @pytest.mark.asyncio
+    async def test_run_propagates_exceptions(self):
+        """Test that exceptions raised in the worker reach the caller."""
+        def fail():
+            raise ValueError("boom")
+
+        with pytest.raises(ValueError, match="boom"):
+            await async_db.run(fail)
+
+    @pytest.mark.asyncio
+    async def test_shutdown_recreates_executor_on_next_call(self):
+        """Test that the pool can be used again after shutdown."""
+        await async_db.run(lambda: None)
+        async_db.shutdown()
+
+        assert await async_db.run(lambda: 42) == 42
+
+
+class TestWrappers:
+    """Tests for the db.py mirror functions."""
+
+    @pytest.mark.asyncio
+    async def test_wrappers_resolve_patched_db_functions(self):
+        """Test that wrappers call whatever db function is current."""
+        with patch.object(db, "lookup_client", return_value={"client_id": "c1"}) as mock_lookup:
+            result = await async_db.lookup_client("c1")
+
+        mock_lookup.assert_called_once_with("c1")
+        assert result == {"client_id": "c1"}
+
+    @pytest.mark.asyncio
+    async def test_create_drive_document_passes_keyword_arguments(self):
+        """Test that drive document fields are forwarded by name."""
+        with patch.object(db, "create_drive_document") as mock_create:
+            await async_db.create_drive_document(
+                file_id="f1",
+                client_id="c1",
+                file_name="Doc",
+                content_hash="h",
+                last_modified="2026-01-01T00:00:00Z",
+                content="body",
+            )
+
+        assert mock_create.call_args.kwargs["content"] == "body"
+        assert mock_create.call_args.kwargs["file_id"] == "f1"
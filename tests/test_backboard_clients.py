@@ -0,0 +1,228 @@
+"""
+Tests for backboard_clients.py - pooled BackboardClient instances.
+"""
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from src.backend import backboard_clients
+from src.backend.backboard_clients import BackboardClientPool
+
+
+@pytest.fixture
+def mock_backboard():
+    """Build a fresh AsyncMock per BackboardClient and decrypt keys trivially."""
+    with patch.object(backboard_clients, 'BackboardClient',
+                      side_effect=lambda api_key: AsyncMock(api_key=api_key)) as mock_cls, \
+         patch.object(backboard_clients.encryption, 'decrypt_api_key',
+                      side_effect=lambda key: f"plain-{key}") as mock_decrypt:
+        yield mock_cls, mock_decrypt
+
+
+class TestBackboardClientPool:
+    """Tests for the BackboardClientPool class."""
+
+    @pytest.mark.asyncio
+    async def test_client_is_reused_per_client_id(self, mock_backboard):
+        """Test that the key is decrypted and the client built only once."""
+        mock_cls, mock_decrypt = mock_backboard
+        pool = BackboardClientPool()
+
+        async with pool.client("c1", "enc") as first:
+            pass
+        async with pool.client("c1", "enc") as second:
+            pass
+
+        assert first is second
+        assert first.api_key == "plain-enc"
+        mock_decrypt.assert_called_once_with("enc")
+        assert pool.stats()["hits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_changed_key_rebuilds_client(self, mock_backboard):
+        """Test that a new stored key replaces and closes the old client."""
+        pool = BackboardClientPool()
+
+        async with pool.client("c1", "old") as old:
+            pass
+        async with pool.client("c1", "new") as new:
+            pass
+
+        assert new is not old
+        assert new.api_key == "plain-new"
+        old.aclose.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_least_recently_used_client_is_evicted(self, mock_backboard):
+        """Test that the pool closes clients beyond maxsize."""
+        pool = BackboardClientPool(maxsize=2)
+
+        async with pool.client("c1", "k") as c1:
+            pass
+        async with pool.client("c2", "k"):
+            pass
+        async with pool.client("c1", "k"):
+            pass
+        async with pool.client("c3", "k"):
+            pass
+
+        assert pool.stats()["size"] == 2
+        c1.aclose.assert_not_awaited()
+        async with pool.client("c1", "k") as again:
+            assert again is c1
+
+    @pytest.mark.asyncio
+    async def test_client_in_use_is_closed_after_release(self, mock_backboard):
+        """Test that invalidation waits for in-flight users."""
+        pool = BackboardClientPool()
+
+        async with pool.client("c1", "k") as in_use:
+            await pool.invalidate("c1")
+            in_use.aclose.assert_not_awaited()
+
+        in_use.aclose.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_close_closes_every_client(self, mock_backboard):
+        """Test shutdown cleanup."""
+        pool = BackboardClientPool()
+        async with pool.client("c1", "k") as c1:
+            pass
+        async with pool.client("c2", "k") as c2:
+            pass
+
+        await pool.close()
+
+        c1.aclose.assert_awaited_once()
+        c2.aclose.assert_awaited_once()
+        assert pool.stats()["size"] == 0
+
+
+def _rate_limited(retry_after=None):
+    import httpx
+    from backboard.exceptions import BackboardRateLimitError
+    headers = {"Retry-After": retry_after} if retry_after is not None else {}
+    response = httpx.Response(429, headers=headers)
+    return BackboardRateLimitError("slow down", 429, response)
+
+
+class TestBackboardLimiter:
+    """Tests for the BackboardLimiter class."""
+
+    @pytest.mark.asyncio
+    async def test_per_client_concurrency_is_bounded(self):
+        """Test that a client never has more calls in flight than its limit."""
+        import asyncio
+        from src.backend.backboard_clients import BackboardLimiter
+        limiter = BackboardLimiter(max_concurrency=10, client_concurrency=2)
+        in_flight = []
+        peak = []
+
+        async def call():
+            in_flight.append(1)
+            peak.append(len(in_flight))
+            await asyncio.sleep(0.01)
+            in_flight.pop()
+
+        await asyncio.gather(*(limiter.call("c1", call) for _ in range(6)))
+
+        assert max(peak) == 2
+        assert limiter.stats()["calls"] == 6
+        assert limiter.stats()["waiting"] == 0
+
+    @pytest.mark.asyncio
+    async def test_queue_depth_is_reported(self):
+        """Test that waiting calls show up in the stats while queued."""
+        import asyncio
+        from src.backend.backboard_clients import BackboardLimiter
+        limiter = BackboardLimiter(max_concurrency=1, client_concurrency=1)
+        release = asyncio.Event()
+
+        tasks = [asyncio.create_task(limiter.call("c1", release.wait)) for _ in range(3)]
+        await asyncio.sleep(0)
+        stats = limiter.stats()
+        release.set()
+        await asyncio.gather(*tasks)
+
+        assert stats["active"] == 1
+        assert stats["waiting"] == 2
+        assert stats["waiting_by_client"] == {"c1": 2}
+
+    @pytest.mark.asyncio
+    async def test_rate_limit_retries_after_retry_after(self):
+        """Test that a 429 is retried after the server's Retry-After."""
+        from src.backend.backboard_clients import BackboardLimiter
+        limiter = BackboardLimiter(max_retries=2)
+        outcomes = [_rate_limited("3"), "ok"]
+
+        async def call():
+            outcome = outcomes.pop(0)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        with patch("asyncio.sleep", new=AsyncMock()) as mock_sleep:
+            assert await limiter.call("c1", call) == "ok"
+
+        mock_sleep.assert_awaited_once_with(3.0)
+        assert limiter.stats()["rate_limited"] == 1
+        assert limiter.stats()["retries"] == 1
+
+    @pytest.mark.asyncio
+    async def test_gives_up_after_max_retries(self):
+        """Test that a persistent failure is raised once retries run out."""
+        from backboard.exceptions import BackboardServerError
+        from src.backend.backboard_clients import BackboardLimiter
+        limiter = BackboardLimiter(max_retries=2)
+        call = AsyncMock(side_effect=BackboardServerError("down", 503))
+
+        with patch("asyncio.sleep", new=AsyncMock()):
+            with pytest.raises(BackboardServerError):
+                await limiter.call("c1", call)
+
+        assert call.await_count == 3
+        assert limiter.stats()["failures"] == 1
+
+    @pytest.mark.asyncio
+    async def test_non_retryable_errors_are_raised_immediately(self):
+        """Test that validation errors are not retried."""
+        from backboard.exceptions import BackboardValidationError
+        from src.backend.backboard_clients import BackboardLimiter
+        limiter = BackboardLimiter()
+        call = AsyncMock(side_effect=BackboardValidationError("bad", 400))
+
+        with pytest.raises(BackboardValidationError):
+            await limiter.call("c1", call)
+
+        assert call.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_stream_retries_only_before_first_chunk(self):
+        """Test that a stream failing mid-way is not replayed."""
+        from src.backend.backboard_clients import BackboardLimiter
+        limiter = BackboardLimiter()
+        starts = []
+
+        async def start():
+            starts.append(1)
+            async def chunks():
+                yield "first"
+                raise _rate_limited()
+            return chunks()
+
+        received = []
+        with pytest.raises(Exception):
+            async for chunk in limiter.stream("c1", start):
+                received.append(chunk)
+
+        assert received == ["first"]
+        assert len(starts) == 1
+
+    @pytest.mark.asyncio
+    async def test_pooled_client_calls_go_through_limiter(self, mock_backboard):
+        """Test that the pool hands out clients whose calls are limited."""
+        pool = BackboardClientPool()
+
+        async with pool.client("c1", "enc") as backboard_client:
+            await backboard_client.create_thread("asst")
+
+        assert pool.limiter.stats()["calls"] == 1
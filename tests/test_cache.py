@@ -0,0 +1,71 @@
+"""
+Tests for cache.py - TTL/LRU lookup cache.
+"""
+import time
+from unittest.mock import MagicMock
+
+from src.backend.cache import LookupCache
+
+
+class TestLookupCache:
+    """Tests for the LookupCache class."""
+
+    def test_second_lookup_is_a_hit(self):
+        """Test that a loaded value is served from the cache."""
+        cache = LookupCache("test")
+        load = MagicMock(return_value={"client_id": "c1"})
+
+        cache.get_or_load("c1", load)
+        value = cache.get_or_load("c1", load)
+
+        assert value == {"client_id": "c1"}
+        load.assert_called_once()
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+
+    def test_none_is_not_cached(self):
+        """Test that missing rows are looked up again next time."""
+        cache = LookupCache("test")
+        load = MagicMock(return_value=None)
+
+        cache.get_or_load("missing", load)
+        cache.get_or_load("missing", load)
+
+        assert load.call_count == 2
+
+    def test_invalidate_forces_reload(self):
+        """Test that invalidated keys are fetched again."""
+        cache = LookupCache("test")
+        cache.get_or_load("c1", lambda: "old")
+        cache.invalidate("c1")
+
+        assert cache.get_or_load("c1", lambda: "new") == "new"
+
+    def test_entries_expire_after_ttl(self):
+        """Test that entries older than ttl are reloaded."""
+        cache = LookupCache("test", ttl=0.05)
+        cache.get_or_load("c1", lambda: "old")
+        time.sleep(0.1)
+
+        assert cache.get_or_load("c1", lambda: "new") == "new"
+
+    def test_least_recently_used_entry_is_evicted(self):
+        """Test that maxsize bounds the cache."""
+        cache = LookupCache("test", maxsize=2)
+        cache.get_or_load("a", lambda: 1)
+        cache.get_or_load("b", lambda: 2)
+        cache.get_or_load("a", lambda: 1)
+        cache.get_or_load("c", lambda: 3)
+
+        assert cache.stats()["size"] == 2
+        assert cache.get_or_load("b", lambda: "reloaded") == "reloaded"
+
+    def test_clear_resets_counters(self):
+        """Test that clear empties the cache and zeroes the stats."""
+        cache = LookupCache("test")
+        cache.get_or_load("c1", lambda: 1)
+        cache.clear()
+
+        stats = cache.stats()
+        assert stats["size"] == 0
+        assert stats["hits"] == stats["misses"] == 0
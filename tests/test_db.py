@@ -176,10 +176,10 @@ class TestThreadFunctions:
     """Tests for thread/chat-related database functions."""
 
     def test_lookup_thread_returns_thread_when_exists(self, temp_db):
-        """Test lookup_thread returns chat data when exists."""
+        """Test lookup_thread returns the latest message of a chat."""
         con = sqlite3.connect(temp_db)
         cur = con.cursor()
-        cur.execute("INSERT INTO chats (chat_id, channel_name, chat) VALUES (?, ?, ?)",
+        cur.execute("INSERT INTO messages (chat_id, channel_name, message) VALUES (?, ?, ?)",
                     ("test_chat_id", "test_channel", "test message"))
         con.commit()
         con.close()
@@ -195,7 +195,7 @@ class TestThreadFunctions:
             assert result is not None
             assert result['chat_id'] == "test_chat_id"
             assert result['channel_name'] == "test_channel"
-            assert result['chat'] == "test message"
+            assert result['message'] == "test message"
 
     def test_lookup_thread_returns_none_when_not_exists(self, temp_db):
         """Test lookup_thread returns None when chat does not exist."""
@@ -210,7 +210,7 @@ class TestThreadFunctions:
             assert result is None
 
     def test_create_thread_inserts_new_thread(self, temp_db):
-        """Test create_thread successfully inserts a new chat."""
+        """Test create_thread appends a message once the buffer is flushed."""
         with patch('db.get_connection') as mock_get_conn:
             con = sqlite3.connect(temp_db)
             con.row_factory = sqlite3.Row
@@ -218,10 +218,12 @@ class TestThreadFunctions:
 
             import db
             db.create_thread("new_chat_id", "new_channel", "new message content")
+            db.flush_messages()
 
         con = sqlite3.connect(temp_db)
         cur = con.cursor()
-        cur.execute("SELECT * FROM chats WHERE chat_id = ?", ("new_chat_id",))
+        cur.execute("SELECT chat_id, channel_name, message FROM messages WHERE chat_id = ?",
+                    ("new_chat_id",))
         result = cur.fetchone()
         con.close()
 
@@ -240,11 +242,956 @@ class TestThreadFunctions:
             import db
             long_message = "A" * 10000
             db.create_thread("long_chat_id", "channel", long_message)
+            db.flush_messages()
 
         con = sqlite3.connect(temp_db)
         cur = con.cursor()
-        cur.execute("SELECT chat FROM chats WHERE chat_id = ?", ("long_chat_id",))
+        cur.execute("SELECT message FROM messages WHERE chat_id = ?", ("long_chat_id",))
         result = cur.fetchone()
         con.close()
 
         assert result[0] == long_message
+
+
+class TestConnectionPool:
+    """Tests for the pooled, per-thread connection manager."""
+
+    @pytest.fixture
+    def pooled_db(self, temp_db):
+        """Point the db module at a fresh temporary database."""
+        import db
+        with patch.object(db, 'DB_NAME', temp_db):
+            db.close_connections()
+            yield db
+            db.close_connections()
+
+    def test_get_connection_reuses_connection_within_thread(self, pooled_db):
+        """Test that repeated calls in one thread share a connection."""
+        assert pooled_db.get_connection() is pooled_db.get_connection()
+
+    def test_get_connection_is_per_thread(self, pooled_db):
+        """Test that each thread gets its own connection."""
+        import threading
+
+        other = []
+        thread = threading.Thread(target=lambda: other.append(pooled_db.get_connection()))
+        thread.start()
+        thread.join()
+
+        assert other[0] is not pooled_db.get_connection()
+
+    def test_get_connection_enables_wal_and_busy_timeout(self, pooled_db):
+        """Test that pragmas are configured when the connection is opened."""
+        con = pooled_db.get_connection()
+
+        assert con.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert con.execute("PRAGMA busy_timeout").fetchone()[0] == pooled_db.BUSY_TIMEOUT_MS
+
+    def test_thread_exit_closes_its_connection(self, pooled_db):
+        """Test that connections of finished threads are not kept open."""
+        import gc
+        import threading
+
+        other = []
+        thread = threading.Thread(target=lambda: other.append(pooled_db.get_connection()))
+        thread.start()
+        thread.join()
+        gc.collect()
+
+        with pytest.raises(sqlite3.ProgrammingError):
+            other[0].execute("SELECT 1")
+        assert pooled_db.get_connection().execute("SELECT 1").fetchone()[0] == 1
+
+    def test_close_connections_opens_fresh_connection(self, pooled_db):
+        """Test that close_connections discards the pooled handles."""
+        first = pooled_db.get_connection()
+        pooled_db.close_connections()
+
+        assert pooled_db.get_connection() is not first
+
+    def test_failed_write_does_not_leave_transaction_open(self, pooled_db):
+        """Test that a failed insert is rolled back on the shared connection."""
+        pooled_db.create_client("dup_client", "key")
+        with pytest.raises(sqlite3.IntegrityError):
+            pooled_db.create_client("dup_client", "key")
+
+        assert not pooled_db.get_connection().in_transaction
+        assert pooled_db.lookup_client("dup_client")["api_key"] == "key"
+
+
+class TestMigrations:
+    """Tests for the versioned schema migrations."""
+
+    def test_apply_migrations_on_fresh_database(self, tmp_path):
+        """Test that a new database is migrated to the latest version."""
+        import db
+        con = sqlite3.connect(str(tmp_path / "fresh.db"))
+
+        version = db.apply_migrations(con)
+
+        assert version == db.MIGRATIONS[-1][0]
+        assert db.get_schema_version(con) == version
+        con.close()
+
+    def test_apply_migrations_is_idempotent(self, tmp_path):
+        """Test that re-running migrations applies nothing new."""
+        import db
+        con = sqlite3.connect(str(tmp_path / "fresh.db"))
+        db.apply_migrations(con)
+        db.apply_migrations(con)
+
+        rows = con.execute("SELECT version FROM schema_version").fetchall()
+        assert [row[0] for row in rows] == [m[0] for m in db.MIGRATIONS]
+        con.close()
+
+    def test_apply_migrations_preserves_existing_data(self, temp_db):
+        """Test that a pre-migration database keeps its rows and gains indexes."""
+        import db
+        con = sqlite3.connect(temp_db)
+        con.execute("INSERT INTO clients (client_id, api_key) VALUES (?, ?)",
+                    ("legacy_client", "legacy_key"))
+        con.commit()
+
+        db.apply_migrations(con)
+
+        row = con.execute("SELECT api_key FROM clients WHERE client_id = ?",
+                          ("legacy_client",)).fetchone()
+        assert row[0] == "legacy_key"
+        indexes = {r[0] for r in con.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index'")}
+        assert "idx_assistants_client_id" in indexes
+        assert "idx_activity_log_client_id" in indexes
+        con.close()
+
+    def test_recent_activity_query_uses_index(self, tmp_path):
+        """Test that the activity feed query is an index seek, not a scan."""
+        import db
+        con = sqlite3.connect(str(tmp_path / "fresh.db"))
+        db.apply_migrations(con)
+
+        plan = " ".join(str(row[-1]) for row in con.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM activity_log WHERE client_id = ? "
+            "ORDER BY id DESC LIMIT 10", ("client",)))
+
+        assert "idx_activity_log_client_id" in plan
+        assert "TEMP B-TREE" not in plan
+        con.close()
+
+
+class TestInitDb:
+    """Tests for explicit, idempotent schema initialization."""
+
+    def test_init_db_creates_schema_once(self, tmp_path):
+        """Test that init_db migrates a new database and is a no-op afterwards."""
+        import db
+        db_path = str(tmp_path / "fresh.db")
+        with patch.object(db, 'DB_NAME', db_path):
+            assert not os.path.exists(db_path)
+
+            assert db.init_db() is True
+            with patch.object(db, 'apply_migrations') as mock_migrate:
+                assert db.init_db() is False
+            mock_migrate.assert_not_called()
+
+            tables = {row[0] for row in db.get_connection().execute(
+                "SELECT name FROM sqlite_master WHERE type='table'")}
+            assert {"clients", "drive_documents", "activity_log"} <= tables
+            db.close_connections()
+
+    def test_module_has_no_import_time_connection(self):
+        """Test that importing db leaves no module-level connection open."""
+        import db
+        assert not hasattr(db, "con")
+        assert not hasattr(db, "cur")
+
+
+@pytest.fixture
+def migrated_db(tmp_path):
+    """Point the db module at a fresh, fully migrated database."""
+    import db
+    db_path = str(tmp_path / "migrated.db")
+    with patch.object(db, 'DB_NAME', db_path):
+        db.close_connections()
+        db.apply_migrations(db.get_connection())
+        yield db
+        db._activity_buffer.clear()
+        db._message_buffer.clear()
+        db.close_connections()
+
+
+class TestActivityBuffer:
+    """Tests for buffered activity logging."""
+
+    def test_log_activity_does_not_write_immediately(self, migrated_db):
+        """Test that a single event is buffered rather than committed."""
+        migrated_db.log_activity("client", "Drive", "title", "summary", "blue")
+
+        count = migrated_db.get_connection().execute(
+            "SELECT COUNT(*) FROM activity_log").fetchone()[0]
+        assert count == 0
+
+    def test_recent_activity_includes_unflushed_rows(self, migrated_db):
+        """Test that the read path merges buffered rows."""
+        migrated_db.log_activity("client", "Drive", "title", "summary", "blue")
+        migrated_db.log_activity("other", "Drive", "title", "summary", "blue")
+
+        activity = migrated_db.get_recent_activity("client")
+
+        assert len(activity) == 1
+        assert activity[0]["title"] == "title"
+        assert activity[0]["id"] is None
+
+    def test_flush_activity_writes_batch(self, migrated_db):
+        """Test that flushing persists every buffered row."""
+        for i in range(3):
+            migrated_db.log_activity("client", "Telegram", f"msg {i}", "summary", "purple")
+
+        assert migrated_db.flush_activity() == 3
+
+        activity = migrated_db.get_recent_activity("client")
+        assert len(activity) == 3
+        assert all(log["id"] is not None for log in activity)
+
+
+class TestActivitySince:
+    """Tests for the incremental activity cursor."""
+
+    def test_returns_only_newer_rows_oldest_first(self, migrated_db):
+        """Test that rows at or below since_id are excluded."""
+        for i in range(4):
+            migrated_db.log_activity("client", "Drive", f"event {i}", "summary", "blue")
+        migrated_db.flush_activity()
+        first_id = migrated_db.get_activity_since("client", 0, limit=10)[0]["id"]
+
+        newer = migrated_db.get_activity_since("client", first_id + 1)
+
+        assert [log["title"] for log in newer] == ["event 2", "event 3"]
+
+    def test_paging_past_limit_returns_every_row(self, migrated_db):
+        """Test that more than limit new rows between polls are all returned."""
+        migrated_db.log_activity("client", "Drive", "seen", "summary", "blue")
+        cursor = migrated_db.get_activity_since("client", 0)[-1]["id"]
+        for i in range(25):
+            migrated_db.log_activity("client", "Drive", f"n{i}", "summary", "blue")
+
+        titles = []
+        while True:
+            page = migrated_db.get_activity_since("client", cursor, limit=10)
+            if not page:
+                break
+            titles += [log["title"] for log in page]
+            cursor = page[-1]["id"]
+
+        assert titles == [f"n{i}" for i in range(25)]
+
+    def test_flushes_buffered_rows_before_reading(self, migrated_db):
+        """Test that buffered rows are returned with real ids."""
+        migrated_db.log_activity("client", "Telegram", "new message", "summary", "purple")
+
+        rows = migrated_db.get_activity_since("client", 0)
+
+        assert len(rows) == 1
+        assert rows[0]["id"] is not None
+
+    def test_recent_activity_orders_ties_by_id(self, migrated_db):
+        """Test that rows logged in the same second keep insertion order."""
+        for i in range(3):
+            migrated_db.log_activity("client", "Drive", f"event {i}", "summary", "blue")
+        migrated_db.flush_activity()
+
+        titles = [log["title"] for log in migrated_db.get_recent_activity("client")]
+
+        assert titles == ["event 2", "event 1", "event 0"]
+
+
+class TestDocumentBlobs:
+    """Tests for the content-addressed drive document body store."""
+
+    def _create(self, db, file_id, client_id, content):
+        db.create_drive_document(
+            file_id=file_id,
+            client_id=client_id,
+            file_name=f"Doc {file_id}",
+            content_hash="hash",
+            last_modified="2026-01-12T10:00:00Z",
+            content=content,
+        )
+
+    def _blob_count(self, db):
+        return db.get_connection().execute(
+            "SELECT COUNT(*) FROM document_blobs").fetchone()[0]
+
+    def test_content_round_trips_through_blob(self, migrated_db):
+        """Test that a stored body is returned decompressed."""
+        self._create(migrated_db, "f1", "client", "meeting notes " * 100)
+
+        doc = migrated_db.lookup_drive_document("f1")
+
+        assert doc["content"] == "meeting notes " * 100
+        assert "blob_hash" not in doc
+
+    def test_identical_bodies_share_one_blob(self, migrated_db):
+        """Test that the same text across clients is stored once."""
+        self._create(migrated_db, "f1", "client_a", "shared text")
+        self._create(migrated_db, "f2", "client_b", "shared text")
+
+        assert self._blob_count(migrated_db) == 1
+
+    def test_update_releases_unreferenced_blob(self, migrated_db):
+        """Test that the previous revision's blob is dropped when orphaned."""
+        self._create(migrated_db, "f1", "client", "old revision")
+
+        migrated_db.update_drive_document("f1", "new_hash", "new revision")
+
+        assert self._blob_count(migrated_db) == 1
+        assert migrated_db.get_drive_document_content("f1") == "new revision"
+
+    def test_listing_excludes_bodies(self, migrated_db):
+        """Test that listing documents is a metadata-only query."""
+        self._create(migrated_db, "f1", "client", "body text")
+
+        docs = migrated_db.get_all_drive_documents_for_client("client")
+
+        assert len(docs) == 1
+        assert "content" not in docs[0]
+        assert docs[0]["file_name"] == "Doc f1"
+
+    def test_migration_moves_inline_content(self, temp_db):
+        """Test that bodies stored inline by older versions are moved to blobs."""
+        import db
+        con = sqlite3.connect(temp_db)
+        con.execute(
+            "INSERT INTO drive_documents (file_id, client_id, content) VALUES (?, ?, ?)",
+            ("legacy", "client", "legacy body"))
+        con.commit()
+
+        db.apply_migrations(con)
+
+        row = con.execute(
+            "SELECT content, blob_hash FROM drive_documents WHERE file_id = ?",
+            ("legacy",)).fetchone()
+        assert row[0] is None
+        assert db._get_blob(con, row[1]) == "legacy body"
+        con.close()
+
+
+class TestListDriveDocuments:
+    """Tests for keyset-paginated drive document listing."""
+
+    @pytest.fixture
+    def documents_db(self, migrated_db):
+        for i in range(5):
+            migrated_db.create_drive_document(
+                file_id=f"doc{i}",
+                client_id="client",
+                file_name=f"Doc {i}",
+                content_hash=f"hash{i}",
+                last_modified="2026-01-12T10:00:00Z",
+                content=f"body {i}",
+            )
+        return migrated_db
+
+    def test_pages_follow_cursor(self, documents_db):
+        """Test that walking next_cursor returns every document once."""
+        page, cursor = documents_db.list_drive_documents("client", limit=2)
+        seen = [doc["file_id"] for doc in page]
+        while cursor:
+            page, cursor = documents_db.list_drive_documents("client", after=cursor, limit=2)
+            seen += [doc["file_id"] for doc in page]
+
+        assert seen == [f"doc{i}" for i in range(5)]
+
+    def test_last_page_has_no_cursor(self, documents_db):
+        """Test that an exactly-full final page reports no next cursor."""
+        page, cursor = documents_db.list_drive_documents("client", limit=5)
+
+        assert len(page) == 5
+        assert cursor is None
+
+    def test_fields_projection(self, documents_db):
+        """Test that only the requested columns (plus file_id) are returned."""
+        page, _ = documents_db.list_drive_documents("client", fields=["file_name"])
+
+        assert set(page[0]) == {"file_id", "file_name"}
+
+    def test_include_content(self, documents_db):
+        """Test that bodies are loaded only on request."""
+        without, _ = documents_db.list_drive_documents("client", limit=1)
+        with_body, _ = documents_db.list_drive_documents("client", limit=1, include_content=True)
+
+        assert "content" not in without[0]
+        assert with_body[0]["content"] == "body 0"
+
+    def test_unknown_field_raises(self, documents_db):
+        """Test that projections are restricted to known metadata columns."""
+        with pytest.raises(ValueError):
+            documents_db.list_drive_documents("client", fields=["content; DROP TABLE clients"])
+
+
+class TestActivityRetention:
+    """Tests for activity compaction, archival and pruning."""
+
+    def _insert(self, db, client_id, source, created_at):
+        con = db.get_connection()
+        with con:
+            con.execute(
+                "INSERT INTO activity_log (client_id, source, title, summary, color, created_at) "
+                "VALUES (?, ?, 'title', 'summary', 'blue', ?)",
+                (client_id, source, created_at))
+
+    def _count(self, db, table):
+        return db.get_connection().execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    def test_compaction_folds_old_rows_into_daily_summaries(self, migrated_db):
+        """Test that old rows become per-day counts and recent rows stay."""
+        old_day = migrated_db._utc_timestamp(30)
+        self._insert(migrated_db, "client", "Telegram", old_day)
+        self._insert(migrated_db, "client", "Telegram", old_day)
+        self._insert(migrated_db, "client", "Drive", old_day)
+        self._insert(migrated_db, "client", "Drive", migrated_db._utc_timestamp())
+
+        compacted = migrated_db.compact_activity(older_than_days=7, archive_dir="")
+
+        assert compacted == 3
+        assert self._count(migrated_db, "activity_log") == 1
+        summary = migrated_db.get_activity_summary("client", days=60)
+        counts = {row["source"]: row["event_count"] for row in summary}
+        assert counts == {"Drive": 1, "Telegram": 2}
+
+    def test_compaction_merges_into_existing_summary(self, migrated_db):
+        """Test that a second pass adds to the same day's counts."""
+        old_day = migrated_db._utc_timestamp(30)
+        self._insert(migrated_db, "client", "GitHub", old_day)
+        migrated_db.compact_activity(older_than_days=7, archive_dir="")
+        self._insert(migrated_db, "client", "GitHub", old_day)
+
+        migrated_db.compact_activity(older_than_days=7, archive_dir="")
+
+        summary = migrated_db.get_activity_summary("client", days=60)
+        assert summary[0]["event_count"] == 2
+
+    def test_compaction_archives_raw_rows_per_month(self, migrated_db, tmp_path):
+        """Test that raw rows are copied into a monthly archive file first."""
+        old_day = migrated_db._utc_timestamp(40)
+        self._insert(migrated_db, "client", "Drive", old_day)
+        archive_dir = tmp_path / "archive"
+
+        migrated_db.compact_activity(older_than_days=7, archive_dir=str(archive_dir))
+
+        path = archive_dir / f"activity_{old_day[:4]}_{old_day[5:7]}.db"
+        con = sqlite3.connect(str(path))
+        rows = con.execute("SELECT client_id, source FROM activity_log").fetchall()
+        con.close()
+        assert rows == [("client", "Drive")]
+
+    def test_prune_removes_expired_summaries(self, migrated_db):
+        """Test that summaries older than the retention window are deleted."""
+        self._insert(migrated_db, "client", "Drive", migrated_db._utc_timestamp(400))
+        self._insert(migrated_db, "client", "Drive", migrated_db._utc_timestamp(30))
+        migrated_db.compact_activity(older_than_days=7, archive_dir="")
+
+        pruned = migrated_db.prune_activity(retention_days=365)
+
+        assert pruned == 1
+        assert self._count(migrated_db, "activity_daily") == 1
+
+
+class TestLookupCaching:
+    """Tests for the cached client, assistant and repository lookups."""
+
+    def test_repeated_client_lookup_hits_cache(self, migrated_db):
+        """Test that the second lookup does not query the database."""
+        migrated_db.create_client("cached_client", "key")
+        migrated_db.lookup_client("cached_client")
+
+        with patch.object(migrated_db, '_query_client') as mock_query:
+            client = migrated_db.lookup_client("cached_client")
+
+        mock_query.assert_not_called()
+        assert client["api_key"] == "key"
+        assert migrated_db.cache_stats()["clients"]["hits"] == 1
+
+    def test_create_assistant_invalidates_negative_lookup(self, migrated_db):
+        """Test that a newly created assistant is visible immediately."""
+        assert migrated_db.lookup_assistant("client") is None
+
+        migrated_db.create_assistant("asst_1", "client")
+
+        assert migrated_db.lookup_assistant("client")["assistant_id"] == "asst_1"
+
+    def test_add_repository_invalidates_cached_repository(self, migrated_db):
+        """Test that repository lookups see newly registered repos."""
+        url = "https://github.com/owner/repo"
+        assert migrated_db.lookup_repository(url) is None
+
+        migrated_db.add_repository(url, "client")
+
+        assert migrated_db.lookup_repository(url)["client_id"] == "client"
+
+    def test_callers_cannot_mutate_cached_rows(self, migrated_db):
+        """Test that lookups return copies of the cached row."""
+        migrated_db.create_client("cached_client", "key")
+        migrated_db.lookup_client("cached_client")["api_key"] = "tampered"
+
+        assert migrated_db.lookup_client("cached_client")["api_key"] == "key"
+
+
+class TestSharding:
+    """Tests for per-tenant and hashed database sharding."""
+
+    def _add_document(self, db, file_id, client_id):
+        db.create_drive_document(
+            file_id=file_id,
+            client_id=client_id,
+            file_name=f"{file_id}.txt",
+            content_hash="hash",
+            last_modified="2024-01-01",
+            content=f"body of {file_id}",
+        )
+
+    def test_unsharded_mode_uses_main_database(self, migrated_db):
+        """Test that every client maps to DB_NAME when sharding is off."""
+        assert migrated_db.client_db_path("client_a") == migrated_db.DB_NAME
+        assert migrated_db.all_database_paths() == [migrated_db.DB_NAME]
+
+    def test_tenant_mode_isolates_clients(self, migrated_db):
+        """Test that each client's documents live in their own database file."""
+        with patch.object(migrated_db, 'DB_SHARD_MODE', "tenant"):
+            self._add_document(migrated_db, "doc_a", "client_a")
+            self._add_document(migrated_db, "doc_b", "client_b")
+
+            path_a = migrated_db.client_db_path("client_a")
+            path_b = migrated_db.client_db_path("client_b")
+            assert path_a != path_b
+            assert os.path.exists(path_a) and os.path.exists(path_b)
+
+            con_a = sqlite3.connect(path_a)
+            assert con_a.execute("SELECT file_id FROM drive_documents").fetchall() == [("doc_a",)]
+            con_a.close()
+            docs, _ = migrated_db.list_drive_documents("client_b")
+            assert [d["file_id"] for d in docs] == ["doc_b"]
+
+    def test_hashed_mode_records_stable_assignment(self, migrated_db):
+        """Test that a client's shard is kept in the catalog even if the shard count changes."""
+        with patch.object(migrated_db, 'DB_SHARD_MODE', "hashed"):
+            path = migrated_db.client_db_path("client_a")
+            assert os.path.basename(path).startswith("shard_")
+            migrated_db.clear_caches()
+
+            with patch.object(migrated_db, 'DB_SHARD_COUNT', 1000):
+                assert migrated_db.client_db_path("client_a") == path
+
+    def test_lookup_without_client_searches_shards(self, migrated_db):
+        """Test that documents can be found and updated by file id alone."""
+        with patch.object(migrated_db, 'DB_SHARD_MODE', "tenant"):
+            self._add_document(migrated_db, "doc_a", "client_a")
+
+            migrated_db.update_drive_document("doc_a", "hash2", "new body")
+
+            assert migrated_db.lookup_drive_document("doc_a")["content"] == "new body"
+            assert migrated_db.lookup_drive_document("missing") is None
+
+    def test_activity_is_routed_to_client_shard(self, migrated_db):
+        """Test that buffered activity is written to each client's own shard."""
+        with patch.object(migrated_db, 'DB_SHARD_MODE', "tenant"):
+            migrated_db.log_activity("client_a", "Drive", "a", "s", "blue")
+            migrated_db.log_activity("client_b", "Drive", "b", "s", "blue")
+            migrated_db.flush_activity()
+
+            recent = migrated_db.get_recent_activity("client_a")
+            assert [r["title"] for r in recent] == ["a"]
+            main = migrated_db.get_connection().execute("SELECT COUNT(*) FROM activity_log")
+            assert main.fetchone()[0] == 0
+
+    def test_retention_runs_on_every_shard(self, migrated_db):
+        """Test that a retention pass compacts old activity in each shard."""
+        with patch.object(migrated_db, 'DB_SHARD_MODE', "tenant"):
+            for client_id in ("client_a", "client_b"):
+                con = migrated_db.get_connection(migrated_db.client_db_path(client_id))
+                with con:
+                    con.execute(
+                        "INSERT INTO activity_log (client_id, source, title, summary, color, created_at) "
+                        "VALUES (?, 'Drive', 't', 's', 'blue', '2020-01-01 00:00:00')",
+                        (client_id,),
+                    )
+
+            result = migrated_db.run_activity_retention()
+
+            assert result["compacted"] == 2
+
+
+class TestSourceStatus:
+    """Tests for the per-source status table."""
+
+    def test_activity_flush_updates_status(self, migrated_db):
+        """Test that flushed activity bumps the count and last event time."""
+        migrated_db.log_activity("client", "Telegram", "t", "s", "purple")
+        migrated_db.log_activity("client", "Telegram", "t", "s", "purple")
+        migrated_db.flush_activity()
+
+        status = migrated_db.get_source_status("client")
+
+        assert status["Telegram"]["event_count"] == 2
+        assert status["Telegram"]["last_event_at"] is not None
+
+    def test_status_includes_buffered_activity(self, migrated_db):
+        """Test that unflushed events are counted too."""
+        migrated_db.log_activity("client", "GitHub", "t", "s", "green")
+
+        assert migrated_db.get_source_status("client")["GitHub"]["event_count"] == 1
+
+    def test_drive_documents_are_counted(self, migrated_db):
+        """Test that creating documents maintains the Drive document count."""
+        for file_id in ("doc_1", "doc_2"):
+            migrated_db.create_drive_document(file_id, "client", "f.txt", "h", "2024-01-01", "body")
+        migrated_db.update_drive_document("doc_1", "h2", "new body")
+
+        drive = migrated_db.get_source_status("client")["Drive"]
+        assert drive["document_count"] == 2
+        assert drive["event_count"] == 0
+
+    def test_status_survives_compaction(self, migrated_db):
+        """Test that compacting old activity keeps the counts."""
+        migrated_db.log_activity("client", "Drive", "t", "s", "blue")
+        migrated_db.flush_activity()
+        migrated_db.compact_activity(older_than_days=-1, archive_dir="")
+
+        assert migrated_db.get_source_status("client")["Drive"]["event_count"] == 1
+
+    def test_migration_backfills_existing_activity(self, tmp_path):
+        """Test that upgrading a database seeds the status from stored rows."""
+        import db
+        con = sqlite3.connect(str(tmp_path / "legacy.db"))
+        for number, description, steps in db.MIGRATIONS[:7]:
+            for step in steps:
+                step(con) if callable(step) else con.execute(step)
+        con.execute("CREATE TABLE schema_version (version INTEGER PRIMARY KEY, "
+                    "description TEXT, applied_at TIMESTAMP)")
+        con.execute("INSERT INTO schema_version (version) VALUES (7)")
+        con.execute("INSERT INTO activity_log (client_id, source, created_at) "
+                    "VALUES ('client', 'GitHub', '2024-01-02 00:00:00')")
+        con.execute("INSERT INTO activity_daily VALUES "
+                    "('client', '2024-01-01', 'GitHub', 4, '2024-01-01 00:00:00', '2024-01-01 09:00:00')")
+        con.commit()
+
+        db.apply_migrations(con)
+
+        row = con.execute("SELECT event_count, last_event_at FROM source_status "
+                          "WHERE client_id = 'client' AND source = 'GitHub'").fetchone()
+        assert row == (5, "2024-01-02 00:00:00")
+        con.close()
+
+
+class TestSearch:
+    """Tests for the local full-text search index."""
+
+    def test_drive_documents_are_searchable(self, migrated_db):
+        """Test that document bodies are indexed on create and replaced on update."""
+        migrated_db.create_drive_document("doc_1", "client", "Design.txt", "h", "2024-01-01",
+                                          "The retry_policy lives in the gateway")
+
+        results = migrated_db.search("client", "retry_policy")
+        assert [r["ref"] for r in results] == ["doc_1"]
+        assert "**retry_policy**" in results[0]["snippet"]
+
+        migrated_db.update_drive_document("doc_1", "h2", "Nothing to see here")
+        assert migrated_db.search("client", "retry_policy") == []
+        assert len(migrated_db.search("client", "nothing")) == 1
+
+    def test_search_is_scoped_to_client_and_source(self, migrated_db):
+        """Test that results never cross clients and can be filtered by source."""
+        migrated_db.create_drive_document("doc_a", "client_a", "a.txt", "h", "d", "shared_token")
+        migrated_db.index_repository_files("client_a", "https://github.com/o/r",
+                                           [("src/app.py", "def shared_token(): pass")])
+        migrated_db.create_drive_document("doc_b", "client_b", "b.txt", "h", "d", "shared_token")
+
+        assert len(migrated_db.search("client_a", "shared_token")) == 2
+        github = migrated_db.search("client_a", "shared_token", source="GitHub")
+        assert [r["ref"] for r in github] == ["https://github.com/o/r#src/app.py"]
+
+    def test_removed_repository_files_leave_the_index(self, migrated_db):
+        """Test that files removed by a push are no longer returned."""
+        url = "https://github.com/o/r"
+        migrated_db.index_repository_files("client", url, [("a.py", "unique_name = 1")])
+        migrated_db.index_repository_files("client", url, [], removed=["a.py"])
+
+        assert migrated_db.search("client", "unique_name") == []
+
+    def test_query_syntax_is_treated_literally(self, migrated_db):
+        """Test that FTS5 operators in user input don't raise."""
+        migrated_db.create_thread("chat_1", "eng", "call foo(bar) AND NOT baz", client_id="client")
+
+        assert len(migrated_db.search("client", 'foo(bar) "NOT')) == 1
+        with pytest.raises(ValueError):
+            migrated_db.search("client", "   ")
+
+
+class TestMessages:
+    """Tests for the append-only Telegram message store."""
+
+    def test_chat_keeps_every_message(self, migrated_db):
+        """Test that a chat can store more than one message."""
+        for i in range(3):
+            migrated_db.log_message(42, "group", f"user: message {i}")
+
+        messages = migrated_db.get_recent_messages(42)
+
+        assert [m["message"] for m in messages] == [f"user: message {i}" for i in range(3)]
+        assert migrated_db.lookup_thread("42")["message"] == "user: message 2"
+
+    def test_messages_are_written_in_one_batch(self, migrated_db):
+        """Test that buffered messages reach the database in a single flush."""
+        buffer = migrated_db._message_buffer
+        with patch.object(buffer, 'write_rows', wraps=buffer.write_rows) as mock_write:
+            for i in range(5):
+                migrated_db.log_message("chat", "group", f"m{i}")
+            assert migrated_db.flush_messages() == 5
+
+        mock_write.assert_called_once()
+
+    def test_get_messages_returns_time_window(self, migrated_db):
+        """Test the range helper's inclusive/exclusive bounds and ordering."""
+        con = migrated_db.get_connection()
+        with con:
+            for stamp in ("2024-01-01 10:00:00", "2024-01-01 11:00:00", "2024-01-01 12:00:00"):
+                con.execute("INSERT INTO messages (chat_id, message, created_at) VALUES (?, ?, ?)",
+                            ("chat", stamp, stamp))
+
+        window = migrated_db.get_messages("chat", since="2024-01-01 11:00:00",
+                                          until="2024-01-01 12:00:00")
+
+        assert [m["message"] for m in window] == ["2024-01-01 11:00:00"]
+        assert len(migrated_db.get_messages("chat", limit=2)) == 2
+
+    def test_range_query_uses_index(self, migrated_db):
+        """Test that window reads seek the (chat_id, created_at) index."""
+        plan = " ".join(str(row[-1]) for row in migrated_db.get_connection().execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM messages WHERE chat_id = ? AND created_at >= ? "
+            "ORDER BY created_at, id LIMIT 10", ("chat", "2024-01-01")))
+
+        assert "idx_messages_chat_created" in plan
+        assert "TEMP B-TREE" not in plan
+
+    def test_migration_moves_chats_into_messages(self, tmp_path):
+        """Test that upgrading keeps stored chats as messages."""
+        import db
+        con = sqlite3.connect(str(tmp_path / "legacy.db"))
+        for number, description, steps in db.MIGRATIONS[:9]:
+            for step in steps:
+                step(con) if callable(step) else con.execute(step)
+        con.execute("CREATE TABLE schema_version (version INTEGER PRIMARY KEY, "
+                    "description TEXT, applied_at TIMESTAMP)")
+        con.execute("INSERT INTO schema_version (version) VALUES (9)")
+        con.execute("INSERT INTO chats VALUES ('7', 'group', 'bob: hi')")
+        con.commit()
+
+        db.apply_migrations(con)
+
+        assert con.execute("SELECT chat_id, message FROM messages").fetchall() == [("7", "bob: hi")]
+        tables = {r[0] for r in con.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        assert "chats" not in tables
+        con.close()
+
+
+class TestSessions:
+    """Tests for conversation sessions."""
+
+    def test_session_returns_its_thread(self, migrated_db):
+        """Test that a live session resolves to its Backboard thread."""
+        session_id = migrated_db.create_session("client", "thread_1")
+
+        assert migrated_db.use_session("client", session_id) == "thread_1"
+        assert migrated_db.use_session("other_client", session_id) is None
+        assert migrated_db.use_session("client", "unknown") is None
+
+    def test_idle_session_expires(self, migrated_db):
+        """Test that sessions idle past the timeout are ignored and pruned."""
+        session_id = migrated_db.create_session("client", "thread_1")
+        con = migrated_db.get_connection()
+        with con:
+            con.execute("UPDATE sessions SET last_used_at = '2020-01-01 00:00:00'")
+
+        assert migrated_db.use_session("client", session_id) is None
+        assert migrated_db.run_activity_retention()["sessions_expired"] == 1
+
+    def test_end_session(self, migrated_db):
+        """Test that an ended session can no longer be used."""
+        session_id = migrated_db.create_session("client", "thread_1")
+
+        assert migrated_db.end_session("client", session_id) is True
+        assert migrated_db.use_session("client", session_id) is None
+        assert migrated_db.end_session("client", session_id) is False
+
+
+class TestWebhookDeliveries:
+    """Tests for stored git webhook deliveries."""
+
+    def test_redelivery_is_not_queued_twice(self, migrated_db):
+        """Test that a delivery id is stored and queued only once."""
+        payload = {"changed": ["a.py"], "removed": []}
+
+        assert migrated_db.create_webhook_delivery("d1", "client", "url", payload) is True
+        assert migrated_db.create_webhook_delivery("d1", "client", "url", payload) is False
+        assert migrated_db.lookup_webhook_delivery("d1")["payload"] == payload
+        assert migrated_db.job_counts()["queued"] == 1
+
+    def test_delivery_queues_git_push_job(self, migrated_db):
+        """Test that storing a delivery queues the job that ingests it."""
+        migrated_db.create_webhook_delivery("d1", "client", "url", {"changed": [], "removed": []})
+
+        job = migrated_db.lease_job("worker", ["git_push"], 60)
+        assert job["payload"] == {"delivery_id": "d1"}
+        assert job["dedup_key"] == "git_push:d1"
+
+    def test_update_records_result(self, migrated_db):
+        """Test that a finished delivery keeps its result."""
+        migrated_db.create_webhook_delivery("d1", "client", "url", {"changed": [], "removed": []})
+        migrated_db.update_webhook_delivery("d1", "done", result={"files_updated": 2})
+
+        delivery = migrated_db.lookup_webhook_delivery("d1")
+        assert delivery["status"] == "done"
+        assert delivery["result"] == {"files_updated": 2}
+        assert migrated_db.lookup_webhook_delivery("unknown") is None
+
+    def test_progress_is_recorded(self, migrated_db):
+        """Test that a delivery starts with nothing sent and keeps its send progress."""
+        migrated_db.create_webhook_delivery("d1", "client", "url", {"changed": [], "removed": []})
+        delivery = migrated_db.lookup_webhook_delivery("d1")
+        assert delivery["thread_id"] is None
+        assert delivery["messages_sent"] == 0
+
+        migrated_db.record_webhook_delivery_progress("d1", "thread_1", 2)
+
+        delivery = migrated_db.lookup_webhook_delivery("d1")
+        assert delivery["thread_id"] == "thread_1"
+        assert delivery["messages_sent"] == 2
+
+    def test_migration_queues_pending_deliveries(self, tmp_path):
+        """Test that upgrading turns unfinished deliveries into jobs."""
+        import db
+        con = sqlite3.connect(str(tmp_path / "legacy.db"))
+        for number, description, steps in db.MIGRATIONS[:12]:
+            for step in steps:
+                step(con) if callable(step) else con.execute(step)
+        con.execute("CREATE TABLE schema_version (version INTEGER PRIMARY KEY, "
+                    "description TEXT, applied_at TIMESTAMP)")
+        con.execute("INSERT INTO schema_version (version) VALUES (12)")
+        for delivery_id, status in [("d1", "queued"), ("d2", "running"), ("d3", "done")]:
+            con.execute(
+                "INSERT INTO webhook_deliveries (delivery_id, client_id, repo_url, payload, status) "
+                "VALUES (?, 'client', 'url', '{}', ?)",
+                (delivery_id, status),
+            )
+        con.commit()
+
+        db.apply_migrations(con)
+
+        keys = [r[0] for r in con.execute("SELECT dedup_key FROM jobs ORDER BY dedup_key")]
+        assert keys == ["git_push:d1", "git_push:d2"]
+        statuses = dict(con.execute("SELECT delivery_id, status FROM webhook_deliveries"))
+        assert statuses == {"d1": "queued", "d2": "queued", "d3": "done"}
+        con.close()
+
+
+class TestJobQueue:
+    """Tests for the durable job queue."""
+
+    def test_dedup_key_while_waiting(self, migrated_db):
+        """Test that a dedup key is queued again only once the first job has started."""
+        first = migrated_db.enqueue_job("drive_document", {"file_id": "f"}, dedup_key="drive:f")
+
+        assert first is not None
+        assert migrated_db.enqueue_job("drive_document", {"file_id": "f"}, dedup_key="drive:f") is None
+        migrated_db.lease_job("worker", ["drive_document"], 60)
+        assert migrated_db.enqueue_job("drive_document", {"file_id": "f"}, dedup_key="drive:f") is not None
+
+    def test_lease_only_ready_jobs_of_kinds(self, migrated_db):
+        """Test that leasing skips delayed jobs and other kinds."""
+        migrated_db.enqueue_job("later", {}, delay=3600)
+        migrated_db.enqueue_job("other", {})
+        job_id = migrated_db.enqueue_job("now", {"n": 1})
+
+        job = migrated_db.lease_job("worker", ["later", "now"], 60)
+        assert job["job_id"] == job_id
+        assert job["payload"] == {"n": 1}
+        assert job["status"] == "running"
+        assert job["attempts"] == 1
+        assert migrated_db.lease_job("worker", ["later", "now"], 60) is None
+        assert migrated_db.lease_job("worker", [], 60) is None
+
+    def test_expired_lease_is_reclaimed(self, migrated_db):
+        """Test that a job whose worker died is leased again."""
+        job_id = migrated_db.enqueue_job("kind", {})
+        migrated_db.lease_job("dead_worker", ["kind"], 60)
+        con = migrated_db.get_connection()
+        with con:
+            con.execute("UPDATE jobs SET leased_until = '2020-01-01 00:00:00'")
+
+        job = migrated_db.lease_job("worker", ["kind"], 60)
+        assert job["job_id"] == job_id
+        assert job["attempts"] == 2
+        assert migrated_db.complete_job(job_id, "dead_worker") is False
+        assert migrated_db.complete_job(job_id, "worker") is True
+        assert migrated_db.get_job(job_id)["status"] == "done"
+
+    def test_failed_job_is_retried_then_dead(self, migrated_db):
+        """Test that a failure with a delay requeues and one without dead-letters."""
+        job_id = migrated_db.enqueue_job("kind", {})
+        migrated_db.lease_job("worker", ["kind"], 60)
+
+        assert migrated_db.fail_job(job_id, "worker", "boom", retry_delay=0) == "queued"
+        assert migrated_db.get_job(job_id)["last_error"] == "boom"
+        migrated_db.lease_job("worker", ["kind"], 60)
+        assert migrated_db.fail_job(job_id, "worker", "boom again") == "dead"
+        assert migrated_db.lease_job("worker", ["kind"], 60) is None
+        assert migrated_db.fail_job(job_id, "worker", "late") is None
+
+    def test_retry_superseded_by_waiting_duplicate(self, migrated_db):
+        """Test that a failed job is not requeued when the same work is already waiting."""
+        job_id = migrated_db.enqueue_job("kind", {}, dedup_key="key")
+        migrated_db.lease_job("worker", ["kind"], 60)
+        migrated_db.enqueue_job("kind", {}, dedup_key="key")
+
+        assert migrated_db.fail_job(job_id, "worker", "boom", retry_delay=0) == "superseded"
+        job = migrated_db.get_job(job_id)
+        assert job["status"] == "superseded"
+        assert job["last_error"] == "boom"
+
+    def test_retry_dead_job(self, migrated_db):
+        """Test that a dead job can be queued again with fresh attempts."""
+        job_id = migrated_db.enqueue_job("kind", {}, max_attempts=1)
+        migrated_db.lease_job("worker", ["kind"], 60)
+
+        assert migrated_db.retry_job(job_id) is False
+        migrated_db.fail_job(job_id, "worker", "boom")
+        assert migrated_db.retry_job(job_id) is True
+        job = migrated_db.get_job(job_id)
+        assert job["status"] == "queued"
+        assert job["attempts"] == 0
+
+    def test_list_and_count_jobs(self, migrated_db):
+        """Test filtering jobs and counting them per status."""
+        migrated_db.enqueue_job("a", {})
+        migrated_db.enqueue_job("b", {}, delay=3600)
+        done_id = migrated_db.enqueue_job("c", {})
+        migrated_db.lease_job("worker", ["c"], 60)
+        migrated_db.complete_job(done_id, "worker")
+
+        assert [j["kind"] for j in migrated_db.list_jobs(status="queued", kind="a")] == ["a"]
+        assert len(migrated_db.list_jobs()) == 3
+        assert migrated_db.job_counts() == {"queued": 2, "done": 1, "ready": 1}
+
+    def test_prune_finished_jobs(self, migrated_db):
+        """Test that only old finished jobs are pruned."""
+        old_id = migrated_db.enqueue_job("kind", {})
+        migrated_db.enqueue_job("kind", {})
+        con = migrated_db.get_connection()
+        with con:
+            con.execute(
+                "UPDATE jobs SET status = 'done', updated_at = '2020-01-01 00:00:00' WHERE job_id = ?",
+                (old_id,),
+            )
+
+        assert migrated_db.prune_jobs(retention_days=7) == 1
+        assert migrated_db.get_job(old_id) is None
+        assert migrated_db.job_counts()["queued"] == 1
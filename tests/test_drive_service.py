@@ -110,7 +110,7 @@ class TestDriveService:
         assert content == "This is test document content"
 
     @pytest.mark.asyncio
-    @patch("src.backend.drive_service.BackboardClient")
+    @patch("src.backend.backboard_clients.BackboardClient")
     @patch("src.backend.db.lookup_client")
     @patch("src.backend.db.lookup_assistant")
     @patch("src.backend.db.lookup_drive_document")
@@ -202,6 +202,26 @@ class TestDriveService:
                 "No changes detected" in str(call) for call in mock_print.call_args_list
             )
 
+    @pytest.mark.asyncio
+    @patch("src.backend.db.lookup_client")
+    @patch("src.backend.db.lookup_drive_document")
+    async def test_process_errors_raised_for_jobs(
+        self, mock_lookup_doc, mock_lookup_client, drive_service
+    ):
+        """Test that raise_errors lets a job runner see Backboard/database failures."""
+        mock_lookup_doc.return_value = None
+        mock_lookup_client.side_effect = RuntimeError("database locked")
+        drive_service.get_file_metadata = Mock(
+            return_value={"id": "123", "name": "Test Doc", "modifiedTime": "2026-01-12T10:00:00Z"}
+        )
+        drive_service.get_document_content = Mock(return_value="Test content")
+
+        with patch("traceback.print_exc"):
+            # Logged only by default
+            await drive_service.process_document("123", "test_client")
+            with pytest.raises(RuntimeError, match="database locked"):
+                await drive_service.process_document("123", "test_client", raise_errors=True)
+
 
 class TestDatabaseIntegration:
     """Test database operations for Drive documents."""
@@ -292,3 +312,44 @@ class TestDatabaseIntegration:
         # Get documents for client_b
         docs = db.get_all_drive_documents_for_client("client_b")
         assert len(docs) == 1
+
+
+class TestDriveJobs:
+    """Tests for the Drive job handlers."""
+
+    @pytest.fixture(autouse=True)
+    def fresh_service(self):
+        from src.backend import drive_service
+        with patch.object(drive_service, "_job_service", None):
+            yield
+
+    @pytest.mark.asyncio
+    async def test_missing_token_is_permanent_failure(self, tmp_path):
+        """Test that a worker never starts the browser OAuth flow."""
+        from src.backend import drive_service, jobs
+
+        with patch.object(drive_service, "DriveService",
+                          lambda: DriveService(token_path=str(tmp_path / "missing.json"))), \
+             patch.object(drive_service.InstalledAppFlow, "from_client_secrets_file") as mock_flow:
+            with pytest.raises(jobs.PermanentJobError, match="/drive/authenticate"):
+                await drive_service.run_drive_document({"file_id": "f1", "client_id": "c1"})
+
+        mock_flow.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_drive_calls_run_off_the_event_loop(self):
+        """Test that the blocking Google API calls run on worker threads."""
+        import threading
+
+        service = DriveService()
+        loop_thread = threading.current_thread()
+        threads = []
+
+        def metadata(file_id):
+            threads.append(threading.current_thread())
+            return None
+
+        service.get_file_metadata = metadata
+        await service.process_document("f1", "c1")
+
+        assert threads and threads[0] is not loop_thread
@@ -0,0 +1,165 @@
+"""
+Tests for git_service.py - fetching changed files and packing them into Backboard messages.
+"""
+import asyncio
+import re
+import time
+
+import httpx
+import pytest
+
+from src.backend.git_service import fetch_files, pack_files
+
+
+def _size(message):
+    return len(message.encode("utf-8"))
+
+
+def _blocks(messages):
+    """Return (label, content) for every delimited file block, in order."""
+    return re.findall(r"===== FILE: (.+?) =====\n(.*?)\n===== END FILE: \1 =====",
+                      "".join(messages), re.S)
+
+
+class TestPackFiles:
+    """Tests for pack_files."""
+
+    def test_small_files_share_one_message(self):
+        """Test that files within the budget go out in a single message."""
+        files = [(f"src/file{i}.py", f"print({i})") for i in range(50)]
+
+        messages = pack_files(files, budget=10000)
+
+        assert len(messages) == 1
+        for path, content in files:
+            assert f"===== FILE: {path} =====\n{content}\n===== END FILE: {path} =====" in messages[0]
+
+    def test_messages_respect_budget_and_order(self):
+        """Test that files are split across messages without exceeding the budget."""
+        files = [(f"f{i}.py", "x" * 300) for i in range(20)]
+
+        messages = pack_files(files, budget=1000)
+
+        assert 1 < len(messages) < 20
+        assert all(_size(m) <= 1000 for m in messages)
+        assert [label for label, _ in _blocks(messages)] == [f"f{i}.py" for i in range(20)]
+
+    def test_large_file_is_split_into_parts(self):
+        """Test that a file over the budget is sent in labelled parts."""
+        content = "".join(f"line {i}\n" for i in range(1000))
+
+        messages = pack_files([("big.py", content)], budget=2000)
+
+        assert all(_size(m) <= 2000 for m in messages)
+        blocks = _blocks(messages)
+        assert len(blocks) > 1
+        assert [label for label, _ in blocks] == [
+            f"big.py (part {i}/{len(blocks)})" for i in range(1, len(blocks) + 1)
+        ]
+        assert "".join(part for _, part in blocks) == content
+
+    def test_overlong_line_is_cut(self):
+        """Test that a single line longer than the budget still fits."""
+        messages = pack_files([("min.js", "é" * 3000)], budget=1000)
+
+        assert all(_size(m) <= 1000 for m in messages)
+        assert "".join(part for _, part in _blocks(messages)) == "é" * 3000
+
+    def test_no_files(self):
+        assert pack_files([]) == []
+
+
+class TestFetchFiles:
+    """Tests for fetch_files."""
+
+    @staticmethod
+    def _client(handler):
+        return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    @pytest.mark.asyncio
+    async def test_files_are_fetched_in_order(self):
+        """Test that contents come back per path in input order, failures left out."""
+        def handler(request):
+            name = request.url.path.strip("/")
+            if name == "missing.py":
+                return httpx.Response(404)
+            if name == "empty.py":
+                return httpx.Response(200, content=b"")
+            return httpx.Response(200, text=f"content of {name}")
+
+        urls = {p: f"https://raw.example/{p}" for p in ["b.py", "missing.py", "empty.py", "a.py"]}
+        async with self._client(handler) as client:
+            files = await fetch_files(urls, client=client)
+
+        assert files == [("b.py", "content of b.py"), ("a.py", "content of a.py")]
+
+    @pytest.mark.asyncio
+    async def test_downloads_overlap_up_to_the_limit(self):
+        """Test that files are fetched concurrently, never more than concurrency at once."""
+        in_flight = 0
+        peak = 0
+
+        async def handler(request):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.05)
+            in_flight -= 1
+            return httpx.Response(200, text="x")
+
+        urls = {f"f{i}.py": f"https://raw.example/f{i}.py" for i in range(20)}
+        async with self._client(handler) as client:
+            started = time.monotonic()
+            files = await fetch_files(urls, concurrency=10, client=client)
+            elapsed = time.monotonic() - started
+
+        assert len(files) == 20
+        assert peak == 10
+        # Two rounds of 50 ms, not twenty
+        assert elapsed < 0.5
+
+    @pytest.mark.asyncio
+    async def test_slow_download_times_out(self):
+        """Test that one slow file is dropped without holding up the rest."""
+        async def handler(request):
+            if request.url.path == "/slow.py":
+                await asyncio.sleep(5)
+            return httpx.Response(200, text="ok")
+
+        urls = {"slow.py": "https://raw.example/slow.py", "fast.py": "https://raw.example/fast.py"}
+        async with self._client(handler) as client:
+            files = await fetch_files(urls, timeout=0.1, client=client)
+
+        assert files == [("fast.py", "ok")]
+
+    @pytest.mark.asyncio
+    async def test_oversized_files_are_skipped(self):
+        """Test that the size cap applies with and without a Content-Length header."""
+        def handler(request):
+            if request.url.path == "/declared.py":
+                return httpx.Response(200, content=b"x" * 100)
+
+            async def body():
+                for _ in range(10):
+                    yield b"x" * 10
+            return httpx.Response(200, content=body())
+
+        urls = {"declared.py": "https://raw.example/declared.py",
+                "streamed.py": "https://raw.example/streamed.py"}
+        async with self._client(handler) as client:
+            assert await fetch_files(urls, max_bytes=50, client=client) == []
+            assert len(await fetch_files(urls, max_bytes=100, client=client)) == 2
+
+    @pytest.mark.asyncio
+    async def test_malformed_content_length_is_ignored(self):
+        """Test that a non-numeric Content-Length doesn't abort the other files."""
+        def handler(request):
+            if request.url.path == "/bad.py":
+                return httpx.Response(200, headers={"Content-Length": "lots"}, content=b"bad")
+            return httpx.Response(200, text="ok")
+
+        urls = {"bad.py": "https://raw.example/bad.py", "good.py": "https://raw.example/good.py"}
+        async with self._client(handler) as client:
+            files = await fetch_files(urls, client=client)
+
+        assert ("good.py", "ok") in files
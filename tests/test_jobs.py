@@ -0,0 +1,155 @@
+"""
+Tests for jobs.py - durable background jobs and their worker pool.
+"""
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from src.backend import db
+from src.backend import jobs
+
+
+@pytest.fixture
+def queue(tmp_path):
+    """A fresh, migrated database and an empty handler registry."""
+    db_path = str(tmp_path / "jobs.db")
+    with patch.object(db, "DB_NAME", db_path), patch.dict(jobs._handlers, clear=True):
+        db.close_connections()
+        db.apply_migrations(db.get_connection())
+        yield db
+        db.close_connections()
+
+
+class TestRetryDelay:
+    """Tests for the retry backoff."""
+
+    def test_delay_grows_and_is_capped(self):
+        """Test that the jittered delay stays under the exponential bound and the cap."""
+        with patch("src.backend.jobs.random.uniform", side_effect=lambda low, high: high):
+            assert jobs.retry_delay(1, base=10, cap=900) == 10
+            assert jobs.retry_delay(3, base=10, cap=900) == 40
+            assert jobs.retry_delay(20, base=10, cap=900) == 900
+
+
+class TestJobWorkerPool:
+    """Tests for running queued jobs."""
+
+    @pytest.mark.asyncio
+    async def test_successful_job_is_completed(self, queue):
+        """Test that a handler's payload is passed through and the job marked done."""
+        run = AsyncMock()
+        jobs.handler("greet")(run)
+        job_id = await jobs.enqueue("greet", {"name": "rob"})
+        pool = jobs.JobWorkerPool(workers=1)
+
+        assert await pool.run_one() is True
+        assert await pool.run_one() is False
+        run.assert_awaited_once_with({"name": "rob"})
+        assert queue.get_job(job_id)["status"] == "done"
+        assert pool.stats()["completed"] == 1
+
+    @pytest.mark.asyncio
+    async def test_unregistered_kinds_are_left_alone(self, queue):
+        """Test that a pool only leases kinds with a handler in its process."""
+        job_id = await jobs.enqueue("someone_else", {})
+        pool = jobs.JobWorkerPool(workers=1)
+
+        assert await pool.run_one() is False
+        assert queue.get_job(job_id)["status"] == "queued"
+
+    @pytest.mark.asyncio
+    async def test_failed_job_is_retried_with_backoff(self, queue):
+        """Test that an exception requeues the job after a backoff delay."""
+        jobs.handler("flaky")(AsyncMock(side_effect=RuntimeError("boom")))
+        job_id = await jobs.enqueue("flaky", {})
+        pool = jobs.JobWorkerPool(workers=1)
+
+        with patch.object(jobs, "retry_delay", return_value=3600) as mock_delay:
+            await pool.run_one()
+
+        mock_delay.assert_called_once_with(1)
+        job = queue.get_job(job_id)
+        assert job["status"] == "queued"
+        assert job["last_error"] == "RuntimeError: boom"
+        # Not ready again until the delay has passed
+        assert await pool.run_one() is False
+        assert pool.stats()["retried"] == 1
+
+    @pytest.mark.asyncio
+    async def test_exhausted_job_is_dead_lettered(self, queue):
+        """Test that the last failed attempt dead-letters the job and calls on_dead."""
+        on_dead = AsyncMock()
+        jobs.handler("flaky", on_dead=on_dead)(AsyncMock(side_effect=RuntimeError("boom")))
+        job_id = await jobs.enqueue("flaky", {"n": 1}, max_attempts=2)
+        pool = jobs.JobWorkerPool(workers=1)
+
+        with patch.object(jobs, "retry_delay", return_value=0):
+            await pool.run_one()
+            on_dead.assert_not_awaited()
+            await pool.run_one()
+
+        assert queue.get_job(job_id)["status"] == "dead"
+        on_dead.assert_awaited_once_with({"n": 1}, "RuntimeError: boom")
+        assert pool.stats()["dead"] == 1
+
+    @pytest.mark.asyncio
+    async def test_superseded_job_is_not_dead_lettered(self, queue):
+        """Test that a retry blocked by a waiting duplicate leaves the work to it."""
+        on_dead = AsyncMock()
+
+        async def fail_after_duplicate(payload):
+            await jobs.enqueue("flaky", {}, dedup_key="key")
+            raise RuntimeError("boom")
+
+        jobs.handler("flaky", on_dead=on_dead)(fail_after_duplicate)
+        job_id = await jobs.enqueue("flaky", {}, dedup_key="key")
+        pool = jobs.JobWorkerPool(workers=1)
+
+        await pool.run_one()
+
+        assert queue.get_job(job_id)["status"] == "superseded"
+        on_dead.assert_not_awaited()
+        assert queue.job_counts()["queued"] == 1
+
+    @pytest.mark.asyncio
+    async def test_permanent_error_is_not_retried(self, queue):
+        """Test that PermanentJobError dead-letters on the first attempt."""
+        jobs.handler("broken")(AsyncMock(side_effect=jobs.PermanentJobError("bad payload")))
+        job_id = await jobs.enqueue("broken", {})
+        pool = jobs.JobWorkerPool(workers=1)
+
+        await pool.run_one()
+
+        job = queue.get_job(job_id)
+        assert job["status"] == "dead"
+        assert job["attempts"] == 1
+
+    @pytest.mark.asyncio
+    async def test_workers_run_jobs_concurrently(self, queue):
+        """Test that a started pool drains the queue with several jobs in flight."""
+        running = 0
+        peak = 0
+
+        async def slow(payload):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.05)
+            running -= 1
+
+        jobs.handler("slow")(slow)
+        pool = jobs.JobWorkerPool(workers=3, poll_interval=0.01)
+        pool.start()
+        try:
+            for i in range(6):
+                await jobs.enqueue("slow", {"i": i})
+            for _ in range(100):
+                if pool.stats()["completed"] == 6:
+                    break
+                await asyncio.sleep(0.02)
+        finally:
+            await pool.stop()
+
+        assert pool.stats()["completed"] == 6
+        assert peak > 1
+        assert queue.job_counts() == {"done": 6, "ready": 0}
@@ -0,0 +1,41 @@
+"""
+Tests for retention.py - background activity retention loop.
+"""
+import asyncio
+import pytest
+from unittest.mock import patch
+
+from src.backend import db
+from src.backend import retention
+
+
+class TestRetentionLoop:
+    """Tests for the retention scheduler."""
+
+    @pytest.mark.asyncio
+    async def test_run_retention_runs_db_pass(self):
+        """Test that a pass delegates to db.run_activity_retention."""
+        with patch.object(db, "run_activity_retention", return_value={"compacted": 3, "pruned": 0}) as mock_run:
+            result = await retention.run_retention()
+
+        mock_run.assert_called_once()
+        assert result == {"compacted": 3, "pruned": 0}
+
+    @pytest.mark.asyncio
+    async def test_loop_survives_failed_pass(self):
+        """Test that an error in one pass does not stop the loop."""
+        calls = []
+
+        def flaky():
+            calls.append(1)
+            if len(calls) == 1:
+                raise RuntimeError("database is locked")
+            return {"compacted": 0, "pruned": 0}
+
+        with patch.object(db, "run_activity_retention", side_effect=flaky):
+            task = asyncio.create_task(retention.retention_loop(interval=0.01))
+            while len(calls) < 2:
+                await asyncio.sleep(0.01)
+            task.cancel()
+
+        assert len(calls) >= 2
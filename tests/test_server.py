@@ -261,3 +261,663 @@ class TestSummarizeEndpoint:
 
                         assert response.status_code == 200
                         assert response.json() == "summary response"
+
+
+class TestDriveDocumentsEndpoint:
+    """Tests for the paginated /drive/documents endpoint."""
+
+    def test_returns_page_and_cursor(self):
+        """Test that query parameters are forwarded and the cursor returned."""
+        from src.backend import server
+        from src.backend import db
+
+        page = [{"file_id": "doc1", "file_name": "Doc 1"}]
+        status = {"Drive": {"source": "Drive", "last_event_at": None, "event_count": 0, "document_count": 7}}
+        with patch.object(db, 'lookup_client', return_value={'client_id': 'test'}), \
+             patch.object(db, 'get_source_status', return_value=status):
+            with patch.object(db, 'list_drive_documents', return_value=(page, "doc1")) as mock_list:
+                client = TestClient(server.app)
+                response = client.get(
+                    "/drive/documents?client_id=test&limit=1&cursor=doc0&fields=file_name"
+                )
+
+        assert response.status_code == 200
+        assert response.json()["documents"] == page
+        assert response.json()["next_cursor"] == "doc1"
+        assert response.json()["document_count"] == 7
+        assert response.json()["page_count"] == 1
+        assert mock_list.call_args.kwargs["after"] == "doc0"
+        assert mock_list.call_args.kwargs["fields"] == ["file_name"]
+        assert mock_list.call_args.kwargs["include_content"] is False
+
+    def test_unknown_field_returns_400(self):
+        """Test that an invalid projection is rejected."""
+        from src.backend import server
+        from src.backend import db
+
+        with patch.object(db, 'lookup_client', return_value={'client_id': 'test'}):
+            with patch.object(db, 'list_drive_documents', side_effect=ValueError("Unknown document fields: bogus")):
+                client = TestClient(server.app)
+                response = client.get("/drive/documents?client_id=test&fields=bogus")
+
+        assert response.status_code == 400
+
+
+class TestActivityEndpoint:
+    """Tests for the /activity feed cursor."""
+
+    def test_since_id_with_no_new_rows_returns_204(self):
+        """Test the cheap 'no change' response."""
+        from src.backend import server
+        from src.backend import db
+
+        with patch.object(db, 'get_activity_since', return_value=[]):
+            client = TestClient(server.app)
+            response = client.get("/activity?client_id=test&since_id=7")
+
+        assert response.status_code == 204
+        assert response.headers["X-Activity-Cursor"] == "7"
+
+    def test_since_id_returns_new_rows_and_cursor(self):
+        """Test that newer rows come back newest first with the last one as cursor."""
+        from src.backend import server
+        from src.backend import db
+
+        rows = [
+            {"id": 8, "source": "Drive", "title": "a", "summary": "", "color": "blue", "created_at": "t"},
+            {"id": 9, "source": "Drive", "title": "b", "summary": "", "color": "blue", "created_at": "t"},
+        ]
+        with patch.object(db, 'get_activity_since', return_value=rows) as mock_since:
+            client = TestClient(server.app)
+            response = client.get("/activity?client_id=test&since_id=7")
+
+        mock_since.assert_called_once_with("test", 7, 10)
+        assert response.status_code == 200
+        assert [entry["id"] for entry in response.json()] == [9, 8]
+        assert response.headers["X-Activity-Cursor"] == "9"
+
+
+class TestSystemStatusEndpoint:
+    """Tests for /system/status."""
+
+    def test_status_reads_source_status(self):
+        """Test that the endpoint reports the maintained per-source status."""
+        from src.backend import server
+        from src.backend import db
+
+        status = {
+            "Drive": {"source": "Drive", "last_event_at": "2024-01-01 00:00:00", "event_count": 3, "document_count": 2},
+            "GitHub": {"source": "GitHub", "last_event_at": "2024-01-02 00:00:00", "event_count": 1, "document_count": 0},
+        }
+        with patch.object(db, 'lookup_client', return_value={"client_id": "test", "api_key": "k"}), \
+             patch.object(db, 'get_source_status', return_value=status), \
+             patch.object(db, 'get_recent_activity') as mock_recent:
+            client = TestClient(server.app)
+            response = client.get("/system/status?client_id=test")
+
+        mock_recent.assert_not_called()
+        body = response.json()
+        assert body["drive"] == {"connected": True, "document_count": 2, "lastUpdated": "2024-01-01 00:00:00"}
+        assert body["codebase"]["lastUpdated"] == "2024-01-02 00:00:00"
+        assert body["telegram"] == {"connected": False, "lastUpdated": None}
+
+
+class TestSearchEndpoint:
+    """Tests for /search."""
+
+    def test_search_returns_ranked_results(self):
+        """Test that results come from the local index."""
+        from src.backend import server
+        from src.backend import db
+
+        results = [{"source": "Drive", "ref": "doc_1", "title": "a.txt", "updated_at": "t",
+                    "snippet": "**retry_policy**", "score": -1.2}]
+        with patch.object(db, 'lookup_client', return_value={"client_id": "test", "api_key": "k"}), \
+             patch.object(db, 'search', return_value=results) as mock_search:
+            client = TestClient(server.app)
+            response = client.get("/search?client_id=test&q=retry_policy&limit=500")
+
+        mock_search.assert_called_once_with("test", "retry_policy", server.SEARCH_MAX_RESULTS, None)
+        assert response.status_code == 200
+        assert response.json()["results"] == results
+
+    def test_invalid_source_returns_400(self):
+        """Test that db validation errors map to 400."""
+        from src.backend import server
+        from src.backend import db
+
+        with patch.object(db, 'lookup_client', return_value={"client_id": "test", "api_key": "k"}), \
+             patch.object(db, 'search', side_effect=ValueError("Unknown source: Slack")):
+            client = TestClient(server.app)
+            response = client.get("/search?client_id=test&q=x&source=Slack")
+
+        assert response.status_code == 400
+
+
+class TestMessageSessions:
+    """Tests for reusing Backboard threads across messages."""
+
+    def test_new_conversation_returns_session_id(self, make_backboard, use_backboard):
+        """Test that a message without a session starts one."""
+        from src.backend import server
+        from src.backend import db
+
+        backboard = use_backboard(make_backboard())
+        with patch.object(db, 'create_session', return_value="sess_1") as mock_create:
+            client = TestClient(server.app)
+            response = client.post("/messages/send?client_id=test&content=hello")
+
+        assert response.headers["X-Session-Id"] == "sess_1"
+        mock_create.assert_called_once_with("test", "thread_new")
+        assert backboard.add_message.call_args.kwargs["thread_id"] == "thread_new"
+
+    def test_existing_session_skips_create_thread(self, make_backboard, use_backboard):
+        """Test that a live session reuses its thread: one Backboard call per message."""
+        from src.backend import server
+        from src.backend import db
+
+        backboard = use_backboard(make_backboard())
+        with patch.object(db, 'use_session', return_value="thread_old"):
+            client = TestClient(server.app)
+            response = client.post("/messages/query?client_id=test&content=hello",
+                                   headers={"X-Session-Id": "sess_1"})
+
+        backboard.create_thread.assert_not_called()
+        assert backboard.add_message.call_args.kwargs["thread_id"] == "thread_old"
+        assert response.headers["X-Session-Id"] == "sess_1"
+        assert response.json() == ["hi", []]
+
+
+class TestStreamingMessages:
+    """Tests for /messages/send/stream and /messages/query/stream."""
+
+    CHUNKS = (
+        {"type": "content_streaming", "content": "Hel"},
+        {"type": "content_streaming", "content": "lo"},
+        {"type": "run_ended", "retrieved_memories": [{"memory": "doc A"}]},
+    )
+
+    @pytest.fixture(autouse=True)
+    def new_session(self):
+        from src.backend import db
+        with patch.object(db, 'create_session', return_value="sess_1"):
+            yield
+
+    def _post(self, url):
+        from src.backend import server
+        return TestClient(server.app).post(url)
+
+    def test_query_stream_ndjson_frames(self, make_backboard, use_backboard):
+        """Test that chunks are forwarded one per line, then the sources."""
+        import json
+        use_backboard(make_backboard(*self.CHUNKS))
+        response = self._post("/messages/query/stream?client_id=test&content=hi&format=ndjson")
+
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        frames = [json.loads(line) for line in response.text.splitlines()]
+        assert frames == [
+            {"type": "session", "session_id": "sess_1"},
+            {"type": "content", "content": "Hel"},
+            {"type": "content", "content": "lo"},
+            {"type": "done", "sources": ["doc A"]},
+        ]
+
+    def test_send_stream_sse_frames(self, make_backboard, use_backboard):
+        """Test the default SSE format and that send omits sources."""
+        import json
+        use_backboard(make_backboard(*self.CHUNKS))
+        response = self._post("/messages/send/stream?client_id=test&content=hi")
+
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = [json.loads(block[len("data: "):])
+                  for block in response.text.split("\n\n") if block]
+        assert [e["type"] for e in events] == ["session", "content", "content", "done"]
+        assert "sources" not in events[-1]
+
+    def test_stream_backboard_error_frame(self, make_backboard, use_backboard):
+        """Test that a Backboard failure ends the stream with an error frame."""
+        import json
+        from backboard.exceptions import BackboardAPIError
+        use_backboard(make_backboard(error=BackboardAPIError("boom")))
+        response = self._post("/messages/query/stream?client_id=test&content=hi&format=ndjson")
+
+        last = json.loads(response.text.splitlines()[-1])
+        assert last["type"] == "error"
+        assert "boom" in last["message"]
+
+    def test_stream_undecryptable_key_error_frame(self, make_backboard, use_backboard):
+        """Test that a stored key that fails to decrypt still ends with an error frame."""
+        import json
+        from src.backend import backboard_clients
+        use_backboard(make_backboard(*self.CHUNKS))
+        with patch.object(backboard_clients.encryption, "decrypt_api_key",
+                          side_effect=ValueError("bad key")):
+            response = self._post("/messages/query/stream?client_id=test&content=hi&format=ndjson")
+
+        frames = [json.loads(line) for line in response.text.splitlines()]
+        assert frames[-1]["type"] == "error"
+        assert "bad key" in frames[-1]["message"]
+
+    def test_stream_rejects_unknown_format(self, make_backboard, use_backboard):
+        """Test that an unsupported format is a 400 before any streaming starts."""
+        use_backboard(make_backboard(*self.CHUNKS))
+        response = self._post("/messages/query/stream?client_id=test&content=hi&format=xml")
+
+        assert response.status_code == 400
+
+
+class TestQueryAnswerCache:
+    """Tests for caching and coalescing /messages/query answers."""
+
+    @pytest.fixture(autouse=True)
+    def sessions(self):
+        from src.backend import db
+        with patch.object(db, 'create_session', return_value="sess_1"), \
+             patch.object(db, 'use_session', return_value="thread_old"):
+            yield
+
+    def _post(self, headers=None):
+        from src.backend import server
+        client = TestClient(server.app)
+        return client.post("/messages/query?client_id=test&content=Where is the schema?",
+                           headers=headers or {})
+
+    def test_repeated_question_skips_backboard(self, make_backboard, use_backboard):
+        """Test that the second identical question is answered from the cache."""
+        backboard = use_backboard(make_backboard())
+        first = self._post()
+        second = self._post()
+
+        assert first.json() == second.json() == ["hi", []]
+        assert backboard.add_message.call_count == 1
+
+    def test_ingestion_invalidates_answer(self, make_backboard, use_backboard):
+        """Test that an ingestion event for the client forces a fresh answer."""
+        import asyncio
+        from src.backend.events import emit_event
+        backboard = use_backboard(make_backboard())
+        self._post()
+        asyncio.run(emit_event("drive", "test"))
+        self._post()
+
+        assert backboard.add_message.call_count == 2
+
+    def test_session_follow_ups_are_not_cached(self, make_backboard, use_backboard):
+        """Test that questions inside a session always reach Backboard."""
+        backboard = use_backboard(make_backboard())
+        self._post(headers={"X-Session-Id": "sess_1"})
+        self._post(headers={"X-Session-Id": "sess_1"})
+
+        assert backboard.add_message.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_concurrent_identical_questions_share_one_call(self, make_backboard, use_backboard):
+        """Test that a burst of the same question makes one Backboard call."""
+        import asyncio
+        import httpx
+        from src.backend import server
+        from src.backend.single_flight import SingleFlight
+
+        release = asyncio.Event()
+        backboard = use_backboard(make_backboard())
+
+        async def add_message(**kwargs):
+            await release.wait()
+            async def chunks():
+                yield {"type": "content_streaming", "content": "hi"}
+            return chunks()
+
+        backboard.add_message = MagicMock(side_effect=add_message)
+        with patch.object(server, 'query_flights', SingleFlight()):
+            transport = httpx.ASGITransport(app=server.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                requests = [
+                    asyncio.create_task(client.post(f"/messages/query?client_id=test&content={q}"))
+                    for q in ("Where is the schema?", "where is the schema", "Where  is the schema")
+                ]
+                while server.query_flights.stats()["joined"] < 2:
+                    await asyncio.sleep(0.01)
+                release.set()
+                responses = await asyncio.gather(*requests)
+
+        assert backboard.add_message.call_count == 1
+        assert all(r.json() == ["hi", []] for r in responses)
+        assert sum("X-Session-Id" in r.headers for r in responses) == 1
+
+
+class TestBatchQueryEndpoint:
+    """Tests for /messages/batch."""
+
+    @pytest.fixture(autouse=True)
+    def new_session(self):
+        from src.backend import db
+        with patch.object(db, 'create_session', return_value="sess_1"):
+            yield
+
+    @pytest.fixture
+    def backboard(self, make_backboard, use_backboard):
+        """Install a Backboard mock that only answers once three questions are in flight."""
+        import asyncio
+
+        def install(fail_on=None):
+            instance = make_backboard()
+            arrived = 0
+            all_in_flight = asyncio.Event()
+
+            async def add_message(**kwargs):
+                # Every question waits until all three are in flight, so this
+                # only finishes if they run concurrently
+                nonlocal arrived
+                arrived += 1
+                if arrived == 3:
+                    all_in_flight.set()
+                await asyncio.wait_for(all_in_flight.wait(), 5)
+                if kwargs["content"] == fail_on:
+                    from backboard.exceptions import BackboardValidationError
+                    raise BackboardValidationError("bad question", 400)
+                async def chunks():
+                    yield {"type": "content_streaming", "content": f"re: {kwargs['content']}"}
+                return chunks()
+
+            instance.add_message = MagicMock(side_effect=add_message)
+            return use_backboard(instance)
+
+        return install
+
+    def _post(self, body):
+        from src.backend import server
+        client = TestClient(server.app)
+        return client.post("/messages/batch?client_id=test", json=body)
+
+    def test_answers_concurrently_as_ndjson(self, backboard):
+        """Test that every prompt is answered, concurrently, one line each."""
+        import json
+        backboard()
+        response = self._post({"prompts": ["a", "b", "c"]})
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        items = sorted((json.loads(l) for l in response.text.splitlines()), key=lambda i: i["index"])
+        assert [i["answer"] for i in items] == ["re: a", "re: b", "re: c"]
+        assert items[0]["prompt"] == "a"
+        assert items[0]["session_id"] == "sess_1"
+
+    def test_per_item_errors(self, backboard):
+        """Test that one failing prompt doesn't fail the others."""
+        import json
+        backboard(fail_on="b")
+        response = self._post({"prompts": ["a", "b", "c"]})
+
+        items = {i["index"]: i for i in map(json.loads, response.text.splitlines())}
+        assert "bad question" in items[1]["error"]
+        assert items[0]["answer"] == "re: a"
+        assert items[2]["answer"] == "re: c"
+
+    def test_rejects_invalid_prompts(self, backboard):
+        """Test that an empty or malformed prompt list is a 400."""
+        backboard()
+        assert self._post({"prompts": []}).status_code == 400
+        assert self._post({"prompts": "a"}).status_code == 400
+
+
+class TestGitWebhookEndpoint:
+    """Tests for accepting git webhooks and ingesting them in the background."""
+
+    PAYLOAD = {
+        "repository": {"html_url": "https://github.com/owner/repo", "default_branch": "main"},
+        "commits": [{"added": ["src/a.py"], "modified": ["README.md"], "removed": ["old.py"]}],
+    }
+
+    @pytest.fixture(autouse=True)
+    def schema(self):
+        """Deliveries are real rows: make sure the tables exist and start empty."""
+        from src.backend import db
+        db.init_db()
+        con = db.get_connection()
+        with con:
+            con.execute("DELETE FROM webhook_deliveries")
+            con.execute("DELETE FROM jobs")
+
+    def _patches(self, db):
+        return [
+            patch.object(db, 'lookup_repository', return_value={"repo_url": "https://github.com/owner/repo", "client_id": "test"}),
+            patch.object(db, 'lookup_client', return_value={"client_id": "test", "api_key": "enc"}),
+        ]
+
+    def test_webhook_queues_delivery_and_returns_202(self):
+        """Test that the webhook stores the push instead of ingesting it inline."""
+        from contextlib import ExitStack
+        from src.backend import server
+        from src.backend import db
+
+        with ExitStack() as stack:
+            for p in self._patches(db):
+                stack.enter_context(p)
+            mock_ingest = stack.enter_context(patch.object(server.git_ingest, 'ingest_push'))
+            client = TestClient(server.app)
+            response = client.post("/git/webhook", json=self.PAYLOAD,
+                                   headers={"X-GitHub-Delivery": "delivery-1"})
+            status = client.get("/git/deliveries/delivery-1")
+
+        assert response.status_code == 202
+        assert response.json() == {"status": "queued", "delivery_id": "delivery-1", "duplicate": False}
+        mock_ingest.assert_not_called()
+        assert status.json()["status"] == "queued"
+        assert status.json()["files_changed"] == 2
+        assert status.json()["files_removed"] == 1
+
+    def test_redelivery_is_reported_as_duplicate(self):
+        """Test that GitHub redelivering a push doesn't queue it again."""
+        from contextlib import ExitStack
+        from src.backend import server
+        from src.backend import db
+
+        with ExitStack() as stack:
+            for p in self._patches(db):
+                stack.enter_context(p)
+            client = TestClient(server.app)
+            client.post("/git/webhook", json=self.PAYLOAD, headers={"X-GitHub-Delivery": "delivery-1"})
+            response = client.post("/git/webhook", json=self.PAYLOAD,
+                                   headers={"X-GitHub-Delivery": "delivery-1"})
+
+        assert response.status_code == 202
+        assert response.json()["duplicate"] is True
+
+    def test_unknown_delivery_is_404(self):
+        """Test that the status endpoint 404s for unknown deliveries."""
+        from src.backend import server
+        client = TestClient(server.app)
+
+        assert client.get("/git/deliveries/nope").status_code == 404
+
+    @pytest.mark.asyncio
+    async def test_job_ingests_queued_delivery(self):
+        """Test that the git_push job runs the push and records the result."""
+        from src.backend import db, git_ingest, jobs
+
+        db.create_webhook_delivery("delivery-1", "test", "https://github.com/owner/repo",
+                                   {"changed": ["src/a.py"], "removed": [], "default_branch": "main"})
+        result = {"status": "updated", "files_updated": 1}
+        pool = jobs.JobWorkerPool(workers=1)
+        with patch.object(git_ingest, 'ingest_push', new=AsyncMock(return_value=result)) as mock_ingest:
+            assert await pool.run_one() is True
+            assert await pool.run_one() is False
+
+        mock_ingest.assert_awaited_once_with(
+            "test", "https://github.com/owner/repo", ["src/a.py"], [], "main",
+            delivery_id="delivery-1", thread_id=None, messages_sent=0,
+        )
+        delivery = db.lookup_webhook_delivery("delivery-1")
+        assert delivery["status"] == "done"
+        assert delivery["result"] == result
+        assert pool.stats()["completed"] == 1
+
+    @pytest.mark.asyncio
+    async def test_failed_ingestion_is_retried(self):
+        """Test that an ingestion error requeues the delivery for another attempt."""
+        from src.backend import db, git_ingest, jobs
+
+        db.create_webhook_delivery("delivery-2", "test", "https://github.com/owner/repo",
+                                   {"changed": ["src/a.py"], "removed": []})
+        pool = jobs.JobWorkerPool(workers=1)
+        with patch.object(git_ingest, 'ingest_push', new=AsyncMock(side_effect=RuntimeError("boom"))):
+            await pool.run_one()
+
+        delivery = db.lookup_webhook_delivery("delivery-2")
+        assert delivery["status"] == "queued"
+        assert "boom" in delivery["error"]
+        assert db.list_jobs(kind="git_push")[0]["status"] == "queued"
+
+    @pytest.mark.asyncio
+    async def test_dead_job_marks_delivery_failed(self):
+        """Test that a delivery is marked failed once its job runs out of attempts."""
+        from src.backend import db, git_ingest, jobs
+
+        db.create_webhook_delivery("delivery-3", "test", "https://github.com/owner/repo",
+                                   {"changed": ["src/a.py"], "removed": []})
+        con = db.get_connection()
+        with con:
+            con.execute("UPDATE jobs SET max_attempts = 1")
+        pool = jobs.JobWorkerPool(workers=1)
+        with patch.object(git_ingest, 'ingest_push', new=AsyncMock(side_effect=RuntimeError("boom"))):
+            await pool.run_one()
+
+        delivery = db.lookup_webhook_delivery("delivery-3")
+        assert delivery["status"] == "failed"
+        assert "boom" in delivery["error"]
+        assert db.list_jobs(kind="git_push")[0]["status"] == "dead"
+
+    @pytest.mark.asyncio
+    async def test_retry_resumes_partial_backboard_send(self, make_backboard, use_backboard):
+        """Test that a retry after a partial send only sends the remaining messages, in the same thread."""
+        from src.backend import db, git_ingest, jobs
+        from backboard.exceptions import BackboardAPIError
+
+        db.create_webhook_delivery("delivery-4", "test", "https://github.com/owner/repo",
+                                   {"changed": ["a.py", "b.py", "c.py"], "removed": []})
+        backboard = use_backboard(make_backboard())
+        sent = []
+        failures = [BackboardAPIError("boom")]
+
+        async def add_message(**kwargs):
+            if kwargs["content"] == "m2" and failures:
+                raise failures.pop()
+            sent.append((kwargs["thread_id"], kwargs["content"]))
+            async def stream():
+                yield {"type": "run_ended"}
+            return stream()
+
+        backboard.add_message.side_effect = add_message
+        files = [("a.py", "a"), ("b.py", "b"), ("c.py", "c")]
+        pool = jobs.JobWorkerPool(workers=1)
+        with patch.object(git_ingest, 'fetch_files', new=AsyncMock(return_value=files)), \
+             patch.object(git_ingest, 'pack_files', return_value=["m1", "m2", "m3"]), \
+             patch.object(db, 'index_repository_files'), \
+             patch.object(jobs, 'retry_delay', return_value=0):
+            await pool.run_one()
+            assert db.lookup_webhook_delivery("delivery-4")["messages_sent"] == 1
+            await pool.run_one()
+
+        assert sent == [("thread_new", "m1"), ("thread_new", "m2"), ("thread_new", "m3")]
+        backboard.create_thread.assert_awaited_once()
+        delivery = db.lookup_webhook_delivery("delivery-4")
+        assert delivery["status"] == "done"
+        assert delivery["messages_sent"] == 3
+
+    @pytest.mark.asyncio
+    async def test_ingest_fetches_only_ingestable_files(self):
+        """Test that a push fetches its ingestable files in one concurrent batch."""
+        from src.backend import db, git_ingest
+
+        with patch.object(db, 'lookup_client', return_value={"client_id": "test", "api_key": "enc"}), \
+             patch.object(git_ingest, 'fetch_files', new=AsyncMock(return_value=[])) as mock_fetch:
+            result = await git_ingest.ingest_push(
+                "test", "https://github.com/owner/repo",
+                ["src/a.py", "logo.png", "node_modules/x.js", "README.md"], [],
+            )
+
+        assert result["status"] == "ignored"
+        mock_fetch.assert_awaited_once_with({
+            "src/a.py": "https://raw.githubusercontent.com/owner/repo/main/src/a.py",
+            "README.md": "https://raw.githubusercontent.com/owner/repo/main/README.md",
+        })
+
+
+class TestJobsEndpoints:
+    """Tests for inspecting and retrying background jobs."""
+
+    def test_list_jobs_passes_filters(self):
+        """Test that /jobs filters by status and kind and caps the page size."""
+        from src.backend import server
+        from src.backend import db
+
+        job = {"job_id": 1, "kind": "git_push", "status": "dead", "payload": {}}
+        with patch.object(db, 'list_jobs', return_value=[job]) as mock_list:
+            client = TestClient(server.app)
+            response = client.get("/jobs?status=dead&kind=git_push&limit=10000")
+
+        assert response.status_code == 200
+        assert response.json() == {"job_count": 1, "jobs": [job]}
+        mock_list.assert_called_once_with("dead", "git_push", server.JOBS_MAX_PAGE_SIZE)
+
+    def test_retry_dead_job(self):
+        """Test that a dead job is queued again."""
+        from src.backend import server
+        from src.backend import db
+
+        with patch.object(db, 'get_job', return_value={"job_id": 1, "status": "dead"}), \
+             patch.object(db, 'retry_job', return_value=True) as mock_retry:
+            client = TestClient(server.app)
+            response = client.post("/jobs/1/retry")
+
+        assert response.status_code == 200
+        assert response.json() == {"status": "queued", "job_id": 1}
+        mock_retry.assert_called_once_with(1)
+
+    def test_retry_rejects_unknown_and_live_jobs(self):
+        """Test that only existing dead jobs can be retried."""
+        from src.backend import server
+        from src.backend import db
+
+        client = TestClient(server.app)
+        with patch.object(db, 'get_job', return_value=None):
+            assert client.post("/jobs/1/retry").status_code == 404
+        with patch.object(db, 'get_job', return_value={"job_id": 1, "status": "running"}):
+            assert client.post("/jobs/1/retry").status_code == 409
+
+    def test_start_polling_queues_poll_job(self):
+        """Test that Drive polling is queued as a job instead of a loose task."""
+        from src.backend import server
+        from src.backend import db
+
+        with patch.object(db, 'lookup_client', return_value={"client_id": "test"}), \
+             patch.object(db, 'get_all_drive_documents_for_client', return_value=[{"file_id": "f1"}]), \
+             patch.object(server, 'drive_service', MagicMock()), \
+             patch.object(db, 'enqueue_job', return_value=1) as mock_enqueue:
+            client = TestClient(server.app)
+            response = client.post("/drive/start-polling?client_id=test&interval=60")
+
+        assert response.status_code == 200
+        assert response.json()["status"] == "polling_started"
+        mock_enqueue.assert_called_once_with(
+            "drive_poll", {"client_id": "test", "interval": 60},
+            dedup_key="drive_poll:test", delay=0, max_attempts=None,
+        )
+
+    @pytest.mark.asyncio
+    async def test_poll_job_queues_documents_and_reschedules(self):
+        """Test that a poll queues each document and then itself after the interval."""
+        from src.backend import db
+        from src.backend import drive_service
+
+        with patch.object(db, 'get_all_drive_documents_for_client',
+                          return_value=[{"file_id": "f1"}, {"file_id": "f2"}]), \
+             patch.object(db, 'enqueue_job', return_value=1) as mock_enqueue:
+            await drive_service.run_drive_poll({"client_id": "test", "interval": 60})
+
+        calls = [(c.args[0], c.kwargs["dedup_key"], c.kwargs["delay"]) for c in mock_enqueue.call_args_list]
+        assert calls == [
+            ("drive_document", "drive:test:f1", 0),
+            ("drive_document", "drive:test:f2", 0),
+            ("drive_poll", "drive_poll:test", 60),
+        ]
@@ -0,0 +1,80 @@
+"""
+Tests for single_flight.py - coalescing identical concurrent calls.
+"""
+import asyncio
+import pytest
+
+from src.backend.single_flight import SingleFlight
+
+
+class TestSingleFlight:
+    """Tests for the SingleFlight class."""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_calls_share_one_run(self):
+        """Test that callers with the same key get the first caller's result."""
+        flights = SingleFlight()
+        release = asyncio.Event()
+        runs = []
+
+        async def call():
+            runs.append(1)
+            await release.wait()
+            return "answer"
+
+        waiters = [asyncio.create_task(flights.do("k", call)) for _ in range(3)]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*waiters)
+
+        assert len(runs) == 1
+        assert [r[0] for r in results] == ["answer"] * 3
+        assert [r[1] for r in results] == [False, True, True]
+        assert flights.stats() == {"calls": 1, "joined": 2, "in_flight": 0}
+
+    @pytest.mark.asyncio
+    async def test_finished_call_is_not_reused(self):
+        """Test that a call after the first finished runs again."""
+        flights = SingleFlight()
+        counter = iter(range(10))
+
+        async def call():
+            return next(counter)
+
+        assert (await flights.do("k", call))[0] == 0
+        assert (await flights.do("k", call))[0] == 1
+
+    @pytest.mark.asyncio
+    async def test_exception_is_shared(self):
+        """Test that every waiter sees the call's exception."""
+        flights = SingleFlight()
+        release = asyncio.Event()
+
+        async def call():
+            await release.wait()
+            raise RuntimeError("boom")
+
+        waiters = [asyncio.create_task(flights.do("k", call)) for _ in range(2)]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*waiters, return_exceptions=True)
+
+        assert all(isinstance(r, RuntimeError) for r in results)
+
+    @pytest.mark.asyncio
+    async def test_cancelled_caller_does_not_cancel_call(self):
+        """Test that the call keeps running for others when its starter goes away."""
+        flights = SingleFlight()
+        release = asyncio.Event()
+
+        async def call():
+            await release.wait()
+            return "answer"
+
+        first = asyncio.create_task(flights.do("k", call))
+        second = asyncio.create_task(flights.do("k", call))
+        await asyncio.sleep(0)
+        first.cancel()
+        release.set()
+
+        assert (await second)[0] == "answer"
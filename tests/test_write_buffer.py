@@ -0,0 +1,74 @@
+"""
+Tests for write_buffer.py - batched row writer.
+"""
+import time
+import pytest
+
+from src.backend.write_buffer import WriteBuffer
+
+
+class TestWriteBuffer:
+    """Tests for the WriteBuffer class."""
+
+    def test_rows_are_held_until_size_threshold(self):
+        """Test that rows stay pending until max_rows is reached."""
+        batches = []
+        buffer = WriteBuffer(batches.append, max_rows=3, max_delay=60)
+
+        buffer.add(("a",))
+        buffer.add(("b",))
+        assert batches == []
+        assert buffer.pending() == [("a",), ("b",)]
+
+        buffer.add(("c",))
+        assert batches == [[("a",), ("b",), ("c",)]]
+        assert buffer.pending() == []
+        buffer.close()
+
+    def test_rows_are_flushed_after_max_delay(self):
+        """Test that the background thread flushes on the time threshold."""
+        batches = []
+        buffer = WriteBuffer(batches.append, max_rows=100, max_delay=0.05)
+
+        buffer.add(("a",))
+        deadline = time.time() + 2
+        while not batches and time.time() < deadline:
+            time.sleep(0.01)
+
+        assert batches == [[("a",)]]
+        buffer.close()
+
+    def test_close_writes_remaining_rows(self):
+        """Test that close flushes whatever is still pending."""
+        batches = []
+        buffer = WriteBuffer(batches.append, max_rows=100, max_delay=60)
+        buffer.add(("a",))
+
+        buffer.close()
+
+        assert batches == [[("a",)]]
+
+    def test_failed_flush_keeps_rows_for_retry(self):
+        """Test that a failing write puts the batch back in order."""
+        def fail(rows):
+            raise RuntimeError("disk full")
+
+        buffer = WriteBuffer(fail, max_rows=100, max_delay=60)
+        buffer.add(("a",))
+        buffer.add(("b",))
+
+        with pytest.raises(RuntimeError):
+            buffer.flush()
+
+        assert buffer.pending() == [("a",), ("b",)]
+        buffer.clear()
+        buffer.close()
+
+    def test_reading_yields_pending_rows(self):
+        """Test that reading() exposes the unflushed rows."""
+        buffer = WriteBuffer(lambda rows: None, max_rows=100, max_delay=60)
+        buffer.add(("a",))
+
+        with buffer.reading() as pending:
+            assert pending == [("a",)]
+        buffer.close()
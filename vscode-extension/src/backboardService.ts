@@ -27,6 +27,8 @@ export interface FileContext {
 export class BackboardService {
   private apiClient: AxiosInstance;
   private clientId: string;
+  // Conversation session from the backend; follow-ups reuse its Backboard thread
+  private sessionId?: string;
 
   constructor() {
     const config = vscode.workspace.getConfiguration("backboard");
@@ -77,7 +79,9 @@ export class BackboardService {
           client_id: this.clientId,
           content: fullMessage,
         },
+        headers: this.sessionId ? { "X-Session-Id": this.sessionId } : {},
       });
+      this.sessionId = response.headers["x-session-id"] || this.sessionId;
 
       // Backend returns a tuple [response, sources]
       const [content, sources] = response.data;
@@ -25,11 +25,20 @@ export default function QueryInterface() {
     setLoading(true);
 
     try {
-      const reply = await API.query(prompt);
-      setMessages((m) => [
-        ...m,
-        { role: "assistant", text: reply },
-      ]);
+      let started = false;
+      await API.queryStream(prompt, (chunk) => {
+        // Replace the typing indicator with the reply as soon as text arrives
+        if (!started) {
+          started = true;
+          setLoading(false);
+          setMessages((m) => [...m, { role: "assistant", text: chunk }]);
+          return;
+        }
+        setMessages((m) => [
+          ...m.slice(0, -1),
+          { role: "assistant", text: m[m.length - 1].text + chunk },
+        ]);
+      });
     } catch (err) {
       setMessages((m) => [
         ...m,
@@ -8,6 +8,10 @@ export interface DataEvent {
     client_id?: string;
 }
 
+// Conversation session returned by /messages/send; reusing it keeps follow-up
+// questions on the same Backboard thread
+let sessionId: string | null = null;
+
 export const API = {
     async getStatus(clientId: string = "default_user") {
         const res = await fetch(`${BASE_URL}/system/status?client_id=${clientId}`);
@@ -24,11 +28,49 @@ export const API = {
     async query(prompt: string, clientId: string = "default_user") {
         const res = await fetch(`${BASE_URL}/messages/send?client_id=${clientId}&content=${encodeURIComponent(prompt)}`, {
             method: "POST",
+            headers: sessionId ? { "X-Session-Id": sessionId } : undefined,
         });
         if (!res.ok) throw new Error("Failed to query");
+        sessionId = res.headers.get("X-Session-Id") || sessionId;
         return res.text(); // Current backend returns text
     },
 
+    // Streams the answer from /messages/send/stream, calling onChunk as each
+    // piece arrives; resolves with the full reply once the stream ends
+    async queryStream(prompt: string, onChunk: (text: string) => void, clientId: string = "default_user") {
+        const res = await fetch(`${BASE_URL}/messages/send/stream?client_id=${clientId}&content=${encodeURIComponent(prompt)}&format=ndjson`, {
+            method: "POST",
+            headers: sessionId ? { "X-Session-Id": sessionId } : undefined,
+        });
+        if (!res.ok || !res.body) throw new Error("Failed to query");
+
+        const reader = res.body.getReader();
+        const decoder = new TextDecoder();
+        let buffered = "";
+        let reply = "";
+        for (;;) {
+            const { done, value } = await reader.read();
+            if (done) break;
+            buffered += decoder.decode(value, { stream: true });
+            const lines = buffered.split("\n");
+            buffered = lines.pop() ?? "";
+            for (const line of lines) {
+                if (!line) continue;
+                const frame = JSON.parse(line);
+                if (frame.type === "session") {
+                    sessionId = frame.session_id;
+                } else if (frame.type === "content") {
+                    reply += frame.content;
+                    onChunk(frame.content);
+                } else if (frame.type === "error") {
+                    reply += frame.message;
+                    onChunk(frame.message);
+                }
+            }
+        }
+        return reply;
+    },
+
     async authenticateDrive() {
         const res = await fetch(`${BASE_URL}/drive/authenticate`, { method: "POST" });
         if (!res.ok) throw new Error("Failed to authenticate drive");